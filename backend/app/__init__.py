@@ -34,8 +34,23 @@ def create_app(config_name='development'):
         }
     })
     
+    # In-process asset cache
+    from app.services.asset_cache import init_asset_cache
+    init_asset_cache(app)
+    
+    # Dashboard response cache
+    from app.services.response_cache import init_response_cache
+    init_response_cache(app)
+    
+    from app.services.dashboard_overview import init_overview
+    init_overview(app)
+    
+    # Server-sent event broker
+    from app.services.events import init_events
+    init_events(app)
+    
     # Register blueprints
-    from app.routes import auth, users, assets, maintenance, dashboard, licenses
+    from app.routes import auth, users, assets, maintenance, dashboard, licenses, depreciation, changes, events
     
     app.register_blueprint(auth.bp, url_prefix='/api/auth')
     app.register_blueprint(users.bp, url_prefix='/api/users')
@@ -43,14 +58,35 @@ def create_app(config_name='development'):
     app.register_blueprint(maintenance.bp, url_prefix='/api/maintenance')
     app.register_blueprint(dashboard.bp, url_prefix='/api/dashboard')
     app.register_blueprint(licenses.bp, url_prefix='/api/licenses')
+    app.register_blueprint(depreciation.bp, url_prefix='/api/depreciation')
+    app.register_blueprint(changes.bp, url_prefix='/api/changes')
+    app.register_blueprint(events.bp, url_prefix='/api/events')
     
     # Register error handlers
     from app.middleware.errors import register_error_handlers
     register_error_handlers(app)
     
+    # One-off maintenance commands (flask --app run <command>)
+    from app.commands import register_commands
+    register_commands(app)
+    
     # Create tables
     with app.app_context():
         db.create_all()
+        
+        # create_all() skips indexes added to tables that already exist
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(db.engine, checkfirst=True)
+        
+        from app.services.search import init_search
+        init_search(app)
+        
+        from app.services.expiry_calendar import init_expiry_calendar
+        init_expiry_calendar(app)
+        
+        from app.services.history_journal import init_history_journal
+        init_history_journal(app)
     
     @app.route('/api/health')
     def health_check():
@@ -0,0 +1,78 @@
+"""
+One-off maintenance commands
+
+Run with the Flask CLI against the deployed configuration, e.g.
+
+    flask --app run drop-superseded-indexes
+    flask --app run backfill
+
+These change existing data or schema, or scan whole tables, so they run
+once per deployment instead of at every application start.
+"""
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import Index, inspect
+from app import db
+from app.services.depreciation_schedule import backfill_schedules
+from app.services.expiry_calendar import backfill_calendar
+from app.services.kpis import backfill_counters
+from app.services.resolution_times import backfill_digests
+from app.services.timeline import backfill_timeline
+
+# Indexes earlier versions created that a composite index now covers:
+# single-column indexes on a composite's leading column, and the status +
+# category index that gained purchase_price
+SUPERSEDED_INDEXES = {
+    'assets': ('ix_assets_status', 'ix_assets_assigned_to_user_id', 'ix_assets_status_category'),
+    'asset_history': (
+        'ix_asset_history_asset_id', 'ix_asset_history_action', 'ix_asset_history_performed_by_user_id'
+    ),
+    'licenses': ('ix_licenses_status',),
+    'maintenance_tickets': ('ix_maintenance_tickets_status', 'ix_maintenance_tickets_reported_by_user_id'),
+}
+
+
+def drop_superseded_indexes():
+    """Drop the SUPERSEDED_INDEXES the database still has; returns their names"""
+    inspector = inspect(db.engine)
+    dropped = []
+    for table_name, names in SUPERSEDED_INDEXES.items():
+        table = db.metadata.tables[table_name]
+        existing = {index['name']: index['column_names'] for index in inspector.get_indexes(table_name)}
+        for name in names:
+            if name in existing:
+                Index(name, *(table.c[column] for column in existing[name])).drop(db.engine)
+                dropped.append(name)
+    return dropped
+
+
+def backfill():
+    """
+    Build the derived tables (depreciation schedules, KPI counters, timeline
+    rollups, resolution digests, expiry calendar) that are still empty
+    although there is data to derive them from. Each commits on its own.
+    """
+    for step in (backfill_schedules, backfill_counters, backfill_timeline, backfill_digests, backfill_calendar):
+        step()
+
+
+@click.command('drop-superseded-indexes')
+@with_appcontext
+def drop_superseded_indexes_command():
+    """Drop indexes replaced by composite ones (run once after upgrading)"""
+    dropped = drop_superseded_indexes()
+    click.echo(f"Dropped {', '.join(dropped)}" if dropped else 'No superseded indexes found')
+
+
+@click.command('backfill')
+@with_appcontext
+def backfill_command():
+    """Build derived tables for data that predates them (run once after upgrading)"""
+    backfill()
+    click.echo('Derived tables are built')
+
+
+def register_commands(app):
+    """Add the maintenance commands to the app's CLI"""
+    app.cli.add_command(drop_superseded_indexes_command)
+    app.cli.add_command(backfill_command)
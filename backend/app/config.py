@@ -18,6 +18,74 @@ class Config:
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'uploads')
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'pdf', 'doc', 'docx'}
+    
+    # Pagination
+    PAGINATION_DEFAULT_LIMIT = 50
+    PAGINATION_MAX_LIMIT = 500
+    COUNT_ESTIMATE_CAP = 10000  # Row limit for total=estimate counts
+    
+    # Asset search: 'auto' uses the dialect's full-text index, 'like' forces ILIKE
+    SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'auto')
+    
+    # CSV export: rows fetched per server-side batch
+    EXPORT_BATCH_SIZE = 1000
+    
+    # Bulk import: rows per INSERT batch and transaction
+    BULK_IMPORT_CHUNK_SIZE = 1000
+    BULK_IMPORT_MAX_ERRORS = 100  # Rejected rows whose errors an import response lists
+    BULK_ASSIGN_MAX_ITEMS = 1000  # Assets per bulk assign/release request
+    
+    # Asset cache: in-process LRU of assets by ID, invalidated by the write routes
+    ASSET_CACHE_ENABLED = os.getenv('ASSET_CACHE_ENABLED', 'true').lower() == 'true'
+    ASSET_CACHE_SIZE = 10000
+    ASSET_CACHE_TTL = 300  # Seconds; bounds staleness from writes in other worker processes
+    
+    # Dashboard response cache: entries go stale when this process commits a
+    # write to a table they read, or after the TTL for other workers' writes
+    DASHBOARD_CACHE_ENABLED = os.getenv('DASHBOARD_CACHE_ENABLED', 'true').lower() == 'true'
+    DASHBOARD_CACHE_SIZE = 256
+    DASHBOARD_CACHE_TTL = 30  # Seconds
+    DASHBOARD_CACHE_WAIT = 10  # Seconds a request waits for a concurrent computation of the same entry
+    DASHBOARD_OVERVIEW_WORKERS = 4  # Threads per process computing /overview widgets; 1 runs them inline
+    DASHBOARD_OVERVIEW_TIMEOUT = 10  # Seconds before an unfinished widget is reported as failed
+    
+    # Ticket resolution percentiles: t-digest size per (priority, category); larger is more precise
+    RESOLUTION_DIGEST_COMPRESSION = 100
+    
+    # Expiry calendar: warranties and active licenses expiring within the
+    # horizon, kept by the write paths and a daily job that also expires licenses
+    EXPIRY_CALENDAR_HORIZON_DAYS = 365  # Longest window the expiry listings serve
+    EXPIRY_SCHEDULER_ENABLED = os.getenv('EXPIRY_SCHEDULER_ENABLED', 'true').lower() == 'true'
+    EXPIRY_REBUILD_DELAY = 5.0  # Seconds set-based writes are batched before the calendar is rebuilt
+    
+    # Depreciation forecasts: longest window served from the precomputed schedules
+    DEPRECIATION_FORECAST_MAX_MONTHS = 120
+    
+    # History archival: entries older than this move to compressed segments
+    HISTORY_ARCHIVE_AFTER_DAYS = int(os.getenv('HISTORY_ARCHIVE_AFTER_DAYS', 365))
+    HISTORY_ARCHIVE_CHUNK_SIZE = 5000  # Entries per segment and per move transaction
+    
+    # History writes: 'sync' inserts in the request transaction; 'journal' appends
+    # committed entries to a local journal flushed to the database in batches
+    HISTORY_WRITE_MODE = os.getenv('HISTORY_WRITE_MODE', 'sync')
+    HISTORY_JOURNAL_DIR = os.getenv('HISTORY_JOURNAL_DIR')  # Default: <instance path>/history-journal
+    HISTORY_FLUSH_BATCH_SIZE = 500  # Pending entries that trigger a flush
+    HISTORY_FLUSH_INTERVAL = 2.0  # Seconds an entry may wait before a flush
+    
+    # Point-in-time asset reads: full snapshot after this many recorded changes
+    ASSET_SNAPSHOT_INTERVAL = 50
+    
+    # Change feed: entries older than this are pruned; older cursors must resync
+    CHANGE_LOG_RETENTION_DAYS = int(os.getenv('CHANGE_LOG_RETENTION_DAYS', 30))
+    
+    # Server-sent events: 'local' fans out within a worker process; 'socket'
+    # also relays events to the other workers through Unix datagram sockets
+    EVENTS_BROKER = os.getenv('EVENTS_BROKER', 'local')
+    EVENTS_SOCKET_DIR = os.getenv('EVENTS_SOCKET_DIR')  # Default: <instance path>/events
+    EVENTS_QUEUE_SIZE = 100  # Pending events per stream before it is told to resync
+    EVENTS_MAX_STREAMS = 100  # Open streams per worker process
+    EVENTS_HEARTBEAT = 15  # Seconds between keep-alive comments
+    EVENTS_STREAM_MAX_AGE = 300  # Seconds before a stream closes and the client reconnects
 
 
 class DevelopmentConfig(Config):
@@ -49,3 +117,8 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False
+    ASSET_CACHE_ENABLED = False
+    DASHBOARD_CACHE_ENABLED = False
+    DASHBOARD_OVERVIEW_WORKERS = 1  # In-memory SQLite shares one connection between threads
+    HISTORY_WRITE_MODE = 'sync'
+    EXPIRY_SCHEDULER_ENABLED = False  # Writes rebuild the calendar inline
@@ -2,7 +2,7 @@
 Authentication middleware and decorators
 """
 from functools import wraps
-from flask import jsonify
+from flask import g, jsonify
 from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
 from app.models.user import User
 
@@ -22,6 +22,9 @@ def require_role(allowed_roles):
             if not user:
                 return jsonify({'error': 'User not found'}), 404
             
+            # Reused by get_current_user for the rest of the request
+            g.current_user = user
+            
             if not user.is_active:
                 return jsonify({'error': 'User account is inactive'}), 403
             
@@ -41,7 +44,10 @@ def get_current_user():
     try:
         verify_jwt_in_request()
         current_user_id = get_jwt_identity()
-        return User.query.get(current_user_id)
+        user = g.get('current_user')
+        if user is None or user.id != current_user_id:
+            user = g.current_user = User.query.get(current_user_id)
+        return user
     except Exception:
         return None
 
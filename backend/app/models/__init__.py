@@ -4,7 +4,18 @@ Database models
 from app.models.user import User
 from app.models.asset import Asset
 from app.models.maintenance import MaintenanceTicket
-from app.models.history import AssetHistory
+from app.models.history import (
+    AssetHistory, AssetSnapshot, HistoryArchiveSegment, HistoryArchiveIndex, HistoryJournalCheckpoint
+)
 from app.models.license import License
+from app.models.change_log import ChangeLogEntry, ChangeLogSequence
+from app.models.depreciation import DepreciationPolicy, DepreciationSchedule
+from app.models.kpi import CacheVersion, KpiCounter, ResolutionDigest, TimelineRollup
+from app.models.expiry import ExpiryCalendarEntry
 
-__all__ = ['User', 'Asset', 'MaintenanceTicket', 'AssetHistory', 'License']
+__all__ = [
+    'User', 'Asset', 'MaintenanceTicket', 'AssetHistory', 'AssetSnapshot', 'HistoryArchiveSegment',
+    'HistoryArchiveIndex', 'HistoryJournalCheckpoint', 'License', 'ChangeLogEntry', 'ChangeLogSequence',
+    'DepreciationPolicy', 'DepreciationSchedule', 'KpiCounter', 'ResolutionDigest', 'TimelineRollup',
+    'CacheVersion', 'ExpiryCalendarEntry'
+]
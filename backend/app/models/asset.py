@@ -10,6 +10,13 @@ class Asset(db.Model):
     
     __tablename__ = 'assets'
     
+    # Fields that can be requested individually via ?fields=
+    serializable_fields = (
+        'id', 'name', 'description', 'category', 'serial_number', 'purchase_date',
+        'purchase_price', 'warranty_expiration', 'status', 'condition', 'assigned_to_user_id',
+        'location', 'created_at', 'updated_at'
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
@@ -25,8 +32,7 @@ class Asset(db.Model):
     status = db.Column(
         db.Enum('Available', 'Assigned', 'Under Maintenance', 'In Repair', 'Retired', name='asset_status'),
         nullable=False,
-        default='Available',
-        index=True
+        default='Available'
     )
     condition = db.Column(
         db.Enum('Excellent', 'Good', 'Fair', 'Poor', name='asset_condition'),
@@ -34,7 +40,7 @@ class Asset(db.Model):
     )
     
     # Assignment
-    assigned_to_user_id = db.Column(db.Integer, db.ForeignKey('users.id'), index=True)
+    assigned_to_user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
     
     # Location
     location = db.Column(db.String(100))
@@ -43,35 +49,60 @@ class Asset(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Composite indexes follow the list filters: status alone uses the
+    # status + category prefix, "my assets" filters by assignee then status.
+    # purchase_price makes the status index covering for the KPI aggregates.
+    __table_args__ = (
+        db.Index('ix_assets_status_category_price', 'status', 'category', 'purchase_price'),
+        db.Index('ix_assets_assigned_status', 'assigned_to_user_id', 'status'),
+        db.Index('ix_assets_name', 'name'),
+        db.Index('ix_assets_purchase_date', 'purchase_date'),
+        db.Index('ix_assets_updated_at', 'updated_at'),
+    )
+    
     # Relationships
     maintenance_tickets = db.relationship('MaintenanceTicket', backref='asset', lazy='dynamic', cascade='all, delete-orphan')
     history = db.relationship('AssetHistory', backref='asset', lazy='dynamic', cascade='all, delete-orphan', order_by='AssetHistory.created_at.desc()')
     licenses = db.relationship('License', backref='asset', lazy='dynamic', cascade='all, delete-orphan')
+    snapshots = db.relationship('AssetSnapshot', backref='asset', lazy='dynamic', cascade='all, delete-orphan')
     
     def calculate_depreciation(self):
         """
-        Calculate straight-line depreciation over 5 years
+        Calculate depreciation under the asset category's policy
+        (straight-line over 5 years with 10% salvage when none is configured)
         Returns current value, total depreciation, and depreciation rate
         """
-        if not self.purchase_price or not self.purchase_date:
+        from app.models.depreciation import DepreciationPolicy
+        return DepreciationPolicy.for_category(self.category).compute(self.purchase_price, self.purchase_date)
+    
+    # Default straight-line depreciation model (mirrored in SQL by app.services.depreciation)
+    USEFUL_LIFE_YEARS = 5
+    SALVAGE_RATE = 0.1  # 10% residual value
+    
+    @staticmethod
+    def compute_depreciation(purchase_price, purchase_date, today=None, useful_life_years=None, salvage_rate=None):
+        """Straight-line depreciation for a raw purchase price and date"""
+        if not purchase_price or not purchase_date:
             return None
         
-        useful_life_years = 5
-        salvage_value = float(self.purchase_price) * 0.1  # 10% residual value
+        useful_life_years = useful_life_years or Asset.USEFUL_LIFE_YEARS
+        salvage_rate = Asset.SALVAGE_RATE if salvage_rate is None else salvage_rate
+        salvage_value = float(purchase_price) * salvage_rate
         
-        annual_depreciation = (float(self.purchase_price) - salvage_value) / useful_life_years
+        annual_depreciation = (float(purchase_price) - salvage_value) / useful_life_years
         
-        years_elapsed = (datetime.now().date() - self.purchase_date).days / 365.25
+        today = today or datetime.now().date()
+        years_elapsed = (today - purchase_date).days / 365.25
         years_elapsed = min(years_elapsed, useful_life_years)
         
         total_depreciation = annual_depreciation * years_elapsed
-        current_value = max(float(self.purchase_price) - total_depreciation, salvage_value)
+        current_value = max(float(purchase_price) - total_depreciation, salvage_value)
         
         return {
-            'purchase_price': float(self.purchase_price),
+            'purchase_price': float(purchase_price),
             'current_value': round(current_value, 2),
             'total_depreciation': round(total_depreciation, 2),
-            'depreciation_rate': round((total_depreciation / float(self.purchase_price)) * 100, 2),
+            'depreciation_rate': round((total_depreciation / float(purchase_price)) * 100, 2),
             'years_elapsed': round(years_elapsed, 2),
             'useful_life_years': useful_life_years
         }
@@ -0,0 +1,57 @@
+"""
+Change Log Model
+"""
+from datetime import datetime
+from sqlalchemy import DDL, event
+from app import db
+
+
+class ChangeLogEntry(db.Model):
+    """
+    One insert, update or delete of a synced entity
+    
+    Written by the write routes in the same transaction as the change. IDs
+    are taken from ChangeLogSequence as the transaction commits, so they
+    order changes by commit. The change feed returns entries after a
+    client's cursor; deletes are kept here since the rows themselves are gone.
+    """
+    
+    __tablename__ = 'change_log'
+    
+    ENTITIES = ('asset', 'ticket', 'license')
+    OPERATIONS = ('insert', 'update', 'delete')
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    entity = db.Column(db.String(20), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    operation = db.Column(db.String(10), nullable=False)
+    owner_user_id = db.Column(db.Integer)  # Ticket reporter, for employees' feeds
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    
+    def __repr__(self):
+        return f'<ChangeLogEntry {self.id} {self.operation} {self.entity} {self.entity_id}>'
+
+
+class ChangeLogSequence(db.Model):
+    """
+    The last change log ID handed out
+    
+    A single row that each committing transaction locks and advances to
+    number its change log entries. The lock is held until the commit, so a
+    transaction that takes IDs after another also commits after it.
+    """
+    
+    __tablename__ = 'change_log_sequence'
+    
+    id = db.Column(db.Integer, primary_key=True)  # Always 1
+    value = db.Column(db.Integer, nullable=False)
+    
+    def __repr__(self):
+        return f'<ChangeLogSequence {self.value}>'
+
+
+# Created after change_log and seeded past its existing entries
+ChangeLogSequence.__table__.add_is_dependent_on(ChangeLogEntry.__table__)
+event.listen(ChangeLogSequence.__table__, 'after_create', DDL(
+    'INSERT INTO change_log_sequence (id, value) SELECT 1, COALESCE(MAX(id), 0) FROM change_log'
+))
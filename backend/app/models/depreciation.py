@@ -0,0 +1,171 @@
+"""
+Depreciation Policy and Schedule Models
+"""
+from datetime import datetime
+from app import db
+from app.models.asset import Asset
+
+
+class DepreciationPolicy(db.Model):
+    """Per-category depreciation terms"""
+    
+    __tablename__ = 'depreciation_policies'
+    
+    METHODS = ('straight_line', 'declining_balance')
+    
+    id = db.Column(db.Integer, primary_key=True)
+    category = db.Column(db.String(50), unique=True, nullable=False, index=True)
+    method = db.Column(
+        db.Enum(*METHODS, name='depreciation_method'),
+        nullable=False,
+        default='straight_line'
+    )
+    useful_life_years = db.Column(db.Integer, nullable=False)
+    salvage_rate = db.Column(db.Numeric(5, 4), nullable=False, default=0.1)
+    declining_rate = db.Column(db.Numeric(5, 4))  # Annual rate; defaults to double-declining (2 / life)
+    
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    @staticmethod
+    def default(category=None):
+        """Unsaved policy with the built-in straight-line terms"""
+        return DepreciationPolicy(
+            category=category,
+            method='straight_line',
+            useful_life_years=Asset.USEFUL_LIFE_YEARS,
+            salvage_rate=Asset.SALVAGE_RATE
+        )
+    
+    @staticmethod
+    def by_category():
+        """All configured policies keyed by category"""
+        return {policy.category: policy for policy in DepreciationPolicy.query.all()}
+    
+    @staticmethod
+    def for_category(category):
+        """The category's policy, or the default one"""
+        return DepreciationPolicy.query.filter(DepreciationPolicy.category == category).first() or DepreciationPolicy.default(category)
+    
+    @property
+    def annual_rate(self):
+        """Declining-balance rate applied to the book value each year"""
+        if self.declining_rate:
+            return float(self.declining_rate)
+        return min(2.0 / self.useful_life_years, 1.0)
+    
+    @property
+    def terms(self):
+        """Hashable terms; policies with equal terms depreciate identically"""
+        rate = self.annual_rate if self.method == 'declining_balance' else None
+        return (self.method, self.useful_life_years, float(self.salvage_rate), rate)
+    
+    def compute(self, purchase_price, purchase_date, today=None):
+        """Depreciation of one asset under this policy, as of `today`"""
+        if self.method == 'declining_balance':
+            return self._declining_balance(purchase_price, purchase_date, today)
+        return Asset.compute_depreciation(
+            purchase_price, purchase_date, today,
+            useful_life_years=self.useful_life_years,
+            salvage_rate=float(self.salvage_rate)
+        )
+    
+    def _declining_balance(self, purchase_price, purchase_date, today=None):
+        """Book value shrinks by annual_rate per year, floored at salvage value"""
+        if not purchase_price or not purchase_date:
+            return None
+        
+        price = float(purchase_price)
+        useful_life_years = self.useful_life_years
+        salvage_value = price * float(self.salvage_rate)
+        
+        today = today or datetime.now().date()
+        years_elapsed = (today - purchase_date).days / 365.25
+        years_elapsed = min(years_elapsed, useful_life_years)
+        
+        # Fully written down to salvage value at the end of the useful life
+        if years_elapsed >= useful_life_years:
+            current_value = salvage_value
+        else:
+            current_value = max(price * (1 - self.annual_rate) ** years_elapsed, salvage_value)
+        total_depreciation = price - current_value
+        
+        return {
+            'purchase_price': price,
+            'current_value': round(current_value, 2),
+            'total_depreciation': round(total_depreciation, 2),
+            'depreciation_rate': round((total_depreciation / price) * 100, 2),
+            'years_elapsed': round(years_elapsed, 2),
+            'useful_life_years': useful_life_years
+        }
+    
+    def book_values(self, purchase_price, purchase_date, dates):
+        """
+        compute(...)['current_value'] on each of `dates` (same operations,
+        without building the result dicts); used to build monthly schedules
+        """
+        price = float(purchase_price)
+        useful_life_years = self.useful_life_years
+        salvage_value = price * float(self.salvage_rate)
+        declining = self.method == 'declining_balance'
+        if declining:
+            factor = 1 - self.annual_rate
+        else:
+            annual_depreciation = (price - salvage_value) / useful_life_years
+        
+        # Inline min()/max(): this runs once per asset and month on rebuilds
+        values = []
+        for day in dates:
+            years_elapsed = (day - purchase_date).days / 365.25
+            if years_elapsed > useful_life_years:
+                years_elapsed = useful_life_years
+            if not declining:
+                current_value = price - annual_depreciation * years_elapsed
+            elif years_elapsed >= useful_life_years:
+                current_value = salvage_value
+            else:
+                current_value = price * factor ** years_elapsed
+            values.append(round(current_value if current_value > salvage_value else salvage_value, 2))
+        return values
+    
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'id': self.id,
+            'category': self.category,
+            'method': self.method,
+            'useful_life_years': self.useful_life_years,
+            'salvage_rate': float(self.salvage_rate),
+            'declining_rate': float(self.declining_rate) if self.declining_rate else None,
+            'annual_rate': self.annual_rate if self.method == 'declining_balance' else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+    
+    def __repr__(self):
+        return f'<DepreciationPolicy {self.category} - {self.method}>'
+
+
+class DepreciationSchedule(db.Model):
+    """
+    Precomputed portfolio book value per category and month
+    
+    book_value_cents sums the month-end book value of assets still inside
+    their useful life; salvage_cents holds the residual value of assets whose
+    useful life ended that month, which carries forward to every later month.
+    """
+    
+    __tablename__ = 'depreciation_schedules'
+    
+    category = db.Column(db.String(50), primary_key=True)
+    period = db.Column(db.Date, primary_key=True)  # First day of the month
+    book_value_cents = db.Column(db.BigInteger, nullable=False, default=0)
+    salvage_cents = db.Column(db.BigInteger, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.Index('ix_depreciation_schedules_period', 'period'),
+    )
+    
+    def __repr__(self):
+        return f'<DepreciationSchedule {self.category} {self.period}>'
@@ -0,0 +1,41 @@
+"""
+Expiry Calendar Model
+"""
+from app import db
+
+
+class ExpiryCalendarEntry(db.Model):
+    """
+    An asset warranty or an active license expiring within the calendar horizon
+    
+    Rows are kept by app.services.expiry_calendar and carry what the expiry
+    listings show: the item's to_dict() payload, its asset and the asset's
+    assignee, so a listing is one range read on (kind, expires_on).
+    """
+    
+    __tablename__ = 'expiry_calendar'
+    
+    KINDS = ('warranty', 'license')
+    
+    kind = db.Column(db.String(10), primary_key=True)
+    item_id = db.Column(db.Integer, primary_key=True)  # Asset ID for warranties, license ID for licenses
+    expires_on = db.Column(db.Date, nullable=False)
+    
+    # Denormalized asset and owner (the asset's assignee)
+    asset_id = db.Column(db.Integer)
+    asset_name = db.Column(db.String(100))
+    owner_id = db.Column(db.Integer)
+    owner_username = db.Column(db.String(80))
+    owner_department = db.Column(db.String(100))
+    
+    payload = db.Column(db.JSON, nullable=False)
+    
+    # Listings read a kind by date; refreshes find the entries of changed assets and users
+    __table_args__ = (
+        db.Index('ix_expiry_calendar_kind_expires', 'kind', 'expires_on'),
+        db.Index('ix_expiry_calendar_asset_id', 'asset_id'),
+        db.Index('ix_expiry_calendar_owner_id', 'owner_id'),
+    )
+    
+    def __repr__(self):
+        return f'<ExpiryCalendarEntry {self.kind} {self.item_id} {self.expires_on}>'
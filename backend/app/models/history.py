@@ -11,14 +11,14 @@ class AssetHistory(db.Model):
     __tablename__ = 'asset_history'
     
     id = db.Column(db.Integer, primary_key=True)
-    asset_id = db.Column(db.Integer, db.ForeignKey('assets.id'), nullable=False, index=True)
+    asset_id = db.Column(db.Integer, db.ForeignKey('assets.id'), nullable=False)
     
     # Action details
-    action = db.Column(db.String(50), nullable=False, index=True)  # created, updated, assigned, released, maintenance, etc.
+    action = db.Column(db.String(50), nullable=False)  # created, updated, assigned, released, maintenance, etc.
     details = db.Column(db.Text)
     
     # User tracking
-    performed_by_user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    performed_by_user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     from_user_id = db.Column(db.Integer, db.ForeignKey('users.id'))  # For assignment/release tracking
     to_user_id = db.Column(db.Integer, db.ForeignKey('users.id'))    # For assignment tracking
     
@@ -28,6 +28,13 @@ class AssetHistory(db.Model):
     # Timestamp
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     
+    # An asset's history and the activity feed filtered by action or actor are read newest first
+    __table_args__ = (
+        db.Index('ix_asset_history_asset_created', 'asset_id', 'created_at'),
+        db.Index('ix_asset_history_action_created', 'action', 'created_at'),
+        db.Index('ix_asset_history_performed_by_created', 'performed_by_user_id', 'created_at'),
+    )
+    
     # Relationships
     performed_by = db.relationship('User', foreign_keys=[performed_by_user_id], backref='performed_actions')
     from_user = db.relationship('User', foreign_keys=[from_user_id])
@@ -48,8 +55,9 @@ class AssetHistory(db.Model):
         }
     
     @staticmethod
-    def log_action(asset_id, action, performed_by_user_id, details=None, from_user_id=None, to_user_id=None, extra_data=None):
-        """Create a history log entry"""
+    def log_action(asset_id, action, performed_by_user_id, details=None, from_user_id=None, to_user_id=None,
+                   extra_data=None, created_at=None):
+        """Create a history log entry (journaled after commit in write-behind mode)"""
         history = AssetHistory(
             asset_id=asset_id,
             action=action,
@@ -57,10 +65,102 @@ class AssetHistory(db.Model):
             details=details,
             from_user_id=from_user_id,
             to_user_id=to_user_id,
-            extra_data=extra_data
+            extra_data=extra_data,
+            created_at=created_at
         )
-        db.session.add(history)
+        from app.services.history_journal import defer_history
+        if not defer_history(history):
+            db.session.add(history)
         return history
     
     def __repr__(self):
         return f'<AssetHistory {self.id} - {self.action}>'
+
+
+class HistoryArchiveSegment(db.Model):
+    """
+    An append-only block of archived history entries
+    
+    `data` holds the entries as zlib-compressed JSON, oldest first, with the
+    same fields as AssetHistory.to_dict(). Segments are never modified once
+    written, so a decoded segment can be cached by (id, checksum).
+    """
+    
+    __tablename__ = 'history_archive_segments'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    codec = db.Column(db.String(20), nullable=False, default='zlib+json')
+    entry_count = db.Column(db.Integer, nullable=False)
+    first_entry_id = db.Column(db.Integer, nullable=False)
+    last_entry_id = db.Column(db.Integer, nullable=False)
+    first_created_at = db.Column(db.DateTime, nullable=False)
+    last_created_at = db.Column(db.DateTime, nullable=False, index=True)
+    checksum = db.Column(db.BigInteger, nullable=False)  # CRC-32 of data
+    data = db.Column(db.LargeBinary, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<HistoryArchiveSegment {self.id} ({self.entry_count} entries)>'
+
+
+class HistoryArchiveIndex(db.Model):
+    """Which archive segments hold entries of an asset, and their time span"""
+    
+    __tablename__ = 'history_archive_index'
+    
+    asset_id = db.Column(db.Integer, primary_key=True)
+    segment_id = db.Column(db.Integer, db.ForeignKey('history_archive_segments.id'), primary_key=True)
+    entry_count = db.Column(db.Integer, nullable=False)
+    first_created_at = db.Column(db.DateTime, nullable=False)
+    last_created_at = db.Column(db.DateTime, nullable=False)
+    
+    # Cross-asset reads check which assets of a segment are still linked
+    __table_args__ = (
+        db.Index('ix_history_archive_index_segment_id', 'segment_id'),
+    )
+    
+    def __repr__(self):
+        return f'<HistoryArchiveIndex asset {self.asset_id} segment {self.segment_id}>'
+
+
+class HistoryJournalCheckpoint(db.Model):
+    """
+    How far a write-behind journal file has been flushed to asset_history
+    
+    Updated in the same transaction as the rows it covers, so replaying a
+    journal after a crash resumes at the first entry not yet inserted.
+    """
+    
+    __tablename__ = 'history_journal_checkpoints'
+    
+    journal = db.Column(db.String(255), primary_key=True)  # File name
+    offset = db.Column(db.BigInteger, nullable=False, default=0)  # Bytes flushed
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<HistoryJournalCheckpoint {self.journal} @ {self.offset}>'
+
+
+class AssetSnapshot(db.Model):
+    """
+    Full tracked state of an asset at a point in time
+    
+    Taken when an asset is created and after every ASSET_SNAPSHOT_INTERVAL
+    changes; diff_count counts the changes recorded since. Point-in-time
+    reads start from the latest snapshot and replay the diffs after it.
+    """
+    
+    __tablename__ = 'asset_snapshots'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    asset_id = db.Column(db.Integer, db.ForeignKey('assets.id'), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+    state = db.Column(db.JSON, nullable=False)
+    diff_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.Index('ix_asset_snapshots_asset_created', 'asset_id', 'created_at'),
+    )
+    
+    def __repr__(self):
+        return f'<AssetSnapshot asset {self.asset_id} at {self.created_at}>'
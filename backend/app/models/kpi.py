@@ -0,0 +1,90 @@
+"""
+KPI Counter, Resolution Digest, Timeline Rollup and Cache Version Models
+"""
+from datetime import datetime
+from app import db
+
+
+class KpiCounter(db.Model):
+    """
+    A dashboard figure maintained by the write routes
+    
+    One row per (metric, bucket), e.g. ('asset_status', 'Available') or
+    ('ticket_priority', 'High'). value_cents sums the purchase price of the
+    counted assets on the asset_status and asset_category rows.
+    """
+    
+    __tablename__ = 'kpi_counters'
+    
+    METRICS = (
+        'asset_status', 'asset_category', 'asset_department', 'asset_unassigned',
+        'ticket_status', 'ticket_priority', 'license_status'
+    )
+    
+    metric = db.Column(db.String(30), primary_key=True)
+    bucket = db.Column(db.String(50), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    value_cents = db.Column(db.BigInteger, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<KpiCounter {self.metric} {self.bucket}={self.count}>'
+
+
+class ResolutionDigest(db.Model):
+    """
+    Ticket resolution times of one (priority, asset category) group
+    
+    `digest` is a serialized TDigest of hours from creation to resolution,
+    one sample per resolution. Groups merge for coarser percentiles.
+    """
+    
+    __tablename__ = 'resolution_digests'
+    
+    priority = db.Column(db.String(20), primary_key=True)
+    category = db.Column(db.String(50), primary_key=True)
+    digest = db.Column(db.JSON, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<ResolutionDigest {self.priority} {self.category}>'
+
+
+class TimelineRollup(db.Model):
+    """
+    Dashboard timeline events of one period
+    
+    One row per (granularity, period start, metric), e.g. ('month',
+    2024-03-01, 'acquired'). Every event is counted in its day, week, month
+    and quarter, so a chart of any granularity reads one row per period and
+    metric. value_cents sums the purchase price of acquired and retired assets.
+    """
+    
+    __tablename__ = 'timeline_rollups'
+    
+    METRICS = ('acquired', 'retired', 'tickets_opened', 'tickets_closed')
+    
+    granularity = db.Column(db.String(10), primary_key=True)
+    period_start = db.Column(db.Date, primary_key=True)
+    metric = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    value_cents = db.Column(db.BigInteger, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<TimelineRollup {self.granularity} {self.period_start} {self.metric}={self.count}>'
+
+
+class CacheVersion(db.Model):
+    """
+    How many committed transactions have written a table
+    
+    Shared by every worker process: the dashboard response cache keeps an
+    entry only while the versions of the tables it was computed from match.
+    """
+    
+    __tablename__ = 'cache_versions'
+    
+    table_name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<CacheVersion {self.table_name}={self.version}>'
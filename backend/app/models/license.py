@@ -10,6 +10,12 @@ class License(db.Model):
     
     __tablename__ = 'licenses'
     
+    # Fields that can be requested individually via ?fields=
+    serializable_fields = (
+        'id', 'asset_id', 'software_name', 'license_key', 'vendor', 'purchase_date',
+        'expiration_date', 'cost', 'seats', 'status', 'created_at', 'updated_at'
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     asset_id = db.Column(db.Integer, db.ForeignKey('assets.id'), index=True)
     
@@ -28,14 +34,18 @@ class License(db.Model):
     status = db.Column(
         db.Enum('Active', 'Expired', 'Cancelled', name='license_status'),
         nullable=False,
-        default='Active',
-        index=True
+        default='Active'
     )
     
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Expiry checks filter active licenses by expiration date
+    __table_args__ = (
+        db.Index('ix_licenses_status_expiration', 'status', 'expiration_date'),
+    )
+    
     def is_expiring(self, days=30):
         """Check if license expires within specified days"""
         if not self.expiration_date:
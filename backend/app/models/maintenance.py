@@ -10,11 +10,18 @@ class MaintenanceTicket(db.Model):
     
     __tablename__ = 'maintenance_tickets'
     
+    # Fields that can be requested individually via ?fields=
+    serializable_fields = (
+        'id', 'asset_id', 'reported_by_user_id', 'assigned_to_user_id', 'title', 'description',
+        'status', 'priority', 'resolution_notes', 'attachment_url', 'created_at', 'updated_at',
+        'resolved_at'
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     
     # Asset and user relationships
     asset_id = db.Column(db.Integer, db.ForeignKey('assets.id'), nullable=False, index=True)
-    reported_by_user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    reported_by_user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     assigned_to_user_id = db.Column(db.Integer, db.ForeignKey('users.id'), index=True)
     
     # Ticket details
@@ -25,8 +32,7 @@ class MaintenanceTicket(db.Model):
     status = db.Column(
         db.Enum('New', 'Under Review', 'In Progress', 'Resolved', 'Closed', name='ticket_status'),
         nullable=False,
-        default='New',
-        index=True
+        default='New'
     )
     priority = db.Column(
         db.Enum('Low', 'Medium', 'High', 'Critical', name='ticket_priority'),
@@ -46,6 +52,14 @@ class MaintenanceTicket(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     resolved_at = db.Column(db.DateTime)
     
+    # Ticket lists filter by reporter (employees) or status, newest first; the
+    # resolution-time mean reads both timestamps of resolved tickets from an index
+    __table_args__ = (
+        db.Index('ix_maintenance_tickets_reporter_created', 'reported_by_user_id', 'created_at'),
+        db.Index('ix_maintenance_tickets_status_created', 'status', 'created_at'),
+        db.Index('ix_maintenance_tickets_resolved_created', 'resolved_at', 'created_at'),
+    )
+    
     def to_dict(self):
         """Convert to dictionary"""
         return {
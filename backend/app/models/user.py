@@ -11,6 +11,11 @@ class User(db.Model):
     
     __tablename__ = 'users'
     
+    # Fields that can be requested individually via ?fields=
+    serializable_fields = (
+        'id', 'username', 'email', 'role', 'department', 'is_active', 'created_at', 'updated_at'
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(50), unique=True, nullable=False, index=True)
     email = db.Column(db.String(120), unique=True, nullable=False, index=True)
@@ -20,7 +25,7 @@ class User(db.Model):
         nullable=False,
         default='Employee'
     )
-    department = db.Column(db.String(50))
+    department = db.Column(db.String(50), index=True)
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -8,58 +8,71 @@ from app import db
 from app.models.asset import Asset
 from app.models.user import User
 from app.models.history import AssetHistory
+from app.models.license import License
+from app.models.maintenance import MaintenanceTicket
 from app.middleware.auth import require_role, get_current_user, check_asset_ownership
+from app.services.asset_cache import cache_stats, invalidate_assets, load_asset
+from app.services.asset_import import import_assets, iter_csv, iter_ndjson
+from app.services.asset_versions import TRACKED_FIELDS, asset_as_of, asset_state, log_change, parse_as_of, track_changes
+from app.services.change_feed import record_changes, record_ticket_changes
+from app.services.depreciation import depreciation_for_rows
+from app.services.depreciation_schedule import schedule_key, update_schedules
+from app.services.events import publish_asset_status
+from app.services.history_archive import archive_history, archive_stats, asset_history, forget_archived_history
+from app.services.history_journal import journal_stats
+from app.services.kpis import (
+    asset_counter_key, departments_of, license_counter_key, ticket_counter_key, update_counters
+)
+from app.services.search import apply_search
+from app.utils.conditional import build_etag, collection_version, latest_update, not_modified, with_validators
+from app.utils.fields import InvalidFields, parse_fields, field_columns, serialize_row
+from app.utils.pagination import InvalidCursor, paginate, get_page_limit, count_total, decode_cursor, encode_cursor
 
 bp = Blueprint('assets', __name__)
 
 
-@bp.route('/', methods=['GET'])
-@jwt_required()
-def get_assets():
+# Stable keyset sort orders: (columns, descending)
+ASSET_SORTS = {
+    'name': ((Asset.name, Asset.id), False),
+    'updated_at': ((Asset.updated_at, Asset.id), True),
+}
+
+
+def apply_asset_filters(query, args, ranked=False):
     """
-    List assets with advanced filtering
-    Query params:
-    - category: Filter by category
-    - status: Filter by status
-    - assigned_to: Filter by assigned user ID
-    - department: Filter by user department
-    - purchase_date_from: Start date (YYYY-MM-DD)
-    - purchase_date_to: End date (YYYY-MM-DD)
-    - warranty_expiring_days: Assets expiring within X days
-    - search: Search in name, serial number, description
+    Apply the asset list filters from query params to a query
+    With ranked=True, search results are ordered best match first
     """
-    query = Asset.query
-    
     # Category filter
-    category = request.args.get('category')
+    category = args.get('category')
     if category:
-        query = query.filter_by(category=category)
+        query = query.filter(Asset.category == category)
     
     # Status filter
-    status = request.args.get('status')
+    status = args.get('status')
     if status:
-        query = query.filter_by(status=status)
+        query = query.filter(Asset.status == status)
     
     # Assigned user filter
-    assigned_to = request.args.get('assigned_to')
+    assigned_to = args.get('assigned_to')
     if assigned_to:
-        query = query.filter_by(assigned_to_user_id=int(assigned_to))
+        query = query.filter(Asset.assigned_to_user_id == int(assigned_to))
     
     # Department filter (via user)
-    department = request.args.get('department')
+    department = args.get('department')
     if department:
         query = query.join(User, Asset.assigned_to_user_id == User.id).filter(User.department == department)
     
     # Purchase date range filter
-    purchase_date_from = request.args.get('purchase_date_from')
-    purchase_date_to = request.args.get('purchase_date_to')
+    purchase_date_from = args.get('purchase_date_from')
+    purchase_date_to = args.get('purchase_date_to')
     if purchase_date_from:
         query = query.filter(Asset.purchase_date >= datetime.strptime(purchase_date_from, '%Y-%m-%d').date())
     if purchase_date_to:
         query = query.filter(Asset.purchase_date <= datetime.strptime(purchase_date_to, '%Y-%m-%d').date())
     
     # Warranty expiring filter
-    warranty_expiring_days = request.args.get('warranty_expiring_days')
+    warranty_expiring_days = args.get('warranty_expiring_days')
     if warranty_expiring_days:
         days = int(warranty_expiring_days)
         today = datetime.now().date()
@@ -70,25 +83,109 @@ def get_assets():
             Asset.warranty_expiration <= expiry_threshold
         )
     
-    # Search filter
-    search = request.args.get('search')
+    # Search filter (full-text index where available)
+    search = args.get('search')
     if search:
-        search_pattern = f'%{search}%'
-        query = query.filter(
-            db.or_(
-                Asset.name.ilike(search_pattern),
-                Asset.serial_number.ilike(search_pattern),
-                Asset.description.ilike(search_pattern)
-            )
-        )
-    
-    # Execute query
-    assets = query.all()
+        query, rank = apply_search(query, search)
+        if ranked and rank is not None:
+            query = query.order_by(rank)
     
+    return query
+
+
+@bp.route('/', methods=['GET'])
+@jwt_required()
+def get_assets():
+    """
+    List assets with advanced filtering
+    Query params:
+    - category: Filter by category
+    - status: Filter by status
+    - assigned_to: Filter by assigned user ID
+    - department: Filter by user department
+    - purchase_date_from: Start date (YYYY-MM-DD)
+    - purchase_date_to: End date (YYYY-MM-DD)
+    - warranty_expiring_days: Assets expiring within X days
+    - search: Substring search in name, serial number, description (indexed where available)
+    Pagination (enabled when limit or cursor is given):
+    - limit: Page size (capped at PAGINATION_MAX_LIMIT)
+    - cursor: Opaque next_cursor from the previous page
+    - sort: name (default) or updated_at (newest first)
+    - total: exact for a full COUNT(*), estimate for a bounded count
+    - fields: Comma-separated columns to return (column-only SELECT)
+    """
     # Include depreciation if requested
     include_depreciation = request.args.get('include_depreciation', 'false').lower() == 'true'
+    paginated = 'limit' in request.args or 'cursor' in request.args
+    
+    sort = request.args.get('sort', 'name')
+    if sort not in ASSET_SORTS:
+        return jsonify({'error': f'Invalid sort. Must be one of: {", ".join(ASSET_SORTS)}'}), 400
+    columns, descending = ASSET_SORTS[sort]
+    
+    try:
+        fields = parse_fields(request.args, Asset)
+    except InvalidFields as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if fields:
+        # Column-only SELECT; also fetch the sort key and depreciation inputs
+        extra = list(columns) if paginated else []
+        if include_depreciation:
+            extra += [Asset.category, Asset.purchase_price, Asset.purchase_date]
+        query = db.session.query(*field_columns(Asset, fields, extra)).select_from(Asset)
+    else:
+        query = Asset.query
+    
+    def serialize_all(items):
+        data = [serialize_row(item, fields) if fields else item.to_dict() for item in items]
+        if include_depreciation:
+            # One pass over the whole result set with a shared "today"
+            for entry, depreciation in zip(data, depreciation_for_rows(items)):
+                entry['depreciation'] = depreciation
+        return data
+    
+    query = apply_asset_filters(query, request.args, ranked=True)
+    
+    # Collection validator: the filter set's MAX(updated_at) and COUNT(*)
+    latest, count = collection_version(query, Asset.updated_at)
+    etag = build_etag(
+        'assets', request.query_string, latest, count,
+        latest_update(User) if request.args.get('department') else None,
+        include_depreciation and datetime.now().date()
+    )
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
+    # Unpaginated listing
+    if not paginated:
+        assets = query.all()
+        response = jsonify(serialize_all(assets))
+        return with_validators(response, etag), 200
+    
+    limit = get_page_limit(request.args)
+    
+    try:
+        assets, next_cursor = paginate(
+            query, sort, columns, limit,
+            cursor=request.args.get('cursor'),
+            descending=descending
+        )
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    
+    response = {
+        'items': serialize_all(assets),
+        'next_cursor': next_cursor,
+        'limit': limit
+    }
     
-    return jsonify([asset.to_dict(include_depreciation=include_depreciation) for asset in assets]), 200
+    total_mode = request.args.get('total')
+    if total_mode in ('exact', 'estimate'):
+        response['total'], response['total_capped'] = count_total(query, total_mode)
+    
+    return with_validators(jsonify(response), etag), 200
 
 
 @bp.route('/', methods=['POST'])
@@ -139,14 +236,13 @@ def create_asset():
         db.session.flush()  # Get asset ID
         
         # Log creation
-        AssetHistory.log_action(
-            asset_id=asset.id,
-            action='created',
-            performed_by_user_id=current_user.id,
-            details=f'Asset created: {asset.name}'
-        )
+        log_change(asset, None, 'created', current_user.id, details=f'Asset created: {asset.name}')
+        update_schedules(added=[schedule_key(asset)])
+        update_counters(added=[asset_counter_key(asset)])
+        record_changes('asset', 'insert', [asset.id])
         
         db.session.commit()
+        publish_asset_status([(asset.id, None, asset.status)])
         
         return jsonify({
             'message': 'Asset created successfully',
@@ -157,17 +253,104 @@ def create_asset():
         return jsonify({'error': 'Failed to create asset', 'details': str(e)}), 500
 
 
+@bp.route('/bulk', methods=['POST'])
+@jwt_required()
+@require_role(['Admin', 'Asset Manager'])
+def bulk_import_assets():
+    """
+    Bulk import assets from CSV or NDJSON
+    Send the file as the `file` form field (.csv / .ndjson / .jsonl) or as the
+    raw body with Content-Type text/csv or application/x-ndjson. CSV headers
+    use the asset field names (or the export headers). Valid rows are
+    inserted in chunks; the response counts every rejected row and lists the
+    errors of the first BULK_IMPORT_MAX_ERRORS. A file that is not valid
+    UTF-8 (or not valid CSV) stops the import with a 400.
+    """
+    from flask import current_app
+    
+    upload = request.files.get('file')
+    if upload:
+        stream = upload.stream
+        fmt = 'csv' if upload.filename.lower().endswith('.csv') else 'ndjson'
+    else:
+        stream = request.stream
+        mimetype = request.mimetype
+        if mimetype in ('text/csv', 'application/csv'):
+            fmt = 'csv'
+        elif mimetype in ('application/x-ndjson', 'application/jsonl', 'application/json-lines'):
+            fmt = 'ndjson'
+        else:
+            return jsonify({'error': 'Unsupported format. Send CSV or NDJSON'}), 415
+    
+    rows = iter_csv(stream) if fmt == 'csv' else iter_ndjson(stream)
+    current_user = get_current_user()
+    
+    report = import_assets(
+        rows,
+        performed_by_user_id=current_user.id,
+        chunk_size=current_app.config.get('BULK_IMPORT_CHUNK_SIZE', 1000),
+        max_errors=current_app.config.get('BULK_IMPORT_MAX_ERRORS', 100)
+    )
+    if 'error' in report:
+        return jsonify({
+            'message': f'Import stopped after {report["created"]} assets: {report["error"]}',
+            **report
+        }), 400
+    
+    return jsonify({
+        'message': f'Imported {report["created"]} assets, {report["failed"]} rows rejected',
+        **report
+    }), 200
+
+
 @bp.route('/<int:asset_id>', methods=['GET'])
 @jwt_required()
 def get_asset(asset_id):
-    """Get asset by ID"""
-    asset = Asset.query.get(asset_id)
+    """
+    Get asset by ID
+    Query params:
+    - include_depreciation: Add the current depreciation
+    - as_of: Rebuild the asset as it was at this time (ISO 8601, UTC; a date means the end of that day)
+    """
+    asset = load_asset(asset_id)
     
     if not asset:
         return jsonify({'error': 'Asset not found'}), 404
     
+    as_of = request.args.get('as_of')
+    if as_of:
+        try:
+            as_of = parse_as_of(as_of)
+        except ValueError:
+            return jsonify({'error': 'Invalid as_of format. Use YYYY-MM-DD or an ISO 8601 timestamp'}), 400
+        
+        rebuilt = asset_as_of(asset.id, as_of)
+        if rebuilt is None:
+            if asset.created_at and as_of < asset.created_at:
+                return jsonify({'error': 'Asset did not exist at that time'}), 404
+            return jsonify({'error': 'No recorded state for this asset at that time'}), 404
+        
+        state, snapshot_at, applied = rebuilt
+        return jsonify({
+            'id': asset.id,
+            **state,
+            'created_at': asset.created_at.isoformat() if asset.created_at else None,
+            'as_of': as_of.isoformat(),
+            'snapshot_at': snapshot_at.isoformat(),
+            'changes_applied': applied
+        }), 200
+    
     include_depreciation = request.args.get('include_depreciation', 'false').lower() == 'true'
-    return jsonify(asset.to_dict(include_depreciation=include_depreciation)), 200
+    
+    # Depreciation changes daily, so it is part of the validator
+    etag = build_etag('asset', asset.id, asset.updated_at, include_depreciation and datetime.now().date())
+    last_modified = None if include_depreciation else asset.updated_at
+    cached = not_modified(etag, last_modified)
+    if cached:
+        return cached
+    
+    response = jsonify(asset.to_dict(include_depreciation=include_depreciation))
+    return with_validators(response, etag, last_modified), 200
 
 
 @bp.route('/<int:asset_id>', methods=['PUT'])
@@ -175,7 +358,7 @@ def get_asset(asset_id):
 @require_role(['Admin', 'Asset Manager'])
 def update_asset(asset_id):
     """Update asset"""
-    asset = Asset.query.get(asset_id)
+    asset = db.session.get(Asset, asset_id)
     
     if not asset:
         return jsonify({'error': 'Asset not found'}), 404
@@ -183,6 +366,9 @@ def update_asset(asset_id):
     data = request.get_json()
     current_user = get_current_user()
     changes = []
+    schedule_before = schedule_key(asset)
+    counter_before = asset_counter_key(asset)
+    state_before = asset_state(asset)
     
     # Update allowed fields
     simple_fields = ['name', 'description', 'category', 'serial_number', 'status', 'condition', 'location', 'purchase_price']
@@ -211,18 +397,19 @@ def update_asset(asset_id):
         except ValueError:
             return jsonify({'error': 'Invalid warranty_expiration format. Use YYYY-MM-DD'}), 400
     
-    asset.updated_at = db.func.now()
+    asset.updated_at = datetime.utcnow()
     
     try:
         if changes:
-            AssetHistory.log_action(
-                asset_id=asset.id,
-                action='updated',
-                performed_by_user_id=current_user.id,
-                details=f'Asset updated: {", ".join(changes)}'
-            )
+            log_change(asset, state_before, 'updated', current_user.id, details=f'Asset updated: {", ".join(changes)}')
+        if schedule_key(asset) != schedule_before:
+            update_schedules(removed=[schedule_before], added=[schedule_key(asset)])
+        update_counters(removed=[counter_before], added=[asset_counter_key(asset)])
+        record_changes('asset', 'update', [asset.id])
         
         db.session.commit()
+        invalidate_assets(asset.id)
+        publish_asset_status([(asset.id, state_before['status'], asset.status)])
         return jsonify({
             'message': 'Asset updated successfully',
             'asset': asset.to_dict()
@@ -237,7 +424,7 @@ def update_asset(asset_id):
 @require_role(['Admin', 'Asset Manager'])
 def delete_asset(asset_id):
     """Delete asset"""
-    asset = Asset.query.get(asset_id)
+    asset = db.session.get(Asset, asset_id)
     
     if not asset:
         return jsonify({'error': 'Asset not found'}), 404
@@ -247,8 +434,26 @@ def delete_asset(asset_id):
         return jsonify({'error': 'Cannot delete an assigned asset. Please release it first.'}), 400
     
     try:
+        update_schedules(removed=[schedule_key(asset)])
+        forget_archived_history(asset_id)
+        # Tickets and licenses of the asset are deleted with it
+        tickets = asset.maintenance_tickets.with_entities(
+            MaintenanceTicket.id, MaintenanceTicket.reported_by_user_id, MaintenanceTicket.status, MaintenanceTicket.priority,
+            MaintenanceTicket.created_at, MaintenanceTicket.resolved_at
+        ).all()
+        licenses = asset.licenses.with_entities(License.id, License.status).all()
+        update_counters(removed=[
+            asset_counter_key(asset),
+            *(ticket_counter_key(ticket) for ticket in tickets),
+            *(license_counter_key(license) for license in licenses)
+        ])
+        record_ticket_changes('delete', tickets)
+        record_changes('license', 'delete', [license.id for license in licenses])
+        record_changes('asset', 'delete', [asset_id])
         db.session.delete(asset)
         db.session.commit()
+        invalidate_assets(asset_id)
+        publish_asset_status([(asset_id, asset.status, None)])
         return jsonify({'message': f'Asset {asset.name} deleted successfully'}), 200
     except Exception as e:
         db.session.rollback()
@@ -260,7 +465,8 @@ def delete_asset(asset_id):
 @require_role(['Admin', 'Asset Manager', 'HR'])
 def assign_asset(asset_id):
     """Assign asset to user"""
-    asset = Asset.query.get(asset_id)
+    # Lock the row: the status check below decides the write
+    asset = db.session.get(Asset, asset_id, with_for_update=True)
     
     if not asset:
         return jsonify({'error': 'Asset not found'}), 404
@@ -279,24 +485,28 @@ def assign_asset(asset_id):
     
     current_user = get_current_user()
     old_user_id = asset.assigned_to_user_id
+    state_before = asset_state(asset)
+    counter_before = asset_counter_key(asset)
     
     # Assign asset
     asset.assigned_to_user_id = user.id
     asset.status = 'Assigned'
-    asset.updated_at = db.func.now()
+    asset.updated_at = datetime.utcnow()
     
     try:
         # Log assignment
-        AssetHistory.log_action(
-            asset_id=asset.id,
-            action='assigned',
-            performed_by_user_id=current_user.id,
+        log_change(
+            asset, state_before, 'assigned', current_user.id,
             from_user_id=old_user_id,
             to_user_id=user.id,
             details=f'Asset assigned to {user.username}'
         )
+        update_counters(removed=[counter_before], added=[asset_counter_key(asset, {user.id: user.department})])
+        record_changes('asset', 'update', [asset.id])
         
         db.session.commit()
+        invalidate_assets(asset.id)
+        publish_asset_status([(asset.id, state_before['status'], asset.status)])
         return jsonify({
             'message': f'Asset assigned to {user.username}',
             'asset': asset.to_dict()
@@ -310,7 +520,8 @@ def assign_asset(asset_id):
 @jwt_required()
 def release_asset(asset_id):
     """Release asset from user"""
-    asset = Asset.query.get(asset_id)
+    # Lock the row: the status check below decides the write
+    asset = db.session.get(Asset, asset_id, with_for_update=True)
     
     if not asset:
         return jsonify({'error': 'Asset not found'}), 404
@@ -325,23 +536,27 @@ def release_asset(asset_id):
         return jsonify({'error': 'You can only release your own assets'}), 403
     
     old_user_id = asset.assigned_to_user_id
+    state_before = asset_state(asset)
+    counter_before = asset_counter_key(asset)
     
     # Release asset
     asset.assigned_to_user_id = None
     asset.status = 'Available'
-    asset.updated_at = db.func.now()
+    asset.updated_at = datetime.utcnow()
     
     try:
         # Log release
-        AssetHistory.log_action(
-            asset_id=asset.id,
-            action='released',
-            performed_by_user_id=current_user.id,
+        log_change(
+            asset, state_before, 'released', current_user.id,
             from_user_id=old_user_id,
             details='Asset released and marked as available'
         )
+        update_counters(removed=[counter_before], added=[asset_counter_key(asset)])
+        record_changes('asset', 'update', [asset.id])
         
         db.session.commit()
+        invalidate_assets(asset.id)
+        publish_asset_status([(asset.id, state_before['status'], asset.status)])
         return jsonify({
             'message': 'Asset released successfully',
             'asset': asset.to_dict()
@@ -351,28 +566,327 @@ def release_asset(asset_id):
         return jsonify({'error': 'Failed to release asset', 'details': str(e)}), 500
 
 
+# Columns needed to diff set-based batch changes and build their counter keys
+_STATE_COLUMNS = (Asset.id, Asset.updated_at, Asset.created_at, *(getattr(Asset, field) for field in TRACKED_FIELDS))
+
+
+def _track_batch(history, assets, now, status):
+    """Add per-field diffs to batch assign/release history entries and update snapshots"""
+    changes = []
+    for entry in history:
+        before = asset_state(assets[entry['asset_id']])
+        after = dict(before, status=status, assigned_to_user_id=entry.get('to_user_id'), updated_at=now.isoformat())
+        changes.append((entry['asset_id'], before, after, now))
+    for entry, diff in zip(history, track_changes(changes)):
+        entry['extra_data'] = {'changes': diff}
+        entry['created_at'] = now
+
+
+def _batch_items(data, key):
+    """Validate the item list of a batch request, returning (items, error response)"""
+    from flask import current_app
+    
+    if not isinstance(data, dict):
+        return None, (jsonify({'error': 'Request body must be a JSON object'}), 400)
+    items = data.get(key)
+    if not isinstance(items, list) or not items:
+        return None, (jsonify({'error': f'{key} must be a non-empty list'}), 400)
+    
+    max_items = current_app.config.get('BULK_ASSIGN_MAX_ITEMS', 1000)
+    if len(items) > max_items:
+        return None, (jsonify({'error': f'At most {max_items} items per request'}), 400)
+    
+    return items, None
+
+
+def _is_id(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _update_each(statement, params):
+    """
+    Run a guarded UPDATE for every parameter set; True if each matched a row.
+    One executemany where the driver reports its total rowcount, otherwise
+    one statement per set.
+    """
+    if db.engine.dialect.supports_sane_multi_rowcount:
+        return db.session.execute(statement, params).rowcount == len(params)
+    return all(db.session.execute(statement, param).rowcount == 1 for param in params)
+
+
+def _finish_batch(action, past_tense, applied, failed, atomic, status_changes):
+    """Commit or roll back a batch, publish its (asset_id, old, new) status changes and build its response"""
+    if atomic and failed:
+        db.session.rollback()
+        return jsonify({
+            'error': f'Batch {action} rejected, no assets were changed',
+            'failed': failed
+        }), 400
+    
+    try:
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to {action} assets', 'details': str(e)}), 500
+    invalidate_assets(*applied)
+    publish_asset_status(status_changes)
+    
+    return jsonify({
+        'message': f'{len(applied)} assets {past_tense}, {len(failed)} failed',
+        'succeeded': applied,
+        'failed': failed
+    }), 200
+
+
+@bp.route('/bulk-assign', methods=['POST'])
+@jwt_required()
+@require_role(['Admin', 'Asset Manager', 'HR'])
+def bulk_assign_assets():
+    """
+    Assign many assets in one transaction
+    Body: {"assignments": [{"asset_id": 1, "user_id": 2}, ...], "atomic": true}
+    atomic=true (default) applies nothing if any item fails; atomic=false
+    applies the valid items and reports the rest.
+    """
+    from sqlalchemy import bindparam
+    
+    data = request.get_json()
+    assignments, error = _batch_items(data, 'assignments')
+    if error:
+        return error
+    atomic = data.get('atomic', True)
+    
+    asset_ids = [item.get('asset_id') for item in assignments if isinstance(item, dict) and _is_id(item.get('asset_id'))]
+    user_ids = [item.get('user_id') for item in assignments if isinstance(item, dict) and _is_id(item.get('user_id'))]
+    
+    # One SELECT each for the assets and target users of the whole batch
+    assets = {row.id: row for row in db.session.query(*_STATE_COLUMNS).filter(Asset.id.in_(asset_ids))}
+    users = {
+        row.id: row for row in db.session.query(User.id, User.username, User.department).filter(User.id.in_(user_ids))
+    }
+    
+    current_user = get_current_user()
+    updates, history, applied, failed, seen = [], [], [], [], set()
+    for item in assignments:
+        if not isinstance(item, dict) or not _is_id(item.get('asset_id')) or not _is_id(item.get('user_id')):
+            failed.append({'item': item, 'error': 'asset_id and user_id are required integers'})
+            continue
+        asset_id = item['asset_id']
+        asset = assets.get(asset_id)
+        user = users.get(item['user_id'])
+        if asset_id in seen:
+            failed.append({'asset_id': asset_id, 'error': 'Duplicate asset in batch'})
+        elif not asset:
+            failed.append({'asset_id': asset_id, 'error': 'Asset not found'})
+        elif asset.status == 'Assigned':
+            failed.append({'asset_id': asset_id, 'error': 'Asset is already assigned'})
+        elif not user:
+            failed.append({'asset_id': asset_id, 'error': 'User not found'})
+        else:
+            seen.add(asset_id)
+            updates.append({'b_id': asset_id, 'b_user_id': user.id})
+            history.append({
+                'asset_id': asset_id,
+                'action': 'assigned',
+                'performed_by_user_id': current_user.id,
+                'from_user_id': asset.assigned_to_user_id,
+                'to_user_id': user.id,
+                'details': f'Asset assigned to {user.username}'
+            })
+            applied.append(asset_id)
+    
+    if updates and not (atomic and failed):
+        # The status guard makes a concurrent assignment show up as a rowcount mismatch
+        now = datetime.utcnow()
+        matched = _update_each(
+            Asset.__table__.update()
+            .where(Asset.id == bindparam('b_id'), Asset.status != 'Assigned')
+            .values(assigned_to_user_id=bindparam('b_user_id'), status='Assigned', updated_at=now),
+            updates
+        )
+        if not matched:
+            db.session.rollback()
+            return jsonify({'error': 'Some assets were modified concurrently, please retry'}), 409
+        _track_batch(history, assets, now, status='Assigned')
+        db.session.execute(AssetHistory.__table__.insert(), history)
+        # Assets may still have a previous assignee, e.g. when under maintenance
+        departments = departments_of(entry['from_user_id'] for entry in history)
+        departments.update((user.id, user.department) for user in users.values())
+        removed = [asset_counter_key(assets[entry['asset_id']], departments) for entry in history]
+        update_counters(removed=removed, added=[
+            key._replace(status='Assigned', department=departments.get(entry['to_user_id']) or '')
+            for key, entry in zip(removed, history)
+        ])
+        record_changes('asset', 'update', applied)
+    
+    status_changes = [(asset_id, assets[asset_id].status, 'Assigned') for asset_id in applied]
+    return _finish_batch('assign', 'assigned', applied, failed, atomic, status_changes)
+
+
+@bp.route('/bulk-release', methods=['POST'])
+@jwt_required()
+def bulk_release_assets():
+    """
+    Release many assets in one transaction
+    Body: {"asset_ids": [1, 2, ...], "atomic": true}
+    Employees can only release their own assets.
+    """
+    from sqlalchemy import bindparam
+    
+    data = request.get_json()
+    asset_ids, error = _batch_items(data, 'asset_ids')
+    if error:
+        return error
+    atomic = data.get('atomic', True)
+    
+    assets = {
+        row.id: row for row in db.session.query(*_STATE_COLUMNS).filter(Asset.id.in_(filter(_is_id, asset_ids)))
+    }
+    
+    current_user = get_current_user()
+    history, applied, failed, seen = [], [], [], set()
+    for asset_id in asset_ids:
+        if not _is_id(asset_id):
+            failed.append({'asset_id': asset_id, 'error': 'asset_id must be an integer'})
+            continue
+        asset = assets.get(asset_id)
+        if asset_id in seen:
+            failed.append({'asset_id': asset_id, 'error': 'Duplicate asset in batch'})
+        elif not asset:
+            failed.append({'asset_id': asset_id, 'error': 'Asset not found'})
+        elif asset.status != 'Assigned':
+            failed.append({'asset_id': asset_id, 'error': 'Asset is not assigned'})
+        elif current_user.role == 'Employee' and not check_asset_ownership(asset, current_user):
+            failed.append({'asset_id': asset_id, 'error': 'You can only release your own assets'})
+        else:
+            history.append({
+                'asset_id': asset_id,
+                'action': 'released',
+                'performed_by_user_id': current_user.id,
+                'from_user_id': asset.assigned_to_user_id,
+                'details': 'Asset released and marked as available'
+            })
+            seen.add(asset_id)
+            applied.append(asset_id)
+    
+    if applied and not (atomic and failed):
+        # Set-based release; rows are matched on their previous assignee (possibly none) to detect races
+        now = datetime.utcnow()
+        matched = _update_each(
+            Asset.__table__.update()
+            .where(
+                Asset.id == bindparam('b_id'),
+                Asset.status == 'Assigned',
+                Asset.assigned_to_user_id.is_not_distinct_from(bindparam('b_user_id'))
+            )
+            .values(assigned_to_user_id=None, status='Available', updated_at=now),
+            [{'b_id': entry['asset_id'], 'b_user_id': entry['from_user_id']} for entry in history]
+        )
+        if not matched:
+            db.session.rollback()
+            return jsonify({'error': 'Some assets were modified concurrently, please retry'}), 409
+        _track_batch(history, assets, now, status='Available')
+        db.session.execute(AssetHistory.__table__.insert(), history)
+        departments = departments_of(entry['from_user_id'] for entry in history)
+        removed = [asset_counter_key(assets[asset_id], departments) for asset_id in applied]
+        update_counters(removed=removed, added=[key._replace(status='Available', department=None) for key in removed])
+        record_changes('asset', 'update', applied)
+    
+    status_changes = [(asset_id, 'Assigned', 'Available') for asset_id in applied]
+    return _finish_batch('release', 'released', applied, failed, atomic, status_changes)
+
+
 @bp.route('/<int:asset_id>/history', methods=['GET'])
 @jwt_required()
 def get_asset_history(asset_id):
-    """Get asset history/audit logs"""
-    asset = Asset.query.get(asset_id)
+    """
+    Get asset history/audit logs, newest first, including archived entries
+    Query params:
+    - action: Filter by action (comma-separated for several)
+    - date_from: Entries on or after this date (YYYY-MM-DD)
+    - date_to: Entries on or before this date (YYYY-MM-DD)
+    Pagination (enabled when limit or cursor is given):
+    - limit: Page size (capped at PAGINATION_MAX_LIMIT)
+    - cursor: Opaque next_cursor from the previous page
+    """
+    asset = load_asset(asset_id)
     
     if not asset:
         return jsonify({'error': 'Asset not found'}), 404
     
-    history = asset.history.all()
+    actions = request.args.get('action')
+    try:
+        since = request.args.get('date_from')
+        since = datetime.strptime(since, '%Y-%m-%d') if since else None
+        until = request.args.get('date_to')
+        until = datetime.strptime(until, '%Y-%m-%d') + timedelta(days=1) if until else None
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
     
-    # Enrich with user information
-    result = []
-    for entry in history:
-        entry_dict = entry.to_dict()
-        if entry.performed_by:
-            entry_dict['performed_by'] = entry.performed_by.username
-        if entry.from_user:
-            entry_dict['from_user'] = entry.from_user.username
-        if entry.to_user:
-            entry_dict['to_user'] = entry.to_user.username
-        result.append(entry_dict)
+    # Unpaginated listing
+    if 'limit' not in request.args and 'cursor' not in request.args:
+        history, _ = asset_history(asset_id, actions and actions.split(','), since, until)
+        return jsonify(history), 200
+    
+    limit = get_page_limit(request.args)
+    
+    cursor = request.args.get('cursor')
+    try:
+        after = decode_cursor(cursor, 'history') if cursor else None
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    
+    history, more = asset_history(asset_id, actions and actions.split(','), since, until, limit, after)
+    
+    next_cursor = None
+    if more:
+        last = history[-1]
+        next_cursor = encode_cursor('history', [datetime.fromisoformat(last['created_at']), last['id']])
+    
+    return jsonify({
+        'items': history,
+        'next_cursor': next_cursor,
+        'limit': limit
+    }), 200
+
+
+@bp.route('/history/archive', methods=['GET'])
+@jwt_required()
+@require_role(['Admin'])
+def get_history_archive_stats():
+    """Sizes of the hot history table and the compressed archive, and journal counters"""
+    stats = archive_stats()
+    stats['journal'] = journal_stats()
+    return jsonify(stats), 200
+
+
+@bp.route('/history/archive', methods=['POST'])
+@jwt_required()
+@require_role(['Admin'])
+def run_history_archive():
+    """
+    Move old history entries into the compressed archive
+    Body (optional):
+    - older_than_days: Age threshold (default HISTORY_ARCHIVE_AFTER_DAYS)
+    - max_chunks: Stop after this many segments; run again while remaining is true
+    """
+    data = request.get_json(silent=True) or {}
+    
+    older_than = None
+    if 'older_than_days' in data:
+        days = data['older_than_days']
+        if not isinstance(days, int) or isinstance(days, bool) or days < 0:
+            return jsonify({'error': 'older_than_days must be a non-negative integer'}), 400
+        older_than = datetime.utcnow() - timedelta(days=days)
+    
+    max_chunks = data.get('max_chunks')
+    if max_chunks is not None and (not isinstance(max_chunks, int) or isinstance(max_chunks, bool) or max_chunks < 1):
+        return jsonify({'error': 'max_chunks must be a positive integer'}), 400
+    
+    try:
+        result = archive_history(older_than, max_chunks=max_chunks)
+    except Exception as e:
+        return jsonify({'error': 'Failed to archive history', 'details': str(e)}), 500
     
     return jsonify(result), 200
 
@@ -381,7 +895,7 @@ def get_asset_history(asset_id):
 @jwt_required()
 def get_asset_depreciation(asset_id):
     """Calculate asset depreciation"""
-    asset = Asset.query.get(asset_id)
+    asset = load_asset(asset_id)
     
     if not asset:
         return jsonify({'error': 'Asset not found'}), 404
@@ -394,43 +908,96 @@ def get_asset_depreciation(asset_id):
     return jsonify(depreciation), 200
 
 
-@bp.route('/export', methods=['GET'])
-@jwt_required()
-@require_role(['Admin', 'Asset Manager'])
-def export_assets():
-    """Export assets to CSV format"""
+EXPORT_HEADER = [
+    'ID', 'Name', 'Category', 'Serial Number', 'Status', 'Condition',
+    'Purchase Date', 'Purchase Price', 'Warranty Expiration',
+    'Assigned To', 'Location', 'Created At'
+]
+
+
+def _export_rows(query, batch_size):
+    """Yield CSV text chunks, one per batch of rows"""
     import csv
     from io import StringIO
     
-    assets = Asset.query.all()
-    
-    # Create CSV in memory
-    si = StringIO()
-    writer = csv.writer(si)
-    
-    # Write header
-    writer.writerow([
-        'ID', 'Name', 'Category', 'Serial Number', 'Status', 'Condition',
-        'Purchase Date', 'Purchase Price', 'Warranty Expiration',
-        'Assigned To', 'Location', 'Created At'
-    ])
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_HEADER)
     
-    # Write data
-    for asset in assets:
-        assigned_to = asset.assigned_user.username if asset.assigned_user else ''
+    pending = 0
+    for row in query.yield_per(batch_size):
         writer.writerow([
-            asset.id, asset.name, asset.category, asset.serial_number or '',
-            asset.status, asset.condition,
-            asset.purchase_date or '', asset.purchase_price or '',
-            asset.warranty_expiration or '',
-            assigned_to, asset.location or '', asset.created_at
+            row.id, row.name, row.category, row.serial_number or '',
+            row.status, row.condition,
+            row.purchase_date or '', row.purchase_price or '',
+            row.warranty_expiration or '',
+            row.assigned_to or '', row.location or '', row.created_at
         ])
+        pending += 1
+        if pending >= batch_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    
+    yield buffer.getvalue()
+
+
+def _gzip_chunks(chunks):
+    """Gzip-compress a stream of text chunks on the fly"""
+    import zlib
+    
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 writes a gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+@bp.route('/export', methods=['GET'])
+@jwt_required()
+@require_role(['Admin', 'Asset Manager'])
+def export_assets():
+    """
+    Stream assets as CSV
+    Accepts the same filters as the asset listing; gzip=true compresses the
+    download on the fly. Rows are read in server-side batches so memory stays
+    flat regardless of inventory size.
+    """
+    from flask import Response, current_app, stream_with_context
+    from sqlalchemy.orm import aliased
+    
+    assignee = aliased(User)
+    query = db.session.query(
+        Asset.id, Asset.name, Asset.category, Asset.serial_number,
+        Asset.status, Asset.condition, Asset.purchase_date, Asset.purchase_price,
+        Asset.warranty_expiration, Asset.location, Asset.created_at,
+        assignee.username.label('assigned_to')
+    ).select_from(Asset).outerjoin(assignee, Asset.assigned_to_user_id == assignee.id)
+    query = apply_asset_filters(query, request.args).order_by(Asset.id)
+    query = query.execution_options(stream_results=True)
+    
+    batch_size = current_app.config.get('EXPORT_BATCH_SIZE', 1000)
+    chunks = _export_rows(query, batch_size)
+    
+    if request.args.get('gzip', 'false').lower() == 'true':
+        return Response(
+            stream_with_context(_gzip_chunks(chunks)),
+            mimetype='application/gzip',
+            headers={'Content-Disposition': 'attachment; filename=assets_export.csv.gz'}
+        )
     
-    output = si.getvalue()
-    
-    from flask import Response
     return Response(
-        output,
+        stream_with_context(chunks),
         mimetype='text/csv',
         headers={'Content-Disposition': 'attachment; filename=assets_export.csv'}
     )
+
+
+@bp.route('/cache-stats', methods=['GET'])
+@jwt_required()
+@require_role(['Admin'])
+def get_cache_stats():
+    """Asset cache size and hit/miss counters"""
+    return jsonify(cache_stats()), 200
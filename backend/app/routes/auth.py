@@ -8,9 +8,11 @@ from flask_jwt_extended import (
     jwt_required,
     get_jwt_identity
 )
+from datetime import datetime
 from app import db
 from app.models.user import User
 from app.middleware.auth import get_current_user
+from app.services.kpis import move_department
 
 bp = Blueprint('auth', __name__)
 
@@ -137,6 +139,7 @@ def update_me():
         return jsonify({'error': 'User not found'}), 404
     
     data = request.get_json()
+    department_before = user.department
     
     # Only allow updating certain fields
     allowed_fields = ['email', 'department']
@@ -144,9 +147,10 @@ def update_me():
         if field in data:
             setattr(user, field, data[field])
     
-    user.updated_at = db.func.now()
+    user.updated_at = datetime.utcnow()
     
     try:
+        move_department(user, department_before)
         db.session.commit()
         return jsonify({
             'message': 'Profile updated successfully',
@@ -175,7 +179,7 @@ def change_password():
         return jsonify({'error': 'Current password is incorrect'}), 401
     
     user.set_password(data['new_password'])
-    user.updated_at = db.func.now()
+    user.updated_at = datetime.utcnow()
     
     try:
         db.session.commit()
@@ -0,0 +1,70 @@
+"""
+Change feed routes
+"""
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required
+from datetime import datetime, timedelta
+from app.middleware.auth import require_role, get_current_user
+from app.services.change_feed import StaleCursor, changes_since, current_cursor, prune_changes
+from app.utils.pagination import InvalidCursor, get_page_limit
+
+bp = Blueprint('changes', __name__)
+
+
+@bp.route('/', methods=['GET'])
+@jwt_required()
+def get_changes():
+    """
+    Assets, maintenance tickets and licenses changed since a cursor
+    Query params:
+    - since: Cursor from a previous response. Without it, only the current
+      cursor is returned: store it, then load the lists once.
+    - limit: Changes per response (capped at PAGINATION_MAX_LIMIT); repeat
+      with the returned cursor while has_more is true
+    A 410 response means the cursor is older than the retained change log
+    and the lists must be loaded again.
+    """
+    since = request.args.get('since')
+    if not since:
+        return jsonify({'items': [], 'cursor': current_cursor(), 'has_more': False}), 200
+    
+    limit = get_page_limit(request.args)
+    
+    try:
+        items, cursor, more = changes_since(since, limit, get_current_user())
+    except StaleCursor as e:
+        return jsonify({'error': str(e)}), 410
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'items': items,
+        'cursor': cursor,
+        'has_more': more
+    }), 200
+
+
+@bp.route('/prune', methods=['POST'])
+@jwt_required()
+@require_role(['Admin'])
+def prune_change_log():
+    """
+    Delete old change log entries
+    Body (optional):
+    - older_than_days: Age threshold (default CHANGE_LOG_RETENTION_DAYS)
+    """
+    data = request.get_json(silent=True) or {}
+    
+    older_than = None
+    if 'older_than_days' in data:
+        days = data['older_than_days']
+        if not isinstance(days, int) or isinstance(days, bool) or days < 0:
+            return jsonify({'error': 'older_than_days must be a non-negative integer'}), 400
+        older_than = datetime.utcnow() - timedelta(days=days)
+    
+    try:
+        deleted = prune_changes(older_than)
+    except Exception as e:
+        return jsonify({'error': 'Failed to prune change log', 'details': str(e)}), 500
+    
+    return jsonify({'deleted': deleted}), 200
@@ -1,234 +1,250 @@
 """
 Dashboard and reporting routes
 """
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required
-from datetime import datetime, timedelta
-from sqlalchemy import func
+from flask import Blueprint, current_app, request, jsonify
+from flask_jwt_extended import get_jwt, jwt_required
+import time
+from collections import namedtuple
+from datetime import date, datetime, timedelta
 from app import db
 from app.models.asset import Asset
 from app.models.user import User
 from app.models.maintenance import MaintenanceTicket
-from app.models.history import AssetHistory
-from app.models.license import License
-from app.middleware.auth import get_current_user
+from app.models.history import AssetHistory, HistoryArchiveSegment
+from app.models.depreciation import DepreciationPolicy
+from app.models.kpi import KpiCounter, ResolutionDigest, TimelineRollup
+from app.models.expiry import ExpiryCalendarEntry
+from app.middleware.auth import get_current_user, require_role
+from app.services.dashboard_overview import run_widgets
+from app.services.depreciation import value_summary
+from app.services.expiry_calendar import expiring, expiry_buckets, expiry_stats, run_daily_job
+from app.services.history_archive import recent_history
+from app.services.kpis import counters, dashboard_stats, reconcile_counters
+from app.services.resolution_times import mean_resolution_hours, reconcile_digests, resolution_percentiles
+from app.services.response_cache import cache_stats, cached_response
+from app.services.timeline import reconcile_timeline, timeline
+from app.utils.pagination import InvalidCursor, decode_cursor, encode_cursor, get_page_limit
 
 bp = Blueprint('dashboard', __name__)
 
+# Overview widgets: payload function, models whose tables it reads, query params with defaults (of their type)
+Widget = namedtuple('Widget', 'function models params')
+WIDGETS = {}
+
+
+def widget(name, *models, params=None):
+    """Register a payload function as a dashboard widget"""
+    def decorator(fn):
+        WIDGETS[name] = Widget(fn, models, params or {})
+        return fn
+    return decorator
+
+
+@widget('stats', KpiCounter, User)
+def stats():
+    """Overall KPI figures"""
+    return dashboard_stats()
+
 
 @bp.route('/stats', methods=['GET'])
 @jwt_required()
+@cached_response(*WIDGETS['stats'].models)
 def get_stats():
     """Get overall KPI statistics"""
-    
-    # Asset statistics
-    total_assets = Asset.query.count()
-    available_assets = Asset.query.filter_by(status='Available').count()
-    assigned_assets = Asset.query.filter_by(status='Assigned').count()
-    maintenance_assets = Asset.query.filter(
-        Asset.status.in_(['Under Maintenance', 'In Repair'])
-    ).count()
-    retired_assets = Asset.query.filter_by(status='Retired').count()
-    
-    # Maintenance ticket statistics
-    total_tickets = MaintenanceTicket.query.count()
-    open_tickets = MaintenanceTicket.query.filter(
-        MaintenanceTicket.status.in_(['New', 'Under Review', 'In Progress'])
-    ).count()
-    resolved_tickets = MaintenanceTicket.query.filter_by(status='Resolved').count()
-    
-    # User statistics
-    total_users = User.query.filter_by(is_active=True).count()
-    
-    # License statistics
-    total_licenses = License.query.count()
-    active_licenses = License.query.filter_by(status='Active').count()
-    expired_licenses = License.query.filter_by(status='Expired').count()
-    
-    # Calculate total asset value
-    total_value = db.session.query(func.sum(Asset.purchase_price)).scalar() or 0
-    
-    return jsonify({
-        'assets': {
-            'total': total_assets,
-            'available': available_assets,
-            'assigned': assigned_assets,
-            'under_maintenance': maintenance_assets,
-            'retired': retired_assets,
-            'total_value': float(total_value)
-        },
-        'maintenance': {
-            'total': total_tickets,
-            'open': open_tickets,
-            'resolved': resolved_tickets
-        },
-        'users': {
-            'total': total_users
-        },
-        'licenses': {
-            'total': total_licenses,
-            'active': active_licenses,
-            'expired': expired_licenses
-        }
-    }), 200
+    return jsonify(stats()), 200
+
+
+@widget('assets-by-category', KpiCounter)
+def assets_by_category():
+    """Assets grouped by category"""
+    results = counters('asset_category')['asset_category']
+    return [{'category': category, 'count': count} for category, count, _ in results]
 
 
 @bp.route('/assets-by-category', methods=['GET'])
 @jwt_required()
+@cached_response(*WIDGETS['assets-by-category'].models)
 def get_assets_by_category():
     """Get assets grouped by category"""
-    
-    results = db.session.query(
-        Asset.category,
-        func.count(Asset.id).label('count')
-    ).group_by(Asset.category).all()
-    
-    data = [{'category': category, 'count': count} for category, count in results]
-    
-    return jsonify(data), 200
+    return jsonify(assets_by_category()), 200
 
 
-@bp.route('/assets-by-department', methods=['GET'])
-@jwt_required()
-def get_assets_by_department():
-    """Get assets grouped by user department"""
-    
-    results = db.session.query(
-        User.department,
-        func.count(Asset.id).label('count')
-    ).join(
-        Asset, Asset.assigned_to_user_id == User.id
-    ).group_by(User.department).all()
+@widget('assets-by-department', KpiCounter)
+def assets_by_department():
+    """Assets grouped by assignee department"""
+    results = counters('asset_department', 'asset_unassigned')
     
     data = [
         {'department': department or 'Unassigned', 'count': count}
-        for department, count in results
+        for department, count, _ in results['asset_department']
     ]
     
     # Add unassigned assets
-    unassigned_count = Asset.query.filter_by(assigned_to_user_id=None).count()
+    unassigned_count = sum(count for _, count, _ in results['asset_unassigned'])
     if unassigned_count > 0:
         data.append({'department': 'Unassigned', 'count': unassigned_count})
     
-    return jsonify(data), 200
+    return data
+
+
+@bp.route('/assets-by-department', methods=['GET'])
+@jwt_required()
+@cached_response(*WIDGETS['assets-by-department'].models)
+def get_assets_by_department():
+    """Get assets grouped by user department"""
+    return jsonify(assets_by_department()), 200
+
+
+@widget('assets-by-status', KpiCounter)
+def assets_by_status():
+    """Assets grouped by status"""
+    results = counters('asset_status')['asset_status']
+    return [{'status': status, 'count': count} for status, count, _ in results]
 
 
 @bp.route('/assets-by-status', methods=['GET'])
 @jwt_required()
+@cached_response(*WIDGETS['assets-by-status'].models)
 def get_assets_by_status():
     """Get assets grouped by status"""
+    return jsonify(assets_by_status()), 200
+
+
+@bp.route('/counters/reconcile', methods=['POST'])
+@jwt_required()
+@require_role(['Admin'])
+def run_counter_reconciliation():
+    """
+    Rebuild the dashboard counters, timeline rollups and resolution digests from the tables and report drift
+    Query params:
+    - dry_run: Only report the drift (default false)
+    """
+    dry_run = request.args.get('dry_run', 'false').lower() == 'true'
+    try:
+        drift = reconcile_counters(repair=not dry_run)
+        timeline_drift = reconcile_timeline(repair=not dry_run)
+        digest_drift = reconcile_digests(repair=not dry_run)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to reconcile counters', 'details': str(e)}), 500
     
-    results = db.session.query(
-        Asset.status,
-        func.count(Asset.id).label('count')
-    ).group_by(Asset.status).all()
-    
-    data = [{'status': status, 'count': count} for status, count in results]
-    
-    return jsonify(data), 200
+    return jsonify({
+        'drift': drift,
+        'timeline_drift': timeline_drift,
+        'digest_drift': digest_drift,
+        'repaired': not dry_run and bool(drift or timeline_drift or digest_drift)
+    }), 200
+
+
+@widget('warranty-expiring', ExpiryCalendarEntry, params={'days': 30})
+def warranty_expiring(days=30):
+    """Assets whose warranty expires within `days`, soonest first, from the expiry calendar"""
+    return expiring('warranty', days)
 
 
 @bp.route('/warranty-expiring', methods=['GET'])
 @jwt_required()
+@cached_response(*WIDGETS['warranty-expiring'].models)
 def get_warranty_expiring():
-    """Get assets with expiring warranty"""
-    days = request.args.get('days', 30, type=int)
-    
-    today = datetime.now().date()
-    expiry_threshold = today + timedelta(days=days)
-    
-    assets = Asset.query.filter(
-        Asset.warranty_expiration.isnot(None),
-        Asset.warranty_expiration >= today,
-        Asset.warranty_expiration <= expiry_threshold
-    ).order_by(Asset.warranty_expiration).all()
-    
-    result = []
-    for asset in assets:
-        asset_dict = asset.to_dict()
-        days_until_expiry = (asset.warranty_expiration - today).days
-        asset_dict['days_until_expiry'] = days_until_expiry
-        
-        if asset.assigned_user:
-            asset_dict['assigned_user'] = {
-                'id': asset.assigned_user.id,
-                'username': asset.assigned_user.username,
-                'department': asset.assigned_user.department
-            }
-        
-        result.append(asset_dict)
-    
-    return jsonify(result), 200
+    """
+    Get assets with expiring warranty
+    Query params:
+    - days: Window in days (default 30, at most EXPIRY_CALENDAR_HORIZON_DAYS)
+    """
+    return jsonify(warranty_expiring(request.args.get('days', 30, type=int))), 200
+
+
+@widget('expiry-buckets', ExpiryCalendarEntry)
+def expiry_summary():
+    """Warranties and licenses per days-until-expiry bucket"""
+    return expiry_buckets()
+
+
+@bp.route('/expiry-buckets', methods=['GET'])
+@jwt_required()
+@cached_response(*WIDGETS['expiry-buckets'].models)
+def get_expiry_buckets():
+    """Count of expiring warranties and licenses per days-until-expiry bucket"""
+    return jsonify(expiry_summary()), 200
+
+
+@bp.route('/expiry-calendar', methods=['GET'])
+@jwt_required()
+@require_role(['Admin'])
+def get_expiry_calendar_stats():
+    """Expiry calendar size and scheduler counters"""
+    return jsonify(expiry_stats()), 200
+
+
+@bp.route('/expiry-calendar/refresh', methods=['POST'])
+@jwt_required()
+@require_role(['Admin'])
+def refresh_expiry_calendar():
+    """Run the daily expiry job now: expire licenses past their date and rebuild the calendar"""
+    try:
+        return jsonify(run_daily_job()), 200
+    except Exception as e:
+        return jsonify({'error': 'Failed to refresh expiry calendar', 'details': str(e)}), 500
+
+
+@widget('recent-activities', AssetHistory, HistoryArchiveSegment, Asset, User, params={'limit': 50})
+def recent_activities(limit=50):
+    """The latest history entries, hot and archived, with asset and user names"""
+    return recent_history(max(1, min(limit, current_app.config.get('PAGINATION_MAX_LIMIT', 500))))[0]
 
 
 @bp.route('/recent-activities', methods=['GET'])
 @jwt_required()
+@cached_response(*WIDGETS['recent-activities'].models)
 def get_recent_activities():
-    """Get recent asset activities/history"""
-    limit = request.args.get('limit', 50, type=int)
+    """
+    Get recent asset activities/history, newest first
+    Query params:
+    - limit: Page size (default 50, capped at PAGINATION_MAX_LIMIT)
+    - action: Filter by action (comma-separated for several)
+    - performed_by: Filter by the acting user's ID
+    - before: Opaque next_cursor of the previous page, or empty for the
+      first page; the response is then {items, next_cursor, limit}
+    """
+    limit = get_page_limit(request.args)
+    actions = request.args.get('action')
+    performed_by = request.args.get('performed_by', type=int)
+    if 'performed_by' in request.args and performed_by is None:
+        return jsonify({'error': 'performed_by must be a user ID'}), 400
+    
+    cursor = request.args.get('before')
+    try:
+        before = decode_cursor(cursor, 'activity') if cursor else None
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    
+    activities, more = recent_history(limit, actions and actions.split(','), performed_by, before)
+    
+    # Unpaginated listing
+    if cursor is None:
+        return jsonify(activities), 200
+    
+    next_cursor = None
+    if more:
+        last = activities[-1]
+        next_cursor = encode_cursor('activity', [datetime.fromisoformat(last['created_at']), last['id']])
     
-    activities = AssetHistory.query.order_by(
-        AssetHistory.created_at.desc()
-    ).limit(limit).all()
-    
-    result = []
-    for activity in activities:
-        activity_dict = activity.to_dict()
-        
-        # Enrich with related data
-        if activity.asset:
-            activity_dict['asset'] = {
-                'id': activity.asset.id,
-                'name': activity.asset.name
-            }
-        
-        if activity.performed_by:
-            activity_dict['performed_by'] = {
-                'id': activity.performed_by.id,
-                'username': activity.performed_by.username
-            }
-        
-        if activity.to_user:
-            activity_dict['to_user'] = {
-                'id': activity.to_user.id,
-                'username': activity.to_user.username
-            }
-        
-        result.append(activity_dict)
-    
-    return jsonify(result), 200
+    return jsonify({
+        'items': activities,
+        'next_cursor': next_cursor,
+        'limit': limit
+    }), 200
 
 
-@bp.route('/maintenance-stats', methods=['GET'])
-@jwt_required()
-def get_maintenance_stats():
-    """Get maintenance ticket statistics"""
-    
-    # Tickets by status
-    status_stats = db.session.query(
-        MaintenanceTicket.status,
-        func.count(MaintenanceTicket.id).label('count')
-    ).group_by(MaintenanceTicket.status).all()
+@widget('maintenance-stats', KpiCounter, MaintenanceTicket, ResolutionDigest)
+def maintenance_stats():
+    """Ticket counts by status and priority, resolution time mean and percentiles, recent volume"""
+    # Tickets by status and by priority
+    ticket_counters = counters('ticket_status', 'ticket_priority')
     
-    # Tickets by priority
-    priority_stats = db.session.query(
-        MaintenanceTicket.priority,
-        func.count(MaintenanceTicket.id).label('count')
-    ).group_by(MaintenanceTicket.priority).all()
-    
-    # Average resolution time (for resolved tickets)
-    resolved_tickets = MaintenanceTicket.query.filter(
-        MaintenanceTicket.resolved_at.isnot(None)
-    ).all()
-    
-    if resolved_tickets:
-        total_resolution_time = sum([
-            (ticket.resolved_at - ticket.created_at).total_seconds() / 3600  # hours
-            for ticket in resolved_tickets
-        ])
-        avg_resolution_hours = total_resolution_time / len(resolved_tickets)
-    else:
-        avg_resolution_hours = 0
+    # Average resolution time (for resolved tickets), in SQL
+    avg_resolution_hours = mean_resolution_hours()
     
     # Recent tickets (last 30 days)
     thirty_days_ago = datetime.now() - timedelta(days=30)
@@ -236,53 +252,104 @@ def get_maintenance_stats():
         MaintenanceTicket.created_at >= thirty_days_ago
     ).count()
     
-    return jsonify({
-        'by_status': [{'status': status, 'count': count} for status, count in status_stats],
-        'by_priority': [{'priority': priority, 'count': count} for priority, count in priority_stats],
+    return {
+        'by_status': [{'status': status, 'count': count} for status, count, _ in ticket_counters['ticket_status']],
+        'by_priority': [
+            {'priority': priority, 'count': count} for priority, count, _ in ticket_counters['ticket_priority']
+        ],
         'avg_resolution_hours': round(avg_resolution_hours, 2),
+        'resolution_percentiles': resolution_percentiles(),
         'recent_tickets_30days': recent_tickets_count
-    }), 200
+    }
+
+
+@bp.route('/maintenance-stats', methods=['GET'])
+@jwt_required()
+@cached_response(*WIDGETS['maintenance-stats'].models)
+def get_maintenance_stats():
+    """Get maintenance ticket statistics"""
+    return jsonify(maintenance_stats()), 200
+
+
+@widget('asset-value-summary', Asset, DepreciationPolicy)
+def asset_value_summary():
+    """Portfolio value with depreciation"""
+    return value_summary()
 
 
 @bp.route('/asset-value-summary', methods=['GET'])
 @jwt_required()
+@cached_response(*WIDGETS['asset-value-summary'].models)
 def get_asset_value_summary():
     """Get asset value summary with depreciation"""
-    
-    assets = Asset.query.filter(
-        Asset.purchase_price.isnot(None),
-        Asset.purchase_date.isnot(None)
-    ).all()
-    
-    total_purchase_value = 0
-    total_current_value = 0
-    total_depreciation = 0
-    
-    for asset in assets:
-        depreciation = asset.calculate_depreciation()
-        if depreciation:
-            total_purchase_value += depreciation['purchase_price']
-            total_current_value += depreciation['current_value']
-            total_depreciation += depreciation['total_depreciation']
-    
-    return jsonify({
-        'total_purchase_value': round(total_purchase_value, 2),
-        'total_current_value': round(total_current_value, 2),
-        'total_depreciation': round(total_depreciation, 2),
-        'depreciation_rate': round((total_depreciation / total_purchase_value * 100) if total_purchase_value > 0 else 0, 2)
-    }), 200
+    return jsonify(asset_value_summary()), 200
+
+
+@widget('assets-timeline', TimelineRollup, params={'granularity': 'month'})
+def assets_timeline(granularity='month', since=None, until=None):
+    """Acquisitions, retirements and ticket openings/closings per period; count is the acquisitions"""
+    return [{**period, 'count': period['acquired']} for period in timeline(granularity, since, until)]
 
 
 @bp.route('/assets-timeline', methods=['GET'])
 @jwt_required()
+@cached_response(*WIDGETS['assets-timeline'].models)
 def get_assets_timeline():
-    """Get asset acquisition timeline (by month)"""
-    
-    results = db.session.query(
-        func.strftime('%Y-%m', Asset.created_at).label('month'),
-        func.count(Asset.id).label('count')
-    ).group_by('month').order_by('month').all()
-    
-    data = [{'month': month, 'count': count} for month, count in results if month]
+    """
+    Get the asset and ticket timeline
+    Query params:
+    - granularity: day, week, month (default) or quarter
+    - since, until: Only periods overlapping this date range (YYYY-MM-DD)
+    """
+    try:
+        since, until = (
+            date.fromisoformat(request.args[param]) if request.args.get(param) else None for param in ('since', 'until')
+        )
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    
+    try:
+        return jsonify(assets_timeline(request.args.get('granularity', 'month'), since, until)), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+
+@bp.route('/overview', methods=['GET'])
+@jwt_required()
+def get_overview():
+    """
+    Several dashboard widgets in one response
+    Query params:
+    - widgets: Comma-separated widget names (default all), named after their endpoints
+    - days, limit, granularity: Passed to warranty-expiring, recent-activities and assets-timeline
+    Widgets are computed concurrently. Each reports its time in ms and whether
+    it was served from the cache; failed widgets are listed under errors.
+    """
+    start = time.perf_counter()
+    names = request.args.get('widgets')
+    names = list(dict.fromkeys(names.split(','))) if names else list(WIDGETS)
+    unknown = [name for name in names if name not in WIDGETS]
+    if unknown:
+        return jsonify({'error': f'Unknown widgets: {", ".join(unknown)}. Must be among: {", ".join(WIDGETS)}'}), 400
+    
+    jobs = []
+    for name in names:
+        function, models, params = WIDGETS[name]
+        values = {param: request.args.get(param, default, type=type(default)) for param, default in params.items()}
+        jobs.append((name, function, models, values))
+    widgets, timings, errors = run_widgets(jobs, get_jwt().get('role'))
     
-    return jsonify(data), 200
+    return jsonify({
+        'widgets': widgets,
+        'timings': timings,
+        'errors': errors,
+        'elapsed_ms': round((time.perf_counter() - start) * 1000, 1)
+    }), 200
+
+
+@bp.route('/cache-stats', methods=['GET'])
+@jwt_required()
+@require_role(['Admin'])
+def get_cache_stats():
+    """Dashboard response cache size, hit/miss counters and table versions"""
+    return jsonify(cache_stats()), 200
@@ -0,0 +1,184 @@
+"""
+Depreciation policy and forecast routes
+"""
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required
+from datetime import datetime
+from app import db
+from app.models.depreciation import DepreciationPolicy
+from app.middleware.auth import require_role
+from app.services.depreciation_schedule import forecast, month_start, rebuild_schedules
+
+bp = Blueprint('depreciation', __name__)
+
+
+def _apply_policy_fields(policy, data):
+    """Validate and copy policy fields from request data; returns an error message or None"""
+    if 'method' in data:
+        if data['method'] not in DepreciationPolicy.METHODS:
+            return f'Invalid method. Must be one of: {", ".join(DepreciationPolicy.METHODS)}'
+        policy.method = data['method']
+    
+    if 'useful_life_years' in data:
+        life = data['useful_life_years']
+        if not isinstance(life, int) or isinstance(life, bool) or not 1 <= life <= 50:
+            return 'useful_life_years must be an integer between 1 and 50'
+        policy.useful_life_years = life
+    
+    # Rates are fractions; declining_rate may be cleared to use 2 / life
+    for field in ('salvage_rate', 'declining_rate'):
+        if field not in data:
+            continue
+        value = data[field]
+        if value is None and field == 'declining_rate':
+            policy.declining_rate = None
+            continue
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return f'{field} must be a number'
+        if not 0 <= value <= 1 or (field == 'declining_rate' and value == 0):
+            return f'{field} must be a fraction between 0 and 1'
+        setattr(policy, field, value)
+    
+    return None
+
+
+@bp.route('/policies', methods=['GET'])
+@jwt_required()
+def get_policies():
+    """List depreciation policies and the default applied to other categories"""
+    policies = DepreciationPolicy.query.order_by(DepreciationPolicy.category).all()
+    return jsonify({
+        'policies': [policy.to_dict() for policy in policies],
+        'default': DepreciationPolicy.default().to_dict()
+    }), 200
+
+
+@bp.route('/policies', methods=['POST'])
+@jwt_required()
+@require_role(['Admin', 'Asset Manager'])
+def create_policy():
+    """Create a category policy and rebuild that category's schedules"""
+    data = request.get_json()
+    
+    required_fields = ['category', 'useful_life_years']
+    if not all(field in data for field in required_fields):
+        return jsonify({'error': 'Missing required fields: category, useful_life_years'}), 400
+    
+    if DepreciationPolicy.query.filter(DepreciationPolicy.category == data['category']).first():
+        return jsonify({'error': 'A policy already exists for this category'}), 409
+    
+    policy = DepreciationPolicy(category=data['category'], method='straight_line', salvage_rate=0.1)
+    error = _apply_policy_fields(policy, data)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    try:
+        db.session.add(policy)
+        db.session.flush()
+        rebuild_schedules(policy.category)
+        db.session.commit()
+        return jsonify({
+            'message': 'Depreciation policy created successfully',
+            'policy': policy.to_dict()
+        }), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to create depreciation policy', 'details': str(e)}), 500
+
+
+@bp.route('/policies/<int:policy_id>', methods=['PUT'])
+@jwt_required()
+@require_role(['Admin', 'Asset Manager'])
+def update_policy(policy_id):
+    """Update a category policy and rebuild that category's schedules"""
+    policy = DepreciationPolicy.query.get(policy_id)
+    
+    if not policy:
+        return jsonify({'error': 'Depreciation policy not found'}), 404
+    
+    data = request.get_json()
+    if 'category' in data and data['category'] != policy.category:
+        return jsonify({'error': 'category cannot be changed; delete the policy and create a new one'}), 400
+    
+    error = _apply_policy_fields(policy, data)
+    if error:
+        db.session.rollback()
+        return jsonify({'error': error}), 400
+    
+    policy.updated_at = datetime.utcnow()
+    
+    try:
+        db.session.flush()
+        rebuild_schedules(policy.category)
+        db.session.commit()
+        return jsonify({
+            'message': 'Depreciation policy updated successfully',
+            'policy': policy.to_dict()
+        }), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to update depreciation policy', 'details': str(e)}), 500
+
+
+@bp.route('/policies/<int:policy_id>', methods=['DELETE'])
+@jwt_required()
+@require_role(['Admin', 'Asset Manager'])
+def delete_policy(policy_id):
+    """Delete a category policy; the category falls back to the default terms"""
+    policy = DepreciationPolicy.query.get(policy_id)
+    
+    if not policy:
+        return jsonify({'error': 'Depreciation policy not found'}), 404
+    
+    try:
+        db.session.delete(policy)
+        db.session.flush()
+        rebuild_schedules(policy.category)
+        db.session.commit()
+        return jsonify({'message': f'Depreciation policy for {policy.category} deleted successfully'}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to delete depreciation policy', 'details': str(e)}), 500
+
+
+@bp.route('/forecast', methods=['GET'])
+@jwt_required()
+def get_forecast():
+    """
+    Month-end book value forecast from the precomputed schedules
+    Query params:
+    - start: First month (YYYY-MM, default: current month)
+    - months: Number of months (default 36)
+    - category: Restrict to one category
+    """
+    max_months = current_app.config.get('DEPRECIATION_FORECAST_MAX_MONTHS', 120)
+    months = request.args.get('months', 36, type=int)
+    if not 1 <= months <= max_months:
+        return jsonify({'error': f'months must be between 1 and {max_months}'}), 400
+    
+    start = request.args.get('start')
+    if start:
+        try:
+            start = datetime.strptime(start, '%Y-%m').date()
+        except ValueError:
+            return jsonify({'error': 'Invalid start format. Use YYYY-MM'}), 400
+    else:
+        start = month_start(datetime.now().date())
+    
+    return jsonify(forecast(start, months, request.args.get('category'))), 200
+
+
+@bp.route('/schedules/rebuild', methods=['POST'])
+@jwt_required()
+@require_role(['Admin'])
+def rebuild_all_schedules():
+    """Recompute every precomputed schedule from the assets table"""
+    try:
+        rebuild_schedules()
+        db.session.commit()
+        return jsonify({'message': 'Depreciation schedules rebuilt successfully'}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to rebuild depreciation schedules', 'details': str(e)}), 500
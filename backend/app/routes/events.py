@@ -0,0 +1,81 @@
+"""
+Server-sent event routes
+"""
+import json
+import time
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
+from flask_jwt_extended import get_jwt, get_jwt_identity, jwt_required
+from app import db
+from app.middleware.auth import require_role
+from app.models.user import User
+from app.services.events import event_stats
+
+bp = Blueprint('events', __name__)
+
+TOPICS = ('asset', 'ticket', 'license')
+
+
+def _format(event):
+    """An event in text/event-stream framing"""
+    return f'event: {event["event"]}\ndata: {json.dumps(event["data"], separators=(",", ":"))}\n\n'
+
+
+@bp.route('/stream', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def stream_events():
+    """
+    Stream change events as text/event-stream
+    EventSource cannot set headers, so the access token may be passed as ?jwt=.
+    Query params:
+    - topics: Comma-separated subset of asset, ticket, license
+    Events: asset.status, ticket.created, ticket.status, ticket.deleted,
+    license.created, license.expired, and resync when events were dropped.
+    The stream closes when the token expires or after EVENTS_STREAM_MAX_AGE;
+    clients reconnect (with a fresh token) and reload on resync.
+    """
+    # get_current_user() only reads tokens from headers
+    user = User.query.get(get_jwt_identity())
+    if not user or not user.is_active:
+        return jsonify({'error': 'User not found or inactive'}), 403
+    
+    topics = request.args.get('topics')
+    topics = set(topics.split(',')) if topics else None
+    if topics and not topics <= set(TOPICS):
+        return jsonify({'error': f'Invalid topics. Must be among: {", ".join(TOPICS)}'}), 400
+    
+    broker = current_app.extensions['event_broker']
+    subscription = broker.subscribe(user.id, user.role, topics)
+    if subscription is None:
+        return jsonify({'error': 'Too many open event streams, retry later'}), 503
+    
+    heartbeat = current_app.config.get('EVENTS_HEARTBEAT', 15)
+    deadline = time.time() + current_app.config.get('EVENTS_STREAM_MAX_AGE', 300)
+    deadline = min(deadline, get_jwt().get('exp', deadline))
+    
+    # The stream holds no database connection while it waits
+    db.session.remove()
+    
+    def generate():
+        yield 'retry: 3000\n\n'
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return
+            event = subscription.get(min(heartbeat, remaining))
+            yield _format(event) if event else ': keep-alive\n\n'
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Let reverse proxies pass events through unbuffered
+    })
+    # Also runs when the client goes away before the first event
+    response.call_on_close(lambda: broker.unsubscribe(subscription))
+    return response
+
+
+@bp.route('/stats', methods=['GET'])
+@jwt_required()
+@require_role(['Admin'])
+def get_event_stats():
+    """Open streams and publish/delivery counters of this worker"""
+    return jsonify(event_stats()), 200
@@ -3,11 +3,18 @@ License management routes
 """
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
-from datetime import datetime, timedelta
+from datetime import datetime
 from app import db
 from app.models.license import License
 from app.models.asset import Asset
 from app.middleware.auth import require_role, get_current_user
+from app.services.asset_cache import load_asset, load_assets
+from app.services.change_feed import record_changes
+from app.services.events import publish
+from app.services.expiry_calendar import expiring
+from app.services.kpis import license_counter_key, update_counters
+from app.utils.conditional import build_etag, collection_version, latest_update, not_modified, with_validators
+from app.utils.fields import InvalidFields, parse_fields, field_columns, serialize_row
 
 bp = Blueprint('licenses', __name__)
 
@@ -15,39 +22,77 @@ bp = Blueprint('licenses', __name__)
 @bp.route('/', methods=['GET'])
 @jwt_required()
 def get_licenses():
-    """List all licenses with filtering"""
-    query = License.query
+    """
+    List all licenses with filtering
+    Query params:
+    - status, asset_id, software_name: Filters
+    - fields: Comma-separated license columns to return (column-only SELECT,
+      without the asset summary)
+    """
+    try:
+        fields = parse_fields(request.args, License)
+    except InvalidFields as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if fields:
+        query = db.session.query(*field_columns(License, fields)).select_from(License)
+    else:
+        query = License.query
     
     # Status filter
     status = request.args.get('status')
     if status:
-        query = query.filter_by(status=status)
+        query = query.filter(License.status == status)
     
     # Asset filter
     asset_id = request.args.get('asset_id')
     if asset_id:
-        query = query.filter_by(asset_id=int(asset_id))
+        query = query.filter(License.asset_id == int(asset_id))
     
     # Software name search
     software_name = request.args.get('software_name')
     if software_name:
         query = query.filter(License.software_name.ilike(f'%{software_name}%'))
     
+    # Collection validator; embedded asset summaries depend on the assets table
+    latest, count = collection_version(query, License.updated_at)
+    etag = build_etag('licenses', request.query_string, latest, count, None if fields else latest_update(Asset))
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
+    if fields:
+        response = jsonify([serialize_row(row, fields) for row in query.all()])
+        return with_validators(response, etag), 200
+    
     licenses = query.all()
+    assets = load_assets(license.asset_id for license in licenses)
     
     # Enrich with asset information
     result = []
     for license in licenses:
         license_dict = license.to_dict()
-        if license.asset:
+        asset = assets.get(license.asset_id)
+        if asset:
             license_dict['asset'] = {
-                'id': license.asset.id,
-                'name': license.asset.name,
-                'serial_number': license.asset.serial_number
+                'id': asset.id,
+                'name': asset.name,
+                'serial_number': asset.serial_number
             }
         result.append(license_dict)
     
-    return jsonify(result), 200
+    return with_validators(jsonify(result), etag), 200
+
+
+def _publish_license(event, license):
+    """Publish a license event with the fields list views show"""
+    publish(event, {
+        'id': license.id,
+        'asset_id': license.asset_id,
+        'software_name': license.software_name,
+        'status': license.status,
+        'expiration_date': license.expiration_date.isoformat() if license.expiration_date else None
+    })
 
 
 @bp.route('/', methods=['POST'])
@@ -64,7 +109,7 @@ def create_license():
     
     # Validate asset if provided
     if 'asset_id' in data:
-        asset = Asset.query.get(data['asset_id'])
+        asset = db.session.get(Asset, data['asset_id'])
         if not asset:
             return jsonify({'error': 'Asset not found'}), 404
     
@@ -99,7 +144,13 @@ def create_license():
     
     try:
         db.session.add(license)
+        db.session.flush()  # Get license ID
+        update_counters(added=[license_counter_key(license)])
+        record_changes('license', 'insert', [license.id])
         db.session.commit()
+        _publish_license('license.created', license)
+        if license.status == 'Expired':
+            _publish_license('license.expired', license)
         
         return jsonify({
             'message': 'License created successfully',
@@ -119,11 +170,18 @@ def get_license(license_id):
     if not license:
         return jsonify({'error': 'License not found'}), 404
     
+    asset = load_asset(license.asset_id) if license.asset_id else None
+    etag = build_etag('license', license.id, license.updated_at, asset.updated_at if asset else None)
+    last_modified = max(filter(None, [license.updated_at, asset.updated_at if asset else None]), default=None)
+    cached = not_modified(etag, last_modified)
+    if cached:
+        return cached
+    
     license_dict = license.to_dict()
-    if license.asset:
-        license_dict['asset'] = license.asset.to_dict()
+    if asset:
+        license_dict['asset'] = asset.to_dict()
     
-    return jsonify(license_dict), 200
+    return with_validators(jsonify(license_dict), etag, last_modified), 200
 
 
 @bp.route('/<int:license_id>', methods=['PUT'])
@@ -137,6 +195,8 @@ def update_license(license_id):
         return jsonify({'error': 'License not found'}), 404
     
     data = request.get_json()
+    old_status = license.status
+    counter_before = license_counter_key(license)
     
     # Update simple fields
     simple_fields = ['software_name', 'license_key', 'vendor', 'cost', 'seats', 'status']
@@ -157,10 +217,14 @@ def update_license(license_id):
         except ValueError:
             return jsonify({'error': 'Invalid expiration_date format. Use YYYY-MM-DD'}), 400
     
-    license.updated_at = db.func.now()
+    license.updated_at = datetime.utcnow()
     
     try:
+        update_counters(removed=[counter_before], added=[license_counter_key(license)])
+        record_changes('license', 'update', [license.id])
         db.session.commit()
+        if license.status == 'Expired' and old_status != 'Expired':
+            _publish_license('license.expired', license)
         return jsonify({
             'message': 'License updated successfully',
             'license': license.to_dict()
@@ -181,6 +245,8 @@ def delete_license(license_id):
         return jsonify({'error': 'License not found'}), 404
     
     try:
+        update_counters(removed=[license_counter_key(license)])
+        record_changes('license', 'delete', [license.id])
         db.session.delete(license)
         db.session.commit()
         return jsonify({'message': 'License deleted successfully'}), 200
@@ -192,34 +258,8 @@ def delete_license(license_id):
 @bp.route('/expiring', methods=['GET'])
 @jwt_required()
 def get_expiring_licenses():
-    """Get licenses expiring within specified days (default 30)"""
-    days = request.args.get('days', 30, type=int)
-    
-    today = datetime.now().date()
-    expiry_threshold = today + timedelta(days=days)
-    
-    licenses = License.query.filter(
-        License.expiration_date.isnot(None),
-        License.expiration_date >= today,
-        License.expiration_date <= expiry_threshold,
-        License.status == 'Active'
-    ).all()
-    
-    result = []
-    for license in licenses:
-        license_dict = license.to_dict()
-        days_until_expiry = (license.expiration_date - today).days
-        license_dict['days_until_expiry'] = days_until_expiry
-        
-        if license.asset:
-            license_dict['asset'] = {
-                'id': license.asset.id,
-                'name': license.asset.name
-            }
-        
-        result.append(license_dict)
-    
-    # Sort by expiration date
-    result.sort(key=lambda x: x['expiration_date'])
-    
-    return jsonify(result), 200
+    """
+    Get active licenses expiring within specified days (default 30, at most
+    EXPIRY_CALENDAR_HORIZON_DAYS), soonest first, from the expiry calendar
+    """
+    return jsonify(expiring('license', request.args.get('days', 30, type=int))), 200
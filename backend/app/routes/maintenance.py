@@ -8,8 +8,15 @@ from app import db
 from app.models.maintenance import MaintenanceTicket
 from app.models.asset import Asset
 from app.models.user import User
-from app.models.history import AssetHistory
+from app.services.asset_cache import invalidate_assets, load_asset, load_assets
+from app.services.asset_versions import asset_state, log_change
+from app.services.change_feed import record_changes, record_ticket_changes
+from app.services.events import publish, publish_asset_status
+from app.services.kpis import asset_counter_key, ticket_counter_key, update_counters
+from app.services.resolution_times import record_resolution
 from app.middleware.auth import require_role, get_current_user
+from app.utils.conditional import build_etag, collection_version, latest_update, not_modified, with_validators
+from app.utils.fields import InvalidFields, parse_fields, field_columns, serialize_row
 import os
 from werkzeug.utils import secure_filename
 
@@ -34,52 +41,79 @@ def get_tickets():
     - asset_id: Filter by asset
     - reported_by: Filter by reporter
     - assigned_to: Filter by assignee
+    - fields: Comma-separated ticket columns to return (column-only SELECT,
+      without the asset/reporter/assignee objects)
     """
     current_user = get_current_user()
-    query = MaintenanceTicket.query
+    
+    try:
+        fields = parse_fields(request.args, MaintenanceTicket)
+    except InvalidFields as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if fields:
+        query = db.session.query(*field_columns(MaintenanceTicket, fields)).select_from(MaintenanceTicket)
+    else:
+        query = MaintenanceTicket.query
     
     # Employees can only see their own tickets
     if current_user.role == 'Employee':
-        query = query.filter_by(reported_by_user_id=current_user.id)
+        query = query.filter(MaintenanceTicket.reported_by_user_id == current_user.id)
     
     # Status filter
     status = request.args.get('status')
     if status:
-        query = query.filter_by(status=status)
+        query = query.filter(MaintenanceTicket.status == status)
     
     # Priority filter
     priority = request.args.get('priority')
     if priority:
-        query = query.filter_by(priority=priority)
+        query = query.filter(MaintenanceTicket.priority == priority)
     
     # Asset filter
     asset_id = request.args.get('asset_id')
     if asset_id:
-        query = query.filter_by(asset_id=int(asset_id))
+        query = query.filter(MaintenanceTicket.asset_id == int(asset_id))
     
     # Reporter filter
     reported_by = request.args.get('reported_by')
     if reported_by:
-        query = query.filter_by(reported_by_user_id=int(reported_by))
+        query = query.filter(MaintenanceTicket.reported_by_user_id == int(reported_by))
     
     # Assignee filter
     assigned_to = request.args.get('assigned_to')
     if assigned_to:
-        query = query.filter_by(assigned_to_user_id=int(assigned_to))
+        query = query.filter(MaintenanceTicket.assigned_to_user_id == int(assigned_to))
     
     # Order by creation date (newest first)
-    tickets = query.order_by(MaintenanceTicket.created_at.desc()).all()
+    query = query.order_by(MaintenanceTicket.created_at.desc())
+    
+    # Collection validator; embedded assets and users have their own timestamps
+    latest, count = collection_version(query, MaintenanceTicket.updated_at)
+    related = None if fields else (latest_update(Asset), latest_update(User))
+    etag = build_etag('tickets', current_user.id, request.query_string, latest, count, related)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
+    if fields:
+        response = jsonify([serialize_row(row, fields) for row in query.all()])
+        return with_validators(response, etag), 200
+    
+    tickets = query.all()
+    assets = load_assets(ticket.asset_id for ticket in tickets)
     
     # Enrich with related data
     result = []
     for ticket in tickets:
         ticket_dict = ticket.to_dict()
-        ticket_dict['asset'] = ticket.asset.to_dict() if ticket.asset else None
+        asset = assets.get(ticket.asset_id)
+        ticket_dict['asset'] = asset.to_dict() if asset else None
         ticket_dict['reporter'] = ticket.reporter.to_dict() if ticket.reporter else None
         ticket_dict['assignee'] = ticket.assignee.to_dict() if ticket.assignee else None
         result.append(ticket_dict)
     
-    return jsonify(result), 200
+    return with_validators(jsonify(result), etag), 200
 
 
 @bp.route('/', methods=['POST'])
@@ -93,7 +127,7 @@ def create_ticket():
     if not all(field in data for field in required_fields):
         return jsonify({'error': 'Missing required fields: asset_id, title, description'}), 400
     
-    asset = Asset.query.get(data['asset_id'])
+    asset = db.session.get(Asset, data['asset_id'])
     if not asset:
         return jsonify({'error': 'Asset not found'}), 404
     
@@ -111,23 +145,35 @@ def create_ticket():
     
     # Update asset status to Under Maintenance
     old_status = asset.status
+    state_before = asset_state(asset)
+    counter_before = asset_counter_key(asset)
     asset.status = 'Under Maintenance'
-    asset.updated_at = db.func.now()
+    asset.updated_at = datetime.utcnow()
     
     try:
         db.session.add(ticket)
         db.session.flush()  # Get ticket ID
         
         # Log asset status change
-        AssetHistory.log_action(
-            asset_id=asset.id,
-            action='maintenance_requested',
-            performed_by_user_id=current_user.id,
+        log_change(
+            asset, state_before, 'maintenance_requested', current_user.id,
             details=f'Maintenance ticket #{ticket.id} created: {ticket.title}',
             extra_data={'old_status': old_status, 'new_status': 'Under Maintenance', 'ticket_id': ticket.id}
         )
+        update_counters(removed=[counter_before], added=[asset_counter_key(asset), ticket_counter_key(ticket)])
+        record_ticket_changes('insert', [ticket])
+        record_changes('asset', 'update', [asset.id])
         
         db.session.commit()
+        invalidate_assets(asset.id)
+        publish_asset_status([(asset.id, old_status, asset.status)])
+        publish('ticket.created', {
+            'id': ticket.id,
+            'asset_id': ticket.asset_id,
+            'title': ticket.title,
+            'priority': ticket.priority,
+            'status': ticket.status
+        }, owner_user_id=ticket.reported_by_user_id)
         
         return jsonify({
             'message': 'Maintenance ticket created successfully',
@@ -153,13 +199,26 @@ def get_ticket(ticket_id):
     if current_user.role == 'Employee' and ticket.reported_by_user_id != current_user.id:
         return jsonify({'error': 'Access denied'}), 403
     
+    asset = load_asset(ticket.asset_id)
+    
+    # Validators cover the ticket and the embedded asset and users
+    timestamps = [
+        entity.updated_at if entity else None
+        for entity in (ticket, asset, ticket.reporter, ticket.assignee)
+    ]
+    etag = build_etag('ticket', ticket.id, *timestamps)
+    last_modified = max(filter(None, timestamps), default=None)
+    cached = not_modified(etag, last_modified)
+    if cached:
+        return cached
+    
     # Enrich with related data
     ticket_dict = ticket.to_dict()
-    ticket_dict['asset'] = ticket.asset.to_dict() if ticket.asset else None
+    ticket_dict['asset'] = asset.to_dict() if asset else None
     ticket_dict['reporter'] = ticket.reporter.to_dict() if ticket.reporter else None
     ticket_dict['assignee'] = ticket.assignee.to_dict() if ticket.assignee else None
     
-    return jsonify(ticket_dict), 200
+    return with_validators(jsonify(ticket_dict), etag, last_modified), 200
 
 
 @bp.route('/<int:ticket_id>', methods=['PUT'])
@@ -173,6 +232,7 @@ def update_ticket(ticket_id):
         return jsonify({'error': 'Ticket not found'}), 404
     
     data = request.get_json()
+    counter_before = ticket_counter_key(ticket)
     
     # Update allowed fields
     allowed_fields = ['title', 'description', 'priority', 'resolution_notes']
@@ -180,9 +240,11 @@ def update_ticket(ticket_id):
         if field in data:
             setattr(ticket, field, data[field])
     
-    ticket.updated_at = db.func.now()
+    ticket.updated_at = datetime.utcnow()
     
     try:
+        update_counters(removed=[counter_before], added=[ticket_counter_key(ticket)])
+        record_ticket_changes('update', [ticket])
         db.session.commit()
         return jsonify({
             'message': 'Ticket updated successfully',
@@ -215,11 +277,16 @@ def update_ticket_status(ticket_id):
         return jsonify({'error': f'Invalid status. Must be one of: {", ".join(valid_statuses)}'}), 400
     
     old_status = ticket.status
+    state_before = asset_state(ticket.asset)
+    counters_before = [ticket_counter_key(ticket), asset_counter_key(ticket.asset)]
     ticket.status = new_status
-    ticket.updated_at = db.func.now()
+    ticket.updated_at = datetime.utcnow()
     
     # Update asset status when ticket is resolved
-    if new_status == 'Resolved' and old_status != 'Resolved':
+    resolved = new_status == 'Resolved' and old_status != 'Resolved'
+    # Resolution digests count a ticket once, however often it is reopened
+    first_resolution = resolved and ticket.resolved_at is None
+    if resolved:
         ticket.resolved_at = datetime.utcnow()
         
         # Return asset to Available status if not assigned
@@ -228,21 +295,27 @@ def update_ticket_status(ticket_id):
         else:
             ticket.asset.status = 'Available'
         
-        ticket.asset.updated_at = db.func.now()
+        ticket.asset.updated_at = datetime.utcnow()
         
         current_user = get_current_user()
         
         # Log asset status change
-        AssetHistory.log_action(
-            asset_id=ticket.asset_id,
-            action='maintenance_resolved',
-            performed_by_user_id=current_user.id,
+        log_change(
+            ticket.asset, state_before, 'maintenance_resolved', current_user.id,
             details=f'Maintenance ticket #{ticket.id} resolved',
             extra_data={'ticket_id': ticket.id, 'new_asset_status': ticket.asset.status}
         )
+        record_changes('asset', 'update', [ticket.asset_id])
     
     try:
+        update_counters(removed=counters_before, added=[ticket_counter_key(ticket), asset_counter_key(ticket.asset)])
+        if first_resolution:
+            record_resolution(ticket)
+        record_ticket_changes('update', [ticket])
         db.session.commit()
+        invalidate_assets(ticket.asset_id)
+        publish_asset_status([(ticket.asset_id, state_before['status'], ticket.asset.status)])
+        _publish_ticket_status(ticket, old_status)
         return jsonify({
             'message': f'Ticket status updated to {new_status}',
             'ticket': ticket.to_dict()
@@ -252,6 +325,17 @@ def update_ticket_status(ticket_id):
         return jsonify({'error': 'Failed to update ticket status', 'details': str(e)}), 500
 
 
+def _publish_ticket_status(ticket, old_status):
+    """Publish a ticket.status event if the status changed"""
+    if ticket.status != old_status:
+        publish('ticket.status', {
+            'id': ticket.id,
+            'asset_id': ticket.asset_id,
+            'old_status': old_status,
+            'status': ticket.status
+        }, owner_user_id=ticket.reported_by_user_id)
+
+
 @bp.route('/<int:ticket_id>/assign', methods=['PUT'])
 @jwt_required()
 @require_role(['Admin', 'Asset Manager'])
@@ -272,14 +356,19 @@ def assign_ticket(ticket_id):
         return jsonify({'error': 'User not found'}), 404
     
     ticket.assigned_to_user_id = user.id
-    ticket.updated_at = db.func.now()
+    ticket.updated_at = datetime.utcnow()
     
     # Auto-update status to Under Review if still New
+    old_status = ticket.status
+    counter_before = ticket_counter_key(ticket)
     if ticket.status == 'New':
         ticket.status = 'Under Review'
     
     try:
+        update_counters(removed=[counter_before], added=[ticket_counter_key(ticket)])
+        record_ticket_changes('update', [ticket])
         db.session.commit()
+        _publish_ticket_status(ticket, old_status)
         return jsonify({
             'message': f'Ticket assigned to {user.username}',
             'ticket': ticket.to_dict()
@@ -300,17 +389,35 @@ def delete_ticket(ticket_id):
         return jsonify({'error': 'Ticket not found'}), 404
     
     # If ticket was active, restore asset status
-    if ticket.status not in ['Resolved', 'Closed']:
+    restored = ticket.status not in ['Resolved', 'Closed']
+    removed, added = [ticket_counter_key(ticket)], []
+    if restored:
         asset = ticket.asset
+        state_before = asset_state(asset)
+        removed.append(asset_counter_key(asset))
         if asset.assigned_to_user_id:
             asset.status = 'Assigned'
         else:
             asset.status = 'Available'
-        asset.updated_at = db.func.now()
+        asset.updated_at = datetime.utcnow()
     
     try:
+        if restored:
+            log_change(
+                asset, state_before, 'maintenance_cancelled', get_current_user().id,
+                details=f'Maintenance ticket #{ticket.id} deleted',
+                extra_data={'ticket_id': ticket.id, 'new_asset_status': asset.status}
+            )
+            record_changes('asset', 'update', [asset.id])
+            added.append(asset_counter_key(asset))
+        update_counters(removed=removed, added=added)
+        record_ticket_changes('delete', [ticket])
         db.session.delete(ticket)
         db.session.commit()
+        invalidate_assets(ticket.asset_id)
+        if restored:
+            publish_asset_status([(asset.id, state_before['status'], asset.status)])
+        publish('ticket.deleted', {'id': ticket.id, 'asset_id': ticket.asset_id}, owner_user_id=ticket.reported_by_user_id)
         return jsonify({'message': 'Ticket deleted successfully'}), 200
     except Exception as e:
         db.session.rollback()
@@ -348,9 +455,10 @@ def upload_attachment(ticket_id):
         
         # Store relative path
         ticket.attachment_url = f'/uploads/{filename}'
-        ticket.updated_at = db.func.now()
+        ticket.updated_at = datetime.utcnow()
         
         try:
+            record_ticket_changes('update', [ticket])
             db.session.commit()
             return jsonify({
                 'message': 'File uploaded successfully',
@@ -3,9 +3,16 @@ Users management routes
 """
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
+from datetime import datetime
 from app import db
 from app.models.user import User
+from app.models.maintenance import MaintenanceTicket
 from app.middleware.auth import require_role, get_current_user
+from app.services.asset_cache import invalidate_assets
+from app.services.change_feed import record_changes, record_ticket_changes
+from app.services.kpis import asset_counter_key, counted_assets, move_department, update_counters
+from app.utils.conditional import build_etag, collection_version, not_modified, with_validators
+from app.utils.fields import InvalidFields, parse_fields, field_columns, serialize_row
 
 bp = Blueprint('users', __name__)
 
@@ -13,16 +20,39 @@ bp = Blueprint('users', __name__)
 @bp.route('/', methods=['GET'])
 @jwt_required()
 def get_users():
-    """List all users"""
+    """
+    List all users
+    Query params:
+    - fields: Comma-separated user columns to return (column-only SELECT)
+    """
     current_user = get_current_user()
     
+    try:
+        fields = parse_fields(request.args, User)
+    except InvalidFields as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if fields:
+        query = db.session.query(*field_columns(User, fields)).select_from(User)
+    else:
+        query = User.query
+    
     # Filter by department if not Admin
     if current_user.role != 'Admin':
-        users = User.query.filter_by(department=current_user.department).all()
-    else:
-        users = User.query.all()
+        query = query.filter(User.department == current_user.department)
+    
+    latest, count = collection_version(query, User.updated_at)
+    etag = build_etag('users', request.query_string, current_user.role, current_user.department, latest, count)
+    cached = not_modified(etag)
+    if cached:
+        return cached
     
-    return jsonify([user.to_dict() for user in users]), 200
+    if fields:
+        response = jsonify([serialize_row(row, fields) for row in query.all()])
+        return with_validators(response, etag), 200
+    
+    users = query.all()
+    return with_validators(jsonify([user.to_dict() for user in users]), etag), 200
 
 
 @bp.route('/<int:user_id>', methods=['GET'])
@@ -39,7 +69,12 @@ def get_user(user_id):
     if current_user.role != 'Admin' and user.department != current_user.department:
         return jsonify({'error': 'Access denied'}), 403
     
-    return jsonify(user.to_dict()), 200
+    etag = build_etag('user', user.id, user.updated_at)
+    cached = not_modified(etag, user.updated_at)
+    if cached:
+        return cached
+    
+    return with_validators(jsonify(user.to_dict()), etag, user.updated_at), 200
 
 
 @bp.route('/<int:user_id>', methods=['PUT'])
@@ -53,6 +88,7 @@ def update_user(user_id):
         return jsonify({'error': 'User not found'}), 404
     
     data = request.get_json()
+    department_before = user.department
     
     # Update allowed fields
     allowed_fields = ['role', 'department', 'email', 'is_active']
@@ -60,9 +96,10 @@ def update_user(user_id):
         if field in data:
             setattr(user, field, data[field])
     
-    user.updated_at = db.func.now()
+    user.updated_at = datetime.utcnow()
     
     try:
+        move_department(user, department_before)
         db.session.commit()
         return jsonify({
             'message': 'User updated successfully',
@@ -89,8 +126,21 @@ def delete_user(user_id):
         return jsonify({'error': 'Cannot delete your own account'}), 400
     
     try:
+        # Deleting the user clears it from assigned assets and from tickets
+        assets = counted_assets(user)
+        removed = [asset_counter_key(asset, {user.id: user.department}) for asset in assets]
+        update_counters(removed=removed, added=[key._replace(department=None) for key in removed])
+        asset_ids = [asset.id for asset in assets]
+        record_changes('asset', 'update', asset_ids)
+        record_ticket_changes('update', MaintenanceTicket.query.with_entities(
+            MaintenanceTicket.id, MaintenanceTicket.reported_by_user_id
+        ).filter(db.or_(
+            MaintenanceTicket.reported_by_user_id == user.id,
+            MaintenanceTicket.assigned_to_user_id == user.id
+        )))
         db.session.delete(user)
         db.session.commit()
+        invalidate_assets(*asset_ids)
         return jsonify({'message': 'User deleted successfully'}), 200
     except Exception as e:
         db.session.rollback()
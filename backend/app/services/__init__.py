@@ -0,0 +1,3 @@
+"""
+Application services shared across routes
+"""
@@ -0,0 +1,193 @@
+"""
+In-process asset cache
+
+A bounded LRU of asset column snapshots keyed by ID. A hit is attached to the
+current session with merge(load=False), so callers get an ordinary persistent
+Asset without a SELECT; while the caller holds it, relationship loads such as
+ticket.asset resolve from the session's identity map too. Write paths call
+invalidate_assets() once their transaction has committed; ASSET_CACHE_TTL
+bounds staleness against writes made by other worker processes.
+
+Only read endpoints load through the cache. A write route checks state and
+records before-images for history, counters and the timeline, so it reads
+the row with db.session.get() rather than a snapshot another worker's write
+may have made stale.
+"""
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+from app import db
+from app.models.asset import Asset
+
+_COLUMNS = [attr.key for attr in inspect(Asset).column_attrs]
+
+
+class AssetCache:
+    """Thread-safe LRU of asset snapshots with hit/miss counters"""
+    
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+    
+    def get(self, asset_id):
+        """The cached snapshot for an asset, or None"""
+        with self._lock:
+            entry = self._entries.get(asset_id)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self._entries[asset_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(asset_id)
+            self.hits += 1
+            return entry[0]
+    
+    def generation(self):
+        """Invalidation counter; read it before loading from the database"""
+        return self._generation
+    
+    def put(self, asset_id, snapshot, generation):
+        """
+        Store a snapshot loaded after generation() returned `generation`.
+        Dropped if anything was invalidated meanwhile, since the load may
+        predate that write.
+        """
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[asset_id] = (snapshot, time.monotonic() + self.ttl)
+            self._entries.move_to_end(asset_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def invalidate(self, asset_ids):
+        """Drop assets after a write"""
+        with self._lock:
+            self._generation += 1
+            for asset_id in asset_ids:
+                if self._entries.pop(asset_id, None) is not None:
+                    self.invalidations += 1
+    
+    def clear(self):
+        """Drop every entry (counters are kept)"""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+    
+    def stats(self):
+        """Size and counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': True,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
+
+
+def init_asset_cache(app):
+    """Create the cache when ASSET_CACHE_ENABLED is set"""
+    if app.config.get('ASSET_CACHE_ENABLED'):
+        app.extensions['asset_cache'] = AssetCache(
+            app.config.get('ASSET_CACHE_SIZE', 10000),
+            app.config.get('ASSET_CACHE_TTL', 300)
+        )
+
+
+def _cache():
+    return current_app.extensions.get('asset_cache')
+
+
+def _in_session(asset_id):
+    """The asset if the current session already holds it"""
+    return db.session.identity_map.get(inspect(Asset).identity_key_from_primary_key((asset_id,)))
+
+
+def _snapshot(asset):
+    return {key: getattr(asset, key) for key in _COLUMNS}
+
+
+def _attach(snapshot):
+    """A persistent Asset in the current session built from a snapshot, without a SELECT"""
+    asset = Asset(**snapshot)
+    make_transient_to_detached(asset)
+    return db.session.merge(asset, load=False)
+
+
+def load_asset(asset_id):
+    """Asset by ID (like Asset.query.get), served from the cache when possible; for read endpoints only"""
+    cache = _cache()
+    if cache is None:
+        return db.session.get(Asset, asset_id)
+    
+    try:
+        asset_id = int(asset_id)
+    except (TypeError, ValueError):
+        return None
+    
+    asset = _in_session(asset_id)
+    if asset is not None:
+        return asset
+    
+    snapshot = cache.get(asset_id)
+    if snapshot is not None:
+        return _attach(snapshot)
+    
+    generation = cache.generation()
+    asset = db.session.get(Asset, asset_id)
+    if asset is not None:
+        cache.put(asset_id, _snapshot(asset), generation)
+    return asset
+
+
+def load_assets(asset_ids):
+    """
+    Assets by ID as a dict, cached ones first and the rest with one IN query;
+    used to enrich ticket and license listings without a SELECT per row
+    """
+    cache = _cache()
+    assets, missing = {}, []
+    for asset_id in {asset_id for asset_id in asset_ids if asset_id is not None}:
+        asset = _in_session(asset_id)
+        if asset is None and cache is not None:
+            snapshot = cache.get(asset_id)
+            asset = _attach(snapshot) if snapshot is not None else None
+        if asset is not None:
+            assets[asset_id] = asset
+        else:
+            missing.append(asset_id)
+    
+    if missing:
+        generation = cache.generation() if cache is not None else None
+        for asset in Asset.query.filter(Asset.id.in_(missing)).all():
+            assets[asset.id] = asset
+            if cache is not None:
+                cache.put(asset.id, _snapshot(asset), generation)
+    return assets
+
+
+def invalidate_assets(*asset_ids):
+    """Drop changed assets from the cache; call after the write has committed"""
+    cache = _cache()
+    if cache is not None:
+        cache.invalidate(asset_ids)
+
+
+def cache_stats():
+    """Counters for the stats endpoint"""
+    cache = _cache()
+    return cache.stats() if cache is not None else {'enabled': False}
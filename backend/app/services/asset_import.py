@@ -0,0 +1,245 @@
+"""
+Bulk asset import
+
+Rows are parsed lazily from a CSV or NDJSON stream, validated, and written in
+chunked transactions: one executemany INSERT for the assets of a chunk, one
+for their `created` history entries and one for their initial snapshots, plus
+the chunk's depreciation schedules.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from app import db
+from app.models.asset import Asset
+from app.models.history import AssetHistory
+from app.services.asset_versions import new_asset_state, track_changes
+from app.services.change_feed import record_changes
+from app.services.depreciation_schedule import update_schedules
+from app.services.events import publish_asset_status
+from app.services.kpis import AssetCounterKey, update_counters
+
+ASSET_FIELDS = [
+    'name', 'description', 'category', 'serial_number', 'purchase_date', 'purchase_price',
+    'warranty_expiration', 'status', 'condition', 'location'
+]
+DATE_FIELDS = ['purchase_date', 'warranty_expiration']
+VALID_STATUSES = list(Asset.__table__.c.status.type.enums)
+VALID_CONDITIONS = list(Asset.__table__.c.condition.type.enums)
+_PRICE_TYPE = Asset.__table__.c.purchase_price.type
+PRICE_LIMIT = Decimal(10) ** (_PRICE_TYPE.precision - _PRICE_TYPE.scale)  # Exclusive bound of Numeric(10, 2)
+
+
+class InvalidImport(ValueError):
+    """Raised when an import stream cannot be read as a whole"""
+
+
+def _readable(rows):
+    """Turn decoding and CSV framing errors of a row stream into InvalidImport"""
+    try:
+        yield from rows
+    except UnicodeDecodeError as e:
+        raise InvalidImport('File is not valid UTF-8') from e
+    except csv.Error as e:
+        raise InvalidImport(f'Malformed CSV: {e}') from e
+
+
+def _normalize_key(key):
+    """Map a CSV header to a field name, e.g. 'Serial Number' -> 'serial_number'"""
+    return (key or '').strip().lower().replace(' ', '_')
+
+
+def iter_csv(stream):
+    """Yield (line number, dict) for each data row of a CSV byte stream"""
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    
+    def rows():
+        if reader.fieldnames:
+            reader.fieldnames = [_normalize_key(name) for name in reader.fieldnames]
+        for row in reader:
+            yield reader.line_num, {key: (value.strip() if isinstance(value, str) else value) for key, value in row.items()}
+    return _readable(rows())
+
+
+def iter_ndjson(stream):
+    """Yield (line number, dict or error string) for each line of an NDJSON byte stream"""
+    def rows():
+        for line_num, line in enumerate(io.TextIOWrapper(stream, encoding='utf-8'), start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                data = json.loads(line)
+            except ValueError:
+                yield line_num, 'Invalid JSON'
+                continue
+            yield line_num, data if isinstance(data, dict) else 'Each line must be a JSON object'
+    return _readable(rows())
+
+
+def validate_row(data):
+    """
+    Validate one import row
+    Returns (values, errors) where values holds Asset column values
+    """
+    errors = []
+    values = {}
+    
+    for field in ASSET_FIELDS:
+        value = data.get(field)
+        values[field] = None if value == '' else value
+    
+    for field in ['name', 'category']:
+        if not values[field]:
+            errors.append(f'{field} is required')
+    
+    for field in DATE_FIELDS:
+        if values[field] is not None:
+            try:
+                values[field] = datetime.strptime(str(values[field]), '%Y-%m-%d').date()
+            except ValueError:
+                errors.append(f'Invalid {field} format. Use YYYY-MM-DD')
+    
+    if values['purchase_price'] is not None:
+        try:
+            price = Decimal(str(values['purchase_price']))
+        except InvalidOperation:
+            price = None
+        if price is None or not price.is_finite():
+            errors.append('purchase_price must be a number')
+        elif abs(price) >= PRICE_LIMIT or abs(price.quantize(Decimal('0.01'))) >= PRICE_LIMIT:
+            errors.append(f'purchase_price must be less than {PRICE_LIMIT:,} in absolute value')
+        else:
+            values['purchase_price'] = price.quantize(Decimal('0.01'))
+    
+    values['status'] = values['status'] or 'Available'
+    if values['status'] not in VALID_STATUSES:
+        errors.append(f'Invalid status. Must be one of: {", ".join(VALID_STATUSES)}')
+    
+    values['condition'] = values['condition'] or 'Good'
+    if values['condition'] not in VALID_CONDITIONS:
+        errors.append(f'Invalid condition. Must be one of: {", ".join(VALID_CONDITIONS)}')
+    
+    values['description'] = values['description'] or ''
+    values['location'] = values['location'] or ''
+    
+    return values, errors
+
+
+def _existing_serials(serials):
+    """Return the subset of serial numbers already stored"""
+    if not serials:
+        return set()
+    rows = db.session.query(Asset.serial_number).filter(Asset.serial_number.in_(serials)).all()
+    return {serial for serial, in rows}
+
+
+def _insert_assets(rows):
+    """Insert asset rows in one statement and return their (id, name) pairs in row order"""
+    if db.engine.dialect.insert_executemany_returning:
+        result = db.session.execute(
+            Asset.__table__.insert().returning(Asset.id, Asset.name, sort_by_parameter_order=True), rows
+        )
+        return result.all()
+    
+    # Dialects without executemany RETURNING (e.g. MySQL): let the ORM batch the flush
+    assets = [Asset(**row) for row in rows]
+    db.session.add_all(assets)
+    db.session.flush()
+    return [(asset.id, asset.name) for asset in assets]
+
+
+def _write_chunk(chunk, performed_by_user_id):
+    """Insert a validated chunk of (line, values) and its history, then commit"""
+    now = datetime.utcnow()
+    created = _insert_assets([{**values, 'created_at': now} for _, values in chunk])
+    states = [new_asset_state(values) for _, values in chunk]
+    diffs = track_changes([(asset_id, None, state, now) for (asset_id, _), state in zip(created, states)])
+    db.session.execute(AssetHistory.__table__.insert(), [
+        {
+            'asset_id': asset_id,
+            'action': 'created',
+            'performed_by_user_id': performed_by_user_id,
+            'details': f'Asset created: {name} (bulk import)',
+            'extra_data': {'changes': diff},
+            'created_at': now
+        }
+        for (asset_id, name), diff in zip(created, diffs)
+    ])
+    update_schedules(added=[(values['category'], values['purchase_price'], values['purchase_date']) for _, values in chunk])
+    update_counters(added=[
+        AssetCounterKey(values['status'], values['category'], values['purchase_price'], None, now) for _, values in chunk
+    ])
+    record_changes('asset', 'insert', [asset_id for asset_id, _ in created])
+    db.session.commit()
+    publish_asset_status((asset_id, None, state['status']) for (asset_id, _), state in zip(created, states))
+    return len(created)
+
+
+def import_assets(rows, performed_by_user_id, chunk_size=1000, max_errors=100):
+    """
+    Validate and insert assets from an iterable of (line number, row)
+    Returns a report with created/failed counts and the errors of the first
+    `max_errors` rejected rows (errors_truncated says whether there were
+    more). A stream that cannot be read stops the import with the report's
+    `error` set; chunks written before it stay committed.
+    """
+    report = {'created': 0, 'failed': 0, 'errors': [], 'errors_truncated': False}
+    seen_serials = set()
+    
+    def reject(line, errors):
+        report['failed'] += 1
+        if len(report['errors']) < max_errors:
+            report['errors'].append({'row': line, 'errors': errors})
+        else:
+            report['errors_truncated'] = True
+    
+    def flush(pending):
+        # Check serial uniqueness against the database once per chunk
+        existing = _existing_serials([values['serial_number'] for _, values in pending if values['serial_number']])
+        valid = []
+        for line, values in pending:
+            if values['serial_number'] in existing:
+                reject(line, [f'serial_number {values["serial_number"]} already exists'])
+            else:
+                valid.append((line, values))
+        if valid:
+            try:
+                report['created'] += _write_chunk(valid, performed_by_user_id)
+            except Exception as e:
+                db.session.rollback()
+                for line, _ in valid:
+                    reject(line, [f'Failed to insert chunk: {e}'])
+    
+    pending = []
+    try:
+        for line, data in rows:
+            if isinstance(data, str):
+                reject(line, [data])
+                continue
+            
+            values, errors = validate_row(data)
+            serial = values['serial_number']
+            if serial is not None:
+                serial = values['serial_number'] = str(serial)
+                if serial in seen_serials:
+                    errors.append(f'Duplicate serial_number {serial} in import')
+            if errors:
+                reject(line, errors)
+                continue
+            
+            if serial is not None:
+                seen_serials.add(serial)
+            pending.append((line, values))
+            if len(pending) >= chunk_size:
+                flush(pending)
+                pending = []
+    except InvalidImport as e:
+        report['error'] = str(e)
+        return report
+    
+    if pending:
+        flush(pending)
+    
+    return report
@@ -0,0 +1,178 @@
+"""
+Structured asset changes and point-in-time reads
+
+Write paths log every change to an asset with a per-field diff under
+extra_data['changes'] ({field: [old, new]}), and keep AssetSnapshot rows: one
+when the asset is created and another after every ASSET_SNAPSHOT_INTERVAL
+changes. asset_as_of() starts from the latest snapshot at or before the
+requested time and applies the diffs logged after it, so a rebuild reads one
+snapshot and at most one interval of history entries however long the
+asset's history is.
+"""
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from flask import current_app
+from sqlalchemy import bindparam, func
+from app import db
+from app.models.asset import Asset
+from app.models.history import AssetHistory, AssetSnapshot
+from app.services.history_archive import archived_entries
+
+TRACKED_FIELDS = (
+    'name', 'description', 'category', 'serial_number', 'purchase_date', 'purchase_price',
+    'warranty_expiration', 'status', 'condition', 'assigned_to_user_id', 'location'
+)
+
+
+def _json_value(value):
+    """A column value in the form Asset.to_dict() returns it"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def asset_state(asset):
+    """Tracked fields and updated_at of an asset, or of a row with the same attributes"""
+    state = {field: _json_value(getattr(asset, field)) for field in TRACKED_FIELDS}
+    # Prices assigned from request data may still be ints or strings
+    if state['purchase_price'] is not None:
+        state['purchase_price'] = float(state['purchase_price'])
+    state['updated_at'] = _json_value(asset.updated_at)
+    return state
+
+
+def new_asset_state(values):
+    """The state of an asset about to be inserted from column values, with column defaults"""
+    state = {}
+    for field in TRACKED_FIELDS:
+        default = Asset.__table__.c[field].default
+        value = values.get(field, default.arg if default is not None and not default.is_callable else None)
+        state[field] = _json_value(value)
+    if state['purchase_price'] is not None:
+        state['purchase_price'] = float(state['purchase_price'])
+    state['updated_at'] = None
+    return state
+
+
+def diff_states(before, after):
+    """{field: [old, new]} for the tracked fields that differ"""
+    before = before or {}
+    return {
+        field: [before.get(field), after[field]]
+        for field in TRACKED_FIELDS
+        if before.get(field) != after[field]
+    }
+
+
+def track_changes(changes):
+    """
+    Keep snapshots current for a batch of (asset_id, before, after, at)
+    changes, where before is None for a new asset, and return the diff of
+    each change for its history entry. Runs in the caller's transaction.
+    """
+    interval = current_app.config.get('ASSET_SNAPSHOT_INTERVAL', 50)
+    table = AssetSnapshot.__table__
+    latest = {}
+    existing = [asset_id for asset_id, before, _, _ in changes if before is not None]
+    if existing:
+        latest_ids = db.session.query(func.max(AssetSnapshot.id)).filter(
+            AssetSnapshot.asset_id.in_(existing)
+        ).group_by(AssetSnapshot.asset_id)
+        latest = {
+            row.asset_id: [row.id, row.diff_count]
+            for row in db.session.query(AssetSnapshot.id, AssetSnapshot.asset_id, AssetSnapshot.diff_count)
+            .filter(AssetSnapshot.id.in_(latest_ids))
+        }
+    
+    inserts, counted, diffs = [], {}, []
+    for asset_id, before, after, at in changes:
+        diffs.append(diff_states(before, after))
+        snapshot = latest.get(asset_id)
+        if before is None or (snapshot is not None and snapshot[1] + 1 >= interval):
+            inserts.append({'asset_id': asset_id, 'created_at': at, 'state': after, 'diff_count': 0})
+        elif snapshot is None:
+            # First change tracked for an older asset: its prior state is the baseline
+            since = datetime.fromisoformat(before['updated_at']) if before.get('updated_at') else at
+            inserts.append({'asset_id': asset_id, 'created_at': min(since, at), 'state': before, 'diff_count': 1})
+        else:
+            snapshot[1] += 1
+            counted[snapshot[0]] = snapshot[1]
+    
+    if inserts:
+        db.session.execute(table.insert(), inserts)
+    if counted:
+        db.session.execute(
+            table.update().where(table.c.id == bindparam('b_id')).values(diff_count=bindparam('b_count')),
+            [{'b_id': snapshot_id, 'b_count': count} for snapshot_id, count in counted.items()]
+        )
+    return diffs
+
+
+def log_change(asset, before, action, performed_by_user_id, extra_data=None, **fields):
+    """
+    Log a history entry for a change to `asset` (already applied and
+    flushed) with its diff against `before`, the asset_state() taken before
+    the change or None for a new asset
+    """
+    at = datetime.utcnow()
+    changes = track_changes([(asset.id, before, asset_state(asset), at)])[0]
+    return AssetHistory.log_action(
+        asset_id=asset.id,
+        action=action,
+        performed_by_user_id=performed_by_user_id,
+        extra_data={**(extra_data or {}), 'changes': changes},
+        created_at=at,
+        **fields
+    )
+
+
+def parse_as_of(value):
+    """
+    Parse an as_of query value into a naive UTC datetime; a bare date means
+    the end of that day. Raises ValueError.
+    """
+    if len(value) == 10:
+        return datetime.combine(date.fromisoformat(value), datetime.max.time())
+    moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if moment.tzinfo is not None:
+        moment = (moment - moment.utcoffset()).replace(tzinfo=None)
+    return moment
+
+
+def asset_as_of(asset_id, as_of):
+    """
+    The state of an asset at `as_of`, rebuilt from the latest snapshot at
+    or before it plus the diffs logged after that snapshot (hot or archived).
+    Returns (state, snapshot time, diffs applied), or None when no snapshot
+    is that old (before the asset existed or before changes were tracked).
+    """
+    snapshot = AssetSnapshot.query.filter(
+        AssetSnapshot.asset_id == asset_id,
+        AssetSnapshot.created_at <= as_of
+    ).order_by(AssetSnapshot.created_at.desc(), AssetSnapshot.id.desc()).first()
+    if snapshot is None:
+        return None
+    
+    hot = [tuple(row) for row in db.session.query(AssetHistory.created_at, AssetHistory.id, AssetHistory.extra_data).filter(
+        AssetHistory.asset_id == asset_id,
+        AssetHistory.created_at > snapshot.created_at,
+        AssetHistory.created_at <= as_of
+    )]
+    cold = [
+        (entry['_created_at'], entry['id'], entry['extra_data'])
+        for entry in archived_entries(asset_id, since=snapshot.created_at, until=as_of + timedelta(microseconds=1))
+        if entry['_created_at'] > snapshot.created_at
+    ]
+    
+    state = dict(snapshot.state)
+    applied = 0
+    for created_at, _, extra_data in sorted(hot + cold):
+        changes = extra_data.get('changes') if isinstance(extra_data, dict) else None
+        if changes:
+            for field, (_, new) in changes.items():
+                state[field] = new
+            state['updated_at'] = created_at.isoformat()
+            applied += 1
+    return state, snapshot.created_at, applied
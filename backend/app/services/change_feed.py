@@ -0,0 +1,197 @@
+"""
+Incremental change feed
+
+Write routes call record_changes() in their transaction for every asset,
+maintenance ticket and license they insert, update or delete. A client keeps
+a local copy of those lists by storing the feed cursor, loading the lists
+once, then asking changes_since() for what happened after the cursor: the
+current payload of each inserted or updated row and the IDs of deleted ones.
+
+Entries are held in the session and numbered just before the transaction
+commits, under a lock on the ChangeLogSequence row that lasts until the
+commit. IDs are therefore assigned in commit order, on any database, and an
+ID cursor never skips a change that commits later. prune_changes() drops
+entries older than CHANGE_LOG_RETENTION_DAYS; cursors from before the oldest
+kept entry are rejected with StaleCursor and the client reloads the lists.
+"""
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import event, func, or_, select, update
+from sqlalchemy.orm import Session
+from app import db
+from app.models.asset import Asset
+from app.models.change_log import ChangeLogEntry, ChangeLogSequence
+from app.models.license import License
+from app.models.maintenance import MaintenanceTicket
+from app.models.user import User
+from app.services.asset_cache import load_assets
+from app.utils.pagination import InvalidCursor, decode_cursor, encode_cursor
+
+_MODELS = {'asset': Asset, 'ticket': MaintenanceTicket, 'license': License}
+
+
+class StaleCursor(ValueError):
+    """Raised when a feed cursor predates the retained change log"""
+
+
+def record_changes(entity, operation, ids, owners=None):
+    """
+    Log `operation` on the `entity` rows with these IDs; the entries are
+    inserted when the caller's transaction commits. `owners` maps ticket
+    IDs to their reporter.
+    """
+    now = datetime.utcnow()
+    owners = owners or {}
+    rows = [
+        {
+            'entity': entity,
+            'entity_id': entity_id,
+            'operation': operation,
+            'owner_user_id': owners.get(entity_id),
+            'created_at': now
+        }
+        for entity_id in ids
+    ]
+    if rows:
+        db.session.info.setdefault('change_log', []).extend(rows)
+
+
+def record_ticket_changes(operation, tickets):
+    """record_changes() for ticket objects or (id, reported_by_user_id) rows"""
+    owners = {ticket.id: ticket.reported_by_user_id for ticket in tickets}
+    record_changes('ticket', operation, list(owners), owners)
+
+
+@event.listens_for(Session, 'before_commit')
+def _number_changes(session):
+    rows = session.info.pop('change_log', None)
+    if not rows:
+        return
+    # The row lock serializes committing writers until their commit
+    sequence = ChangeLogSequence.__table__
+    session.execute(update(sequence).where(sequence.c.id == 1).values(value=sequence.c.value + len(rows)))
+    last = session.execute(select(sequence.c.value).where(sequence.c.id == 1)).scalar_one()
+    for entry_id, row in enumerate(rows, start=last - len(rows) + 1):
+        row['id'] = entry_id
+    session.execute(ChangeLogEntry.__table__.insert(), rows)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_changes(session, previous_transaction):
+    if not previous_transaction.nested:
+        session.info.pop('change_log', None)
+
+
+def current_cursor():
+    """A cursor positioned after every change logged so far"""
+    return encode_cursor('changes', [db.session.query(func.max(ChangeLogEntry.id)).scalar() or 0])
+
+
+def _serialize(entity, rows):
+    """Payloads in the shape the list endpoints return, by ID"""
+    if entity == 'asset':
+        return {row.id: row.to_dict() for row in rows}
+    
+    assets = load_assets(row.asset_id for row in rows)
+    if entity == 'license':
+        result = {}
+        for license in rows:
+            data = license.to_dict()
+            asset = assets.get(license.asset_id)
+            if asset:
+                data['asset'] = {'id': asset.id, 'name': asset.name, 'serial_number': asset.serial_number}
+            result[license.id] = data
+        return result
+    
+    user_ids = {row.reported_by_user_id for row in rows} | {row.assigned_to_user_id for row in rows}
+    users = {user.id: user for user in User.query.filter(User.id.in_(user_ids - {None}))} if user_ids - {None} else {}
+    result = {}
+    for ticket in rows:
+        data = ticket.to_dict()
+        asset = assets.get(ticket.asset_id)
+        reporter = users.get(ticket.reported_by_user_id)
+        assignee = users.get(ticket.assigned_to_user_id)
+        data['asset'] = asset.to_dict() if asset else None
+        data['reporter'] = reporter.to_dict() if reporter else None
+        data['assignee'] = assignee.to_dict() if assignee else None
+        result[ticket.id] = data
+    return result
+
+
+def changes_since(cursor, limit, user):
+    """
+    Changes logged after `cursor`, oldest first, collapsed to one item per
+    row: {'entity', 'id', 'operation', 'data'} with the row's current payload,
+    or data None for deletes. Employees only see changes to their own
+    tickets. Returns (items, next cursor, more). Raises InvalidCursor or
+    StaleCursor.
+    """
+    since = decode_cursor(cursor, 'changes')[0]
+    if not isinstance(since, int) or isinstance(since, bool) or since < 0:
+        raise InvalidCursor('Invalid cursor')
+    
+    # Separate statements: MIN and MAX together defeat the single-seek optimization
+    oldest = db.session.query(func.min(ChangeLogEntry.id)).scalar()
+    newest = db.session.query(func.max(ChangeLogEntry.id)).scalar()
+    if oldest is not None and since < oldest - 1:
+        raise StaleCursor('Cursor is older than the retained change log, reload the lists')
+    
+    # Bounded by the newest ID read up front, so a cursor moved past entries
+    # an employee cannot see never skips one committed meanwhile
+    query = ChangeLogEntry.query.with_entities(
+        ChangeLogEntry.id, ChangeLogEntry.entity, ChangeLogEntry.entity_id, ChangeLogEntry.operation
+    ).filter(ChangeLogEntry.id > since, ChangeLogEntry.id <= (newest or 0))
+    if user.role == 'Employee':
+        query = query.filter(or_(ChangeLogEntry.entity != 'ticket', ChangeLogEntry.owner_user_id == user.id))
+    entries = query.order_by(ChangeLogEntry.id).limit(limit + 1).all()
+    
+    more = len(entries) > limit
+    entries = entries[:limit]
+    next_cursor = encode_cursor('changes', [entries[-1].id if more else max(newest or 0, since)])
+    
+    # Latest operation per row, ordered by its latest change; an insert stays an insert
+    latest = {}
+    for entry in entries:
+        key = (entry.entity, entry.entity_id)
+        operation = entry.operation
+        if operation == 'update' and key in latest and latest[key] == 'insert':
+            operation = 'insert'
+        latest.pop(key, None)
+        latest[key] = operation
+    
+    payloads = {}
+    for entity, model in _MODELS.items():
+        ids = [entity_id for (kind, entity_id), operation in latest.items() if kind == entity and operation != 'delete']
+        if ids:
+            payloads[entity] = _serialize(entity, model.query.filter(model.id.in_(ids)).all())
+    
+    items = []
+    for (entity, entity_id), operation in latest.items():
+        data = None if operation == 'delete' else payloads[entity].get(entity_id)
+        if data is None:
+            # Deleted after this window; the delete also comes later in the feed
+            operation = 'delete'
+        items.append({'entity': entity, 'id': entity_id, 'operation': operation, 'data': data})
+    
+    return items, next_cursor, more
+
+
+def prune_changes(older_than=None):
+    """
+    Delete change log entries created before `older_than` (default:
+    CHANGE_LOG_RETENTION_DAYS ago). The newest entry always stays so
+    older cursors are still recognized as stale. Returns the number deleted.
+    """
+    if older_than is None:
+        older_than = datetime.utcnow() - timedelta(days=current_app.config.get('CHANGE_LOG_RETENTION_DAYS', 30))
+    newest = db.session.query(func.max(ChangeLogEntry.id)).scalar()
+    try:
+        deleted = ChangeLogEntry.query.filter(
+            ChangeLogEntry.created_at < older_than,
+            ChangeLogEntry.id != newest
+        ).delete(synchronize_session=False)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return deleted
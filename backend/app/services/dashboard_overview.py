@@ -0,0 +1,76 @@
+"""
+Dashboard overview execution
+
+/api/dashboard/overview computes several widgets in one request. They run on
+a pool of DASHBOARD_OVERVIEW_WORKERS threads shared by the worker process,
+each in its own app context and so with its own database session, which
+bounds the response time by the slowest widget rather than their sum and the
+database load by the pool size. Widget payloads go through the response cache.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from flask import current_app
+from app import db
+from app.services.response_cache import cached_value
+
+logger = logging.getLogger(__name__)
+
+
+def init_overview(app):
+    """Create the widget pool; with one worker widgets run in the request thread"""
+    workers = app.config.get('DASHBOARD_OVERVIEW_WORKERS', 4)
+    if workers > 1:
+        app.extensions['dashboard_pool'] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='dashboard-widget')
+
+
+def _compute(name, function, models, params, role):
+    """(payload, cached, error, seconds) of one widget in the current app context"""
+    start = time.perf_counter()
+    try:
+        key = ('widget', name, tuple(sorted(params.items())), role)
+        payload, cached = cached_value(key, models, lambda: function(**params))
+        return payload, cached, None, time.perf_counter() - start
+    except Exception as e:
+        logger.exception('Dashboard widget %s failed', name)
+        db.session.rollback()
+        return None, False, str(e), time.perf_counter() - start
+
+
+def _compute_in_thread(app, *args):
+    with app.app_context():
+        try:
+            return _compute(*args)
+        finally:
+            db.session.remove()
+
+
+def run_widgets(jobs, role):
+    """
+    Compute (name, function, models, params) jobs concurrently. Returns
+    ({name: payload}, {name: {'ms', 'cached'}}, {name: error}); a widget
+    still running after DASHBOARD_OVERVIEW_TIMEOUT is reported as an error.
+    """
+    pool = current_app.extensions.get('dashboard_pool')
+    if pool is None:
+        results = {job[0]: _compute(*job, role) for job in jobs}
+    else:
+        app = current_app._get_current_object()
+        futures = {job[0]: pool.submit(_compute_in_thread, app, *job, role) for job in jobs}
+        wait(futures.values(), timeout=current_app.config.get('DASHBOARD_OVERVIEW_TIMEOUT', 10))
+        results = {}
+        for name, future in futures.items():
+            if future.done():
+                results[name] = future.result()
+            else:
+                future.cancel()
+                results[name] = (None, False, 'Timed out', None)
+    
+    payloads, timings, errors = {}, {}, {}
+    for name, (payload, cached, error, seconds) in results.items():
+        if error:
+            errors[name] = error
+        else:
+            payloads[name] = payload
+        timings[name] = {'ms': round(seconds * 1000, 1) if seconds is not None else None, 'cached': cached}
+    return payloads, timings, errors
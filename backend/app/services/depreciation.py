@@ -0,0 +1,220 @@
+"""
+Set-based depreciation engine
+
+Computes category depreciation policies for a whole result set at once.
+Straight-line portfolio totals are pushed down into one SQL aggregate per set
+of policy terms that replays the same double-precision operations as the
+Python model and sums per-asset values in whole cents. Values sitting on a half cent, where SQL and Python rounding can
+disagree, are grouped and rounded by Python, so totals match summing
+calculate_depreciation() over every asset.
+"""
+import math
+from datetime import datetime, timedelta
+from sqlalchemy import Double, case, cast, func, literal, or_, select
+from app import db
+from app.models.asset import Asset
+from app.models.depreciation import DepreciationPolicy
+
+# Half-cent distance (in cents) below which SQL rounding is not trusted
+TIE_TOLERANCE = 1e-4
+
+
+def depreciation_for_rows(rows, today=None):
+    """
+    Depreciation dicts for rows exposing category, purchase_price and
+    purchase_date (ORM objects or column tuples), evaluated against a single
+    `today` with the policies loaded once.
+    """
+    today = today or datetime.now().date()
+    policies = DepreciationPolicy.by_category()
+    default = DepreciationPolicy.default()
+    return [policies.get(row.category, default).compute(row.purchase_price, row.purchase_date, today) for row in rows]
+
+
+def _days_elapsed(today):
+    """Dialect-specific whole days between purchase_date and today, or None"""
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        return func.julianday(today.isoformat()) - func.julianday(Asset.purchase_date)
+    if dialect in ('mysql', 'mariadb'):
+        return func.datediff(today, Asset.purchase_date)
+    if dialect == 'postgresql':
+        return literal(today, db.Date) - Asset.purchase_date
+    return None
+
+
+def _truncate(value):
+    """Dialect-specific truncation toward zero"""
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        return cast(value, db.Integer)
+    if dialect in ('mysql', 'mariadb'):
+        return func.truncate(value, 0)
+    return func.trunc(value)
+
+
+def _rounded_cents(value):
+    """value rounded to whole cents (half away from zero), as an integer"""
+    cents = value * 100
+    return case((value >= 0, _truncate(cents + 0.5)), else_=-_truncate(0.5 - cents))
+
+
+def _near_cent_tie(value):
+    """
+    True when a value is within TIE_TOLERANCE of a half cent. Python's round()
+    decides those on the exact binary value, so such rows are rounded in Python.
+    """
+    cents = func.abs(value * 100)
+    return func.abs(cents - _truncate(cents) - 0.5) < TIE_TOLERANCE
+
+
+def _stage(query):
+    """
+    Turn a SELECT into a subquery for the next computation stage. On SQLite a
+    no-op LIMIT keeps the planner from flattening stages back together, which
+    would re-evaluate every shared subexpression once per reference.
+    """
+    if db.engine.dialect.name == 'sqlite':
+        query = query.limit(-1)
+    return query.subquery()
+
+
+def depreciation_totals(query, today, policy):
+    """
+    Sum purchase price, current value and depreciation over an Asset query in
+    SQL under a straight-line policy. Returns None when the dialect has no
+    supported date difference.
+    
+    The stages mirror Asset.compute_depreciation operation by operation in
+    double precision. Assets bought on or before `cutoff` are past their
+    useful life, which is exactly when min(years_elapsed, life) picks life.
+    """
+    days = _days_elapsed(today)
+    if days is None:
+        return None
+    
+    life = policy.useful_life_years
+    salvage_rate = float(policy.salvage_rate)
+    cutoff = today - timedelta(days=math.ceil(life * 365.25))
+    
+    # Stage 1: inputs and years elapsed (date math only for assets still depreciating)
+    inputs = _stage(query.with_entities(
+        Asset.purchase_price.label('purchase_price'),
+        case((Asset.purchase_date > cutoff, Asset.purchase_date)).label('depreciating_since'),
+        cast(Asset.purchase_price, Double).label('price'),
+        case(
+            (Asset.purchase_date > cutoff, cast(days, Double) / 365.25),
+            else_=float(life)
+        ).label('years_elapsed')
+    ).order_by(None))
+    
+    # Stage 2: salvage value and total depreciation
+    salvage_value = inputs.c.price * salvage_rate
+    totals = _stage(select(
+        inputs.c.purchase_price, inputs.c.depreciating_since, inputs.c.price,
+        salvage_value.label('salvage_value'),
+        ((inputs.c.price - salvage_value) / life * inputs.c.years_elapsed).label('total_depreciation')
+    ))
+    
+    # Stage 3: current value, floored at salvage value
+    remaining = totals.c.price - totals.c.total_depreciation
+    values = _stage(select(
+        totals.c.purchase_price, totals.c.depreciating_since, totals.c.price, totals.c.total_depreciation,
+        case((remaining > totals.c.salvage_value, remaining), else_=totals.c.salvage_value).label('current_value')
+    ))
+    
+    # Stage 4: per-asset rounding to cents, flagging half-cent ties
+    rounded = _stage(select(
+        values.c.purchase_price, values.c.depreciating_since, values.c.price,
+        _rounded_cents(values.c.current_value).label('current_cents'),
+        _rounded_cents(values.c.total_depreciation).label('depreciation_cents'),
+        or_(_near_cent_tie(values.c.current_value), _near_cent_tie(values.c.total_depreciation)).label('tie')
+    ))
+    
+    # Unambiguous rows are summed in the (NULL, NULL) group; ties come back grouped
+    # by price, plus purchase date for assets still depreciating
+    price_key = case((rounded.c.tie, rounded.c.purchase_price)).label('price_key')
+    date_key = case((rounded.c.tie, rounded.c.depreciating_since)).label('date_key')
+    groups = db.session.execute(select(
+        price_key, date_key,
+        func.count(),
+        func.sum(rounded.c.price),
+        func.sum(rounded.c.current_cents),
+        func.sum(rounded.c.depreciation_cents)
+    ).group_by(price_key, date_key)).all()
+    
+    total_purchase_value = total_current_value = total_depreciation = 0
+    ties = []
+    for purchase_price, purchase_date, count, price_sum, current_cents, depreciation_cents in groups:
+        if purchase_price is None:
+            total_purchase_value += float(price_sum or 0)
+            total_current_value += float(current_cents or 0) / 100
+            total_depreciation += float(depreciation_cents or 0) / 100
+        else:
+            ties.append((purchase_price, purchase_date or cutoff, count))
+    
+    tie_totals = _python_totals(ties, today, policy)
+    return (
+        total_purchase_value + tie_totals[0],
+        total_current_value + tie_totals[1],
+        total_depreciation + tie_totals[2]
+    )
+
+
+def _python_totals(rows, today, policy):
+    """Sum policy.compute over (purchase_price, purchase_date, count) rows"""
+    totals = [0, 0, 0]
+    for purchase_price, purchase_date, count in rows:
+        depreciation = policy.compute(purchase_price, purchase_date, today)
+        totals[0] += depreciation['purchase_price'] * count
+        totals[1] += depreciation['current_value'] * count
+        totals[2] += depreciation['total_depreciation'] * count
+    return totals
+
+
+def _policy_groups():
+    """
+    (policy, categories, exclude) per distinct set of policy terms; the
+    default policy covers every category without one (exclude=True)
+    """
+    policies = DepreciationPolicy.by_category()
+    groups = {}
+    for category, policy in policies.items():
+        groups.setdefault(policy.terms, (policy, []))[1].append(category)
+    return [(DepreciationPolicy.default(), list(policies), True)] + [
+        (policy, categories, False) for policy, categories in groups.values()
+    ]
+
+
+def value_summary(query=None, today=None):
+    """
+    Portfolio purchase value, current value and depreciation totals
+    `query` optionally narrows the assets (defaults to all of them).
+    """
+    today = today or datetime.now().date()
+    query = query if query is not None else Asset.query
+    query = query.filter(
+        Asset.purchase_price.isnot(None),
+        Asset.purchase_price != 0,
+        Asset.purchase_date.isnot(None)
+    )
+    
+    totals = [0, 0, 0]
+    for policy, categories, exclude in _policy_groups():
+        scoped = query
+        if categories:
+            scoped = query.filter(Asset.category.notin_(categories) if exclude else Asset.category.in_(categories))
+        part = depreciation_totals(scoped, today, policy) if policy.method == 'straight_line' else None
+        if part is None:
+            # Declining balance or no SQL date math: stream the two input columns, no ORM hydration
+            rows = scoped.with_entities(Asset.purchase_price, Asset.purchase_date, literal(1)).order_by(None).yield_per(10000)
+            part = _python_totals(rows, today, policy)
+        totals = [total + value for total, value in zip(totals, part)]
+    total_purchase_value, total_current_value, total_depreciation = totals
+    
+    return {
+        'total_purchase_value': round(total_purchase_value, 2),
+        'total_current_value': round(total_current_value, 2),
+        'total_depreciation': round(total_depreciation, 2),
+        'depreciation_rate': round((total_depreciation / total_purchase_value * 100) if total_purchase_value > 0 else 0, 2)
+    }
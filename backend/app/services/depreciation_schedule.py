@@ -0,0 +1,172 @@
+"""
+Precomputed depreciation schedules
+
+Portfolio book value is stored per (category, month) in DepreciationSchedule.
+Each asset contributes its month-end book value from its purchase month until
+its useful life ends, after which its salvage value carries forward. Write
+paths report the (category, purchase_price, purchase_date) of assets before
+and after a change and only the affected months are adjusted, so a forecast
+is a range scan over a few rows per category and month.
+"""
+import math
+from collections import Counter, defaultdict
+from functools import lru_cache
+from datetime import date, timedelta
+from sqlalchemy import func
+from app import db
+from app.models.asset import Asset
+from app.models.depreciation import DepreciationPolicy, DepreciationSchedule
+from app.utils.upsert import upsert_add
+
+
+def month_start(day):
+    """First day of the month containing `day`"""
+    return day.replace(day=1)
+
+
+def add_months(period, months):
+    """First day of the month `months` after `period`"""
+    years, month = divmod(period.month - 1 + months, 12)
+    return date(period.year + years, month + 1, 1)
+
+
+def schedule_key(asset):
+    """The inputs of an asset's schedule, for update_schedules()"""
+    return (asset.category, asset.purchase_price, asset.purchase_date)
+
+
+@lru_cache(maxsize=1024)
+def _month_ends(first_period, count):
+    """(period, last day of the month) for `count` months from `first_period`"""
+    months = []
+    period = first_period
+    for _ in range(count):
+        next_period = add_months(period, 1)
+        months.append((period, next_period - timedelta(days=1)))
+        period = next_period
+    return tuple(months)
+
+
+def asset_schedule(policy, purchase_price, purchase_date):
+    """
+    (period, book value in cents, final) for every month of an asset's
+    useful life. The final month is the one in which it reaches salvage value.
+    """
+    if not purchase_price or not purchase_date:
+        return []
+    
+    end_of_life = purchase_date + timedelta(days=math.ceil(policy.useful_life_years * 365.25))
+    months = _month_ends(month_start(purchase_date), policy.useful_life_years * 12 + 2)
+    final = next(index for index, (_, month_end) in enumerate(months) if month_end >= end_of_life)
+    months = months[:final + 1]
+    values = policy.book_values(purchase_price, purchase_date, [month_end for _, month_end in months])
+    return [
+        (period, round(value * 100), month_end >= end_of_life)
+        for (period, month_end), value in zip(months, values)
+    ]
+
+
+def _accumulate(deltas, groups, sign, policies):
+    """
+    Add (category, purchase_price, purchase_date, count) schedules, times
+    `sign`, into the (category, period) deltas. Identical assets share one
+    schedule computation.
+    """
+    default = DepreciationPolicy.default()
+    for category, purchase_price, purchase_date, count in groups:
+        policy = policies.get(category, default)
+        for period, cents, final in asset_schedule(policy, purchase_price, purchase_date):
+            delta = deltas[(category, period)]
+            delta[1 if final else 0] += sign * cents * count
+
+
+def _apply(deltas):
+    """Add (book value, salvage) cent deltas to the stored schedule rows"""
+    upsert_add(DepreciationSchedule.__table__, [
+        {'category': category, 'period': period, 'book_value_cents': book, 'salvage_cents': salvage}
+        for (category, period), (book, salvage) in deltas.items() if book or salvage
+    ], ('book_value_cents', 'salvage_cents'))
+
+
+def update_schedules(removed=(), added=()):
+    """
+    Adjust the precomputed schedules for changed assets. `removed` and `added`
+    hold schedule_key() tuples from before and after the change (an insert
+    only adds, a delete only removes). Runs in the caller's transaction.
+    """
+    policies = DepreciationPolicy.by_category()
+    deltas = defaultdict(lambda: [0, 0])
+    for assets, sign in ((removed, -1), (added, 1)):
+        groups = Counter((category, price, day) for category, price, day in assets if price and day)
+        _accumulate(deltas, ((*key, count) for key, count in groups.items()), sign, policies)
+    _apply(deltas)
+
+
+def rebuild_schedules(category=None, batch_size=10000):
+    """
+    Recompute the schedules from the assets table, for one category (after
+    its policy changed) or for everything. Runs in the caller's transaction.
+    """
+    delete = DepreciationSchedule.__table__.delete()
+    groups = db.session.query(Asset.category, Asset.purchase_price, Asset.purchase_date, func.count()).filter(
+        Asset.purchase_price.isnot(None),
+        Asset.purchase_date.isnot(None)
+    ).group_by(Asset.category, Asset.purchase_price, Asset.purchase_date)
+    if category is not None:
+        delete = delete.where(DepreciationSchedule.category == category)
+        groups = groups.filter(Asset.category == category)
+    db.session.execute(delete)
+    
+    deltas = defaultdict(lambda: [0, 0])
+    _accumulate(deltas, groups.yield_per(batch_size), 1, DepreciationPolicy.by_category())
+    _apply(deltas)
+
+
+def backfill_schedules():
+    """Build the schedules for a database that predates them; a no-op once they exist"""
+    if DepreciationSchedule.query.first() is None and Asset.query.filter(Asset.purchase_price.isnot(None)).first():
+        rebuild_schedules()
+        db.session.commit()
+
+
+def forecast(start, months, category=None):
+    """
+    Month-end portfolio book value for `months` months from `start`, per
+    category and in total. Reads the schedule rows in the window plus one
+    aggregate of the salvage carried in from earlier months.
+    """
+    end = add_months(start, months - 1)
+    carried = db.session.query(
+        DepreciationSchedule.category, func.sum(DepreciationSchedule.salvage_cents)
+    ).filter(DepreciationSchedule.period < start)
+    rows = DepreciationSchedule.query.filter(DepreciationSchedule.period.between(start, end))
+    if category:
+        carried = carried.filter(DepreciationSchedule.category == category)
+        rows = rows.filter(DepreciationSchedule.category == category)
+    carried = dict(carried.group_by(DepreciationSchedule.category).all())
+    
+    periods = [add_months(start, offset) for offset in range(months)]
+    offsets = {period: offset for offset, period in enumerate(periods)}
+    book = defaultdict(lambda: [0] * months)
+    salvage = defaultdict(lambda: [0] * months)
+    for row in rows.all():
+        book[row.category][offsets[row.period]] += row.book_value_cents
+        salvage[row.category][offsets[row.period]] += row.salvage_cents
+    
+    categories = {}
+    for name in sorted(set(carried) | set(book)):
+        running = int(carried.get(name) or 0)
+        values = []
+        for offset in range(months):
+            running += salvage[name][offset]
+            values.append(book[name][offset] + running)
+        if any(values):
+            categories[name] = values
+    
+    return {
+        'start': start.strftime('%Y-%m'),
+        'months': months,
+        'periods': [period.strftime('%Y-%m') for period in periods],
+        'categories': {name: [cents / 100 for cents in values] for name, values in categories.items()},
+        'total': [sum(values[offset] for values in categories.values()) / 100 for offset in range(months)]
+    }
@@ -0,0 +1,265 @@
+"""
+Server-sent event publishing
+
+Write routes call publish() once their transaction has committed. Each worker
+process has one broker that fans events out to the queues of its open
+/api/events/stream connections, so no connection polls the database.
+
+With EVENTS_BROKER = 'local' (default) events reach the streams of the
+publishing process only. With 'socket', a directory of Unix datagram sockets
+stands in for a message broker: every worker binds one socket there, sends
+each event it publishes to the other workers' sockets, and a receiver thread
+fans the events it gets out to its own streams. Sockets of workers that have
+exited are removed by the next publisher that finds them refusing datagrams.
+
+Delivery is best effort. A stream whose queue overflows receives a `resync`
+event, after which the client should reload what it displays.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+import uuid
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+# Larger datagrams fail to send; bulk events stay far below this
+_MAX_DATAGRAM = 65536
+
+
+class Subscription:
+    """One stream's queue of pending events"""
+    
+    def __init__(self, user_id, role, topics, size):
+        self.user_id = user_id
+        self.role = role
+        self.topics = topics
+        self.queue = queue.Queue(maxsize=size)
+        self.overflowed = False
+    
+    def wants(self, event):
+        """Whether this stream receives the event"""
+        if self.topics and event['event'].split('.')[0] not in self.topics:
+            return False
+        # Employees only see events about their own tickets
+        owner = event.get('owner_user_id')
+        return owner is None or self.role != 'Employee' or owner == self.user_id
+    
+    def offer(self, event):
+        """Queue an event; False when the queue is full"""
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except queue.Full:
+            self.overflowed = True
+            return False
+    
+    def get(self, timeout):
+        """The next event, None on timeout, or a resync marker after an overflow"""
+        if self.overflowed:
+            self.overflowed = False
+            while True:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            return {'event': 'resync', 'data': {}}
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBroker:
+    """In-process fan-out to this worker's streams"""
+    
+    mode = 'local'
+    
+    def __init__(self, queue_size, max_subscribers):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self.published = self.delivered = self.dropped = 0
+    
+    def subscribe(self, user_id, role, topics=None):
+        """A new Subscription, or None when this worker has no stream slot left"""
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            subscription = Subscription(user_id, role, topics, self.queue_size)
+            self._subscribers.add(subscription)
+            return subscription
+    
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+    
+    def publish(self, event):
+        with self._lock:
+            self.published += 1
+        self._fan_out(event)
+    
+    def _fan_out(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        delivered = dropped = 0
+        for subscription in subscribers:
+            if subscription.wants(event):
+                if subscription.offer(event):
+                    delivered += 1
+                else:
+                    dropped += 1
+        with self._lock:
+            self.delivered += delivered
+            self.dropped += dropped
+    
+    def stats(self):
+        """Counters for the stats endpoint"""
+        with self._lock:
+            subscribers = len(self._subscribers)
+        return {
+            'mode': self.mode,
+            'subscribers': subscribers,
+            'published': self.published,
+            'delivered': self.delivered,
+            'dropped': self.dropped
+        }
+
+
+class SocketBroker(EventBroker):
+    """Fan-out across the worker processes sharing a socket directory"""
+    
+    mode = 'socket'
+    
+    def __init__(self, queue_size, max_subscribers, directory):
+        super().__init__(queue_size, max_subscribers)
+        self.directory = directory
+        self.received = self.send_failures = 0
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f'events-{os.getpid()}-{uuid.uuid4().hex[:12]}.sock')
+        self._receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._receiver.bind(self.path)
+        self._receiver.settimeout(1.0)
+        self._stopping = False
+        self._sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sender.setblocking(False)
+        self._thread = threading.Thread(target=self._run, name='event-receiver', daemon=True)
+    
+    def start(self):
+        self._thread.start()
+        atexit.register(self.stop)
+    
+    def publish(self, event):
+        super().publish(event)
+        data = json.dumps(event, separators=(',', ':')).encode('utf-8')
+        if len(data) > _MAX_DATAGRAM:
+            logger.error('Event %s too large to send to other workers (%d bytes)', event['event'], len(data))
+            self.send_failures += 1
+            return
+        
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not name.endswith('.sock') or path == self.path:
+                continue
+            try:
+                self._sender.sendto(data, path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Left behind by a worker that has exited
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            except OSError:
+                # A worker too busy to drain its socket misses this event
+                self.send_failures += 1
+    
+    def _run(self):
+        while not self._stopping:
+            try:
+                data = self._receiver.recv(_MAX_DATAGRAM)
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            try:
+                event = json.loads(data)
+            except ValueError:
+                logger.error('Ignoring unreadable event datagram: %r', data[:200])
+                continue
+            self.received += 1
+            self._fan_out(event)
+    
+    def stop(self):
+        """Remove this worker's socket and stop receiving"""
+        self._stopping = True
+        if self._thread.is_alive():
+            self._thread.join(timeout=2)
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        self._receiver.close()
+        self._sender.close()
+    
+    def stats(self):
+        stats = super().stats()
+        stats.update(received=self.received, send_failures=self.send_failures)
+        return stats
+
+
+def init_events(app):
+    """Create this worker's event broker from EVENTS_BROKER"""
+    mode = app.config.get('EVENTS_BROKER', 'local')
+    queue_size = app.config.get('EVENTS_QUEUE_SIZE', 100)
+    max_subscribers = app.config.get('EVENTS_MAX_STREAMS', 100)
+    
+    if mode == 'local':
+        broker = EventBroker(queue_size, max_subscribers)
+    elif mode == 'socket':
+        if not hasattr(socket, 'AF_UNIX'):
+            raise ValueError("EVENTS_BROKER 'socket' needs Unix domain sockets")
+        broker = SocketBroker(
+            queue_size, max_subscribers,
+            app.config.get('EVENTS_SOCKET_DIR') or os.path.join(app.instance_path, 'events')
+        )
+        broker.start()
+    else:
+        raise ValueError(f"EVENTS_BROKER must be 'local' or 'socket', not {mode!r}")
+    app.extensions['event_broker'] = broker
+
+
+def publish(event, data, owner_user_id=None):
+    """
+    Send an event to the open streams; call after the change has committed.
+    `owner_user_id` limits an event to that user among employees.
+    """
+    broker = current_app.extensions.get('event_broker')
+    if broker is None:
+        return
+    try:
+        broker.publish({'event': event, 'data': data, 'owner_user_id': owner_user_id})
+    except Exception:
+        # The write already committed; a missed event must not fail the request
+        logger.exception('Could not publish event %s', event)
+
+
+def publish_asset_status(changes):
+    """An asset.status event for (asset_id, old status, new status) changes; None means created or deleted"""
+    changes = [
+        {'id': asset_id, 'old_status': old, 'status': new}
+        for asset_id, old, new in changes
+        if old != new
+    ]
+    if changes:
+        publish('asset.status', {'assets': changes})
+
+
+def event_stats():
+    """Broker counters"""
+    broker = current_app.extensions.get('event_broker')
+    return broker.stats() if broker is not None else {'mode': None}
@@ -0,0 +1,464 @@
+"""
+Expiry calendar for warranties and licenses
+
+ExpiryCalendarEntry rows hold every asset warranty and every Active license
+expiring from today to EXPIRY_CALENDAR_HORIZON_DAYS ahead, with the item's
+payload, its asset's name and the asset's assignee, so an expiry listing is
+one range read on (kind, expires_on) in date order.
+
+Writes keep the calendar current. Assets, licenses and users changed through
+the ORM are collected at flush, and their entries are rebuilt just before
+the transaction commits, in it. Set-based statements on those tables rebuild
+the affected kinds whole: inline without a scheduler, otherwise on the
+scheduler thread a moment after the commit, so a run of bulk writes costs one
+rebuild.
+
+The scheduler also runs the daily job when the date changes: Active licenses
+past their expiration date become Expired with one UPDATE, and the calendar
+is rebuilt for the new day. With several worker processes each runs the job;
+the second finds nothing left to expire.
+"""
+import atexit
+import logging
+import threading
+import time
+from datetime import date, datetime, timedelta
+from flask import current_app, has_app_context
+from sqlalchemy import case, event, func, inspect, update
+from sqlalchemy.orm import Session
+from app import db
+from app.models.asset import Asset
+from app.models.expiry import ExpiryCalendarEntry
+from app.models.license import License
+from app.models.user import User
+from app.services.change_feed import record_changes
+from app.services.events import publish
+from app.services.kpis import LicenseCounterKey, update_counters
+
+logger = logging.getLogger(__name__)
+
+# Days-until-expiry buckets of the summary; the last ends at the horizon
+BUCKETS = ((0, 7), (8, 30), (31, 90), (91, None))
+
+_EVENT_BATCH = 200  # Licenses per license.expired event, well under a datagram
+_INSERT_BATCH = 1000
+_TRACKED_TABLES = {'assets': ('warranty', 'license'), 'licenses': ('license',), 'users': ('warranty', 'license')}
+
+
+def horizon_days():
+    return current_app.config.get('EXPIRY_CALENDAR_HORIZON_DAYS', 365)
+
+
+def _window():
+    """First and last expiry date the calendar holds"""
+    today = date.today()
+    return today, today + timedelta(days=horizon_days())
+
+
+def _warranty_rows(*criteria):
+    start, end = _window()
+    query = db.session.query(Asset, User.username, User.department).outerjoin(
+        User, User.id == Asset.assigned_to_user_id
+    ).filter(Asset.warranty_expiration >= start, Asset.warranty_expiration <= end, *criteria)
+    for asset, username, department in query.yield_per(_INSERT_BATCH):
+        yield {
+            'kind': 'warranty',
+            'item_id': asset.id,
+            'expires_on': asset.warranty_expiration,
+            'asset_id': asset.id,
+            'asset_name': asset.name,
+            'owner_id': asset.assigned_to_user_id,
+            'owner_username': username,
+            'owner_department': department,
+            'payload': asset.to_dict()
+        }
+
+
+def _license_rows(*criteria):
+    start, end = _window()
+    query = db.session.query(
+        License, Asset.name, Asset.assigned_to_user_id, User.username, User.department
+    ).outerjoin(Asset, Asset.id == License.asset_id).outerjoin(
+        User, User.id == Asset.assigned_to_user_id
+    ).filter(
+        License.status == 'Active', License.expiration_date >= start, License.expiration_date <= end, *criteria
+    )
+    for license, asset_name, owner_id, username, department in query.yield_per(_INSERT_BATCH):
+        yield {
+            'kind': 'license',
+            'item_id': license.id,
+            'expires_on': license.expiration_date,
+            'asset_id': license.asset_id,
+            'asset_name': asset_name,
+            'owner_id': owner_id,
+            'owner_username': username,
+            'owner_department': department,
+            'payload': license.to_dict()
+        }
+
+
+def _insert(rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= _INSERT_BATCH:
+            db.session.execute(ExpiryCalendarEntry.__table__.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(ExpiryCalendarEntry.__table__.insert(), batch)
+
+
+def _pending(session):
+    """Changes awaiting a calendar refresh: asset, license and user IDs, and kinds to rebuild whole"""
+    return session.info.setdefault('expiry_calendar', {
+        'assets': set(), 'licenses': set(), 'users': set(), 'kinds': set()
+    })
+
+
+def refresh_entries(asset_ids=(), license_ids=(), user_ids=()):
+    """
+    Rebuild the entries of changed assets, licenses and users: an asset's
+    warranty and licenses, a license, and the items assigned to a user.
+    Runs in the caller's transaction.
+    """
+    table = ExpiryCalendarEntry.__table__
+    warranty_ids, license_ids = set(asset_ids), set(license_ids)
+    affected = []
+    if asset_ids:
+        affected.append(db.and_(ExpiryCalendarEntry.kind == 'license', ExpiryCalendarEntry.asset_id.in_(asset_ids)))
+    if user_ids:
+        affected.append(ExpiryCalendarEntry.owner_id.in_(user_ids))
+    if affected:
+        for kind, item_id in db.session.query(ExpiryCalendarEntry.kind, ExpiryCalendarEntry.item_id).filter(
+            db.or_(*affected)
+        ):
+            (warranty_ids if kind == 'warranty' else license_ids).add(item_id)
+    
+    if warranty_ids:
+        db.session.execute(table.delete().where(table.c.kind == 'warranty', table.c.item_id.in_(warranty_ids)))
+        _insert(_warranty_rows(Asset.id.in_(warranty_ids)))
+    if license_ids:
+        db.session.execute(table.delete().where(table.c.kind == 'license', table.c.item_id.in_(license_ids)))
+        _insert(_license_rows(License.id.in_(license_ids)))
+
+
+def rebuild_calendar(kinds=ExpiryCalendarEntry.KINDS):
+    """Rebuild every entry of the given kinds for today's window. Runs in the caller's transaction."""
+    kinds = set(kinds)
+    db.session.execute(ExpiryCalendarEntry.__table__.delete().where(ExpiryCalendarEntry.kind.in_(kinds)))
+    if 'warranty' in kinds:
+        _insert(_warranty_rows())
+    if 'license' in kinds:
+        _insert(_license_rows())
+    # This transaction's own set-based writes are covered now
+    pending = db.session.info.get('expiry_calendar')
+    if pending:
+        pending['kinds'] -= kinds
+
+
+def expire_licenses(today=None):
+    """
+    Flip Active licenses past their expiration date to Expired with one
+    UPDATE, adjusting the counters and logging the change. Runs in the
+    caller's transaction; returns the expired licenses for publish_expired().
+    """
+    today = today or date.today()
+    criteria = (License.status == 'Active', License.expiration_date < today)
+    expired = db.session.query(
+        License.id, License.asset_id, License.software_name, License.expiration_date
+    ).filter(*criteria).with_for_update().all()
+    if not expired:
+        return []
+    
+    db.session.execute(
+        update(License).where(*criteria).values(status='Expired', updated_at=datetime.utcnow()),
+        execution_options={'synchronize_session': False}
+    )
+    update_counters(removed=[LicenseCounterKey('Active')] * len(expired), added=[LicenseCounterKey('Expired')] * len(expired))
+    record_changes('license', 'update', [row.id for row in expired])
+    return expired
+
+
+def publish_expired(expired):
+    """license.expired events for licenses expire_licenses() flipped; call after commit"""
+    for start in range(0, len(expired), _EVENT_BATCH):
+        publish('license.expired', {'licenses': [
+            {
+                'id': row.id,
+                'asset_id': row.asset_id,
+                'software_name': row.software_name,
+                'status': 'Expired',
+                'expiration_date': row.expiration_date.isoformat() if row.expiration_date else None
+            }
+            for row in expired[start:start + _EVENT_BATCH]
+        ]})
+
+
+def run_daily_job():
+    """Expire licenses past their date and rebuild the calendar for today; commits"""
+    try:
+        expired = expire_licenses()
+        rebuild_calendar()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    publish_expired(expired)
+    return {'expired': len(expired), 'entries': ExpiryCalendarEntry.query.count()}
+
+
+def expiring(kind, days=30):
+    """
+    Calendar entries of `kind` expiring within `days` (at most the horizon),
+    soonest first, as their payload with days_until_expiry, the asset for
+    licenses and the assignee
+    """
+    today = date.today()
+    days = max(0, min(days, horizon_days()))
+    entries = ExpiryCalendarEntry.query.filter(
+        ExpiryCalendarEntry.kind == kind,
+        ExpiryCalendarEntry.expires_on >= today,
+        ExpiryCalendarEntry.expires_on <= today + timedelta(days=days)
+    ).order_by(ExpiryCalendarEntry.expires_on, ExpiryCalendarEntry.item_id)
+    
+    result = []
+    for entry in entries:
+        item = dict(entry.payload)
+        item['days_until_expiry'] = (entry.expires_on - today).days
+        if kind == 'license' and entry.asset_name is not None:
+            item['asset'] = {'id': entry.asset_id, 'name': entry.asset_name}
+        if entry.owner_id is not None:
+            item['assigned_user'] = {
+                'id': entry.owner_id,
+                'username': entry.owner_username,
+                'department': entry.owner_department
+            }
+        result.append(item)
+    return result
+
+
+def expiry_buckets():
+    """Count of warranties and licenses per days-until-expiry bucket, from one grouped query"""
+    today, end = _window()
+    bounds = [(low, horizon_days() if high is None else high) for low, high in BUCKETS]
+    labels = [f'{low}-{high}' for low, high in bounds]
+    bucket = case(
+        *[
+            (ExpiryCalendarEntry.expires_on <= today + timedelta(days=high), index)
+            for index, (low, high) in enumerate(bounds)
+        ],
+        else_=None
+    )
+    counts = {(kind, None): 0 for kind in ExpiryCalendarEntry.KINDS}
+    for kind, index, count in db.session.query(
+        ExpiryCalendarEntry.kind, bucket, func.count()
+    ).filter(
+        ExpiryCalendarEntry.expires_on >= today, ExpiryCalendarEntry.expires_on <= end
+    ).group_by(ExpiryCalendarEntry.kind, bucket):
+        if index is not None:
+            counts[(kind, index)] = count
+    return {
+        kind: [{'bucket': label, 'count': counts.get((kind, index), 0)} for index, label in enumerate(labels)]
+        for kind in ExpiryCalendarEntry.KINDS
+    }
+
+
+class ExpiryScheduler:
+    """Thread running the daily job and the deferred rebuilds after set-based writes"""
+    
+    def __init__(self, app, delay):
+        self.app = app
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._kinds = set()  # Kinds awaiting a rebuild
+        self._due = None  # Monotonic time the awaited rebuild runs
+        self._last_run = None  # Date of the last daily job
+        self.daily_runs = self.rebuilds = self.expired = self.failures = 0
+        self.last_error = None
+        self._thread = threading.Thread(target=self._run, name='expiry-scheduler', daemon=True)
+    
+    def start(self):
+        self._thread.start()
+        atexit.register(self.stop)
+    
+    def request_rebuild(self, kinds):
+        """Rebuild these kinds after the delay, with whatever else is requested meanwhile"""
+        with self._lock:
+            self._kinds |= set(kinds)
+            if self._due is None:
+                self._due = time.monotonic() + self.delay
+        self._wake.set()
+    
+    def _wait(self):
+        """Seconds until the next daily job or awaited rebuild"""
+        now = datetime.now()
+        if self._last_run != now.date():
+            return 0
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+        wait = (midnight - now).total_seconds()
+        with self._lock:
+            if self._due is not None:
+                wait = min(wait, self._due - time.monotonic())
+        return wait
+    
+    def _step(self):
+        today = date.today()
+        if self._last_run != today:
+            # The daily rebuild covers whatever was awaited
+            with self._lock:
+                self._kinds, self._due = set(), None
+            result = run_daily_job()
+            self._last_run = today
+            self.daily_runs += 1
+            self.expired += result['expired']
+            return
+        
+        with self._lock:
+            if self._due is None or time.monotonic() < self._due:
+                return
+            kinds, self._kinds, self._due = self._kinds, set(), None
+        try:
+            rebuild_calendar(kinds)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            self.request_rebuild(kinds)
+            raise
+        self.rebuilds += 1
+    
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(max(self._wait(), 0.01))
+            self._wake.clear()
+            if self._stopping:
+                break
+            with self.app.app_context():
+                # This thread's own commits rebuild inline
+                db.session.info['expiry_scheduler'] = True
+                try:
+                    self._step()
+                except Exception as e:
+                    self.failures += 1
+                    self.last_error = str(e)
+                    logger.exception('Expiry calendar job failed; retrying')
+                    self._wake.wait(self.delay)
+                finally:
+                    db.session.remove()
+    
+    def stop(self):
+        self._stopping = True
+        self._wake.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=10)
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'last_run': self._last_run.isoformat() if self._last_run else None,
+                'pending_kinds': sorted(self._kinds),
+                'daily_runs': self.daily_runs,
+                'rebuilds': self.rebuilds,
+                'expired': self.expired,
+                'failures': self.failures,
+                'last_error': self.last_error
+            }
+
+
+def backfill_calendar():
+    """Build the calendar for a database that predates it; a no-op once it has entries"""
+    if ExpiryCalendarEntry.query.first() is None and (
+        Asset.query.filter(Asset.warranty_expiration.isnot(None)).first() or License.query.first()
+    ):
+        rebuild_calendar()
+        db.session.commit()
+
+
+def init_expiry_calendar(app):
+    """Start the scheduler when EXPIRY_SCHEDULER_ENABLED"""
+    if app.config.get('EXPIRY_SCHEDULER_ENABLED', True):
+        scheduler = ExpiryScheduler(app, app.config.get('EXPIRY_REBUILD_DELAY', 5.0))
+        scheduler.start()
+        app.extensions['expiry_scheduler'] = scheduler
+
+
+def expiry_stats():
+    """Calendar size per kind and the scheduler's counters"""
+    scheduler = current_app.extensions.get('expiry_scheduler')
+    return {
+        'entries': dict(db.session.query(ExpiryCalendarEntry.kind, func.count()).group_by(ExpiryCalendarEntry.kind).all()),
+        'horizon_days': horizon_days(),
+        'scheduler': scheduler.stats() if scheduler is not None else None
+    }
+
+
+def _identity(instance):
+    """The pending set an ORM instance's changes go to, or None"""
+    if isinstance(instance, Asset):
+        return 'assets'
+    if isinstance(instance, License):
+        return 'licenses'
+    if isinstance(instance, User):
+        return 'users'
+    return None
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_flushed(session, flush_context):
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        name = _identity(instance)
+        if name is None or instance.id is None:
+            continue
+        if name == 'users' and instance not in session.deleted:
+            # Entries only show a user's name and department
+            attrs = inspect(instance).attrs
+            if not (attrs.username.history.has_changes() or attrs.department.history.has_changes()):
+                continue
+        _pending(session)[name].add(instance.id)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_executed(orm_execute_state):
+    # Set-based INSERT/UPDATE/DELETE statements bypass the flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        kinds = _TRACKED_TABLES.get(getattr(table, 'name', None))
+        if kinds:
+            _pending(orm_execute_state.session)['kinds'].update(kinds)
+
+
+@event.listens_for(Session, 'before_commit')
+def _refresh_before_commit(session):
+    if not has_app_context():
+        return
+    if session.new or session.dirty or session.deleted:
+        session.flush()
+    pending = session.info.pop('expiry_calendar', None)
+    if not pending:
+        return
+    
+    kinds = pending['kinds']
+    scheduler = current_app.extensions.get('expiry_scheduler')
+    if kinds and scheduler is not None and not session.info.get('expiry_scheduler'):
+        session.info['expiry_calendar_deferred'] = (scheduler, kinds)
+        kinds = set()
+    if kinds:
+        rebuild_calendar(kinds)
+    if len(kinds) < len(ExpiryCalendarEntry.KINDS):
+        refresh_entries(pending['assets'], pending['licenses'], pending['users'])
+
+
+@event.listens_for(Session, 'after_commit')
+def _rebuild_committed(session):
+    deferred = session.info.pop('expiry_calendar_deferred', None)
+    if deferred:
+        scheduler, kinds = deferred
+        scheduler.request_rebuild(kinds)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_rolled_back(session, previous_transaction):
+    if not previous_transaction.nested:
+        session.info.pop('expiry_calendar', None)
+        session.info.pop('expiry_calendar_deferred', None)
@@ -0,0 +1,344 @@
+"""
+Asset history archival
+
+Entries older than HISTORY_ARCHIVE_AFTER_DAYS are moved out of asset_history
+into append-only HistoryArchiveSegment blocks of compressed JSON, one
+transaction per chunk. HistoryArchiveIndex records which segments hold each
+asset's entries, so reading an asset's timeline decodes only its own
+segments. asset_history() merges both tiers into one newest-first timeline.
+
+Segments are immutable, so deleting an asset only removes its index rows;
+reads across assets skip entries whose asset a segment no longer links.
+"""
+import json
+import time
+import zlib
+from collections import defaultdict
+from datetime import datetime, timedelta
+from functools import lru_cache
+from flask import current_app
+from sqlalchemy import func, select
+from sqlalchemy.orm import joinedload
+from app import db
+from app.models.asset import Asset
+from app.models.history import AssetHistory, HistoryArchiveIndex, HistoryArchiveSegment
+from app.models.user import User
+from app.utils.pagination import keyset_filter
+
+_FIELDS = (
+    'id', 'asset_id', 'action', 'details', 'performed_by_user_id', 'from_user_id',
+    'to_user_id', 'extra_data', 'created_at'
+)
+
+
+def _sort_key(entry):
+    """(created_at, id) of an entry dict, for newest-first ordering"""
+    return (entry['_created_at'] or datetime.min, entry['id'])
+
+
+@lru_cache(maxsize=64)
+def _segment_entries(segment_id, checksum):
+    """
+    Decoded entries of a segment, newest first, and the same grouped by
+    asset. Segments are immutable, so (id, checksum) identifies the content.
+    """
+    data = db.session.query(HistoryArchiveSegment.data).filter(HistoryArchiveSegment.id == segment_id).scalar()
+    entries = json.loads(zlib.decompress(data))[::-1]
+    by_asset = defaultdict(list)
+    for entry in entries:
+        entry['_created_at'] = datetime.fromisoformat(entry['created_at']) if entry['created_at'] else None
+        by_asset[entry['asset_id']].append(entry)
+    return entries, dict(by_asset)
+
+
+def _public(entry):
+    """A copy of a decoded entry in AssetHistory.to_dict() form"""
+    return {key: entry[key] for key in _FIELDS}
+
+
+def archive_history(older_than=None, chunk_size=None, max_chunks=None, pause=0):
+    """
+    Move entries created before `older_than` (default: HISTORY_ARCHIVE_AFTER_DAYS
+    ago) into archive segments, oldest first. Each chunk is its own committed
+    transaction, so writers are blocked for one chunk's insert and delete at
+    most; `pause` sleeps between chunks. The newest entry always stays hot so
+    SQLite never hands an archived ID to a new entry.
+    Returns the number of entries and segments written and whether older
+    entries remain (when max_chunks stopped the run).
+    """
+    if older_than is None:
+        older_than = datetime.utcnow() - timedelta(days=current_app.config.get('HISTORY_ARCHIVE_AFTER_DAYS', 365))
+    chunk_size = chunk_size or current_app.config.get('HISTORY_ARCHIVE_CHUNK_SIZE', 5000)
+    table = AssetHistory.__table__
+    columns = [table.c[field] for field in _FIELDS]
+    moved = segments = 0
+    
+    while max_chunks is None or segments < max_chunks:
+        newest = db.session.query(func.max(AssetHistory.id)).scalar()
+        rows = db.session.execute(
+            select(*columns)
+            .where(table.c.created_at < older_than, table.c.id != newest)
+            .order_by(table.c.created_at, table.c.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            db.session.rollback()
+            return {'moved': moved, 'segments': segments, 'remaining': False}
+        
+        entries = []
+        spans = {}
+        for row in rows:
+            entry = dict(row._mapping)
+            entry['created_at'] = row.created_at.isoformat()
+            entries.append(entry)
+            first, last, count = spans.get(row.asset_id, (row.created_at, row.created_at, 0))
+            spans[row.asset_id] = (first, row.created_at, count + 1)
+        
+        data = zlib.compress(json.dumps(entries, separators=(',', ':')).encode('utf-8'), 6)
+        segment = HistoryArchiveSegment(
+            entry_count=len(rows),
+            first_entry_id=min(row.id for row in rows),
+            last_entry_id=max(row.id for row in rows),
+            first_created_at=rows[0].created_at,
+            last_created_at=rows[-1].created_at,
+            checksum=zlib.crc32(data),
+            data=data
+        )
+        
+        try:
+            db.session.add(segment)
+            db.session.flush()
+            db.session.execute(HistoryArchiveIndex.__table__.insert(), [
+                {
+                    'asset_id': asset_id,
+                    'segment_id': segment.id,
+                    'entry_count': count,
+                    'first_created_at': first,
+                    'last_created_at': last
+                }
+                for asset_id, (first, last, count) in spans.items()
+            ])
+            db.session.execute(table.delete().where(table.c.id.in_([row.id for row in rows])))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        
+        moved += len(rows)
+        segments += 1
+        if pause:
+            time.sleep(pause)
+    
+    newest = db.session.query(func.max(AssetHistory.id)).scalar()
+    remaining = db.session.query(AssetHistory.query.filter(
+        AssetHistory.created_at < older_than, AssetHistory.id != newest
+    ).exists()).scalar()
+    db.session.rollback()
+    return {'moved': moved, 'segments': segments, 'remaining': remaining}
+
+
+def archived_entries(asset_id, actions=None, since=None, until=None, before=None):
+    """
+    Archived entries of an asset as dicts, newest first, optionally limited
+    to `actions`, created_at in [since, until) and keys older than the
+    (created_at, id) `before`. Decoded entries carry a private _created_at.
+    """
+    segments = db.session.query(HistoryArchiveSegment.id, HistoryArchiveSegment.checksum).join(
+        HistoryArchiveIndex, HistoryArchiveIndex.segment_id == HistoryArchiveSegment.id
+    ).filter(HistoryArchiveIndex.asset_id == asset_id)
+    if since is not None:
+        segments = segments.filter(HistoryArchiveIndex.last_created_at >= since)
+    if until is not None:
+        segments = segments.filter(HistoryArchiveIndex.first_created_at < until)
+    if before is not None:
+        segments = segments.filter(HistoryArchiveIndex.first_created_at <= before[0])
+    
+    result = []
+    for segment_id, checksum in segments.all():
+        for entry in _segment_entries(segment_id, checksum)[1].get(asset_id, ()):
+            created_at = entry['_created_at']
+            if actions and entry['action'] not in actions:
+                continue
+            if since is not None and (created_at is None or created_at < since):
+                continue
+            if until is not None and (created_at is None or created_at >= until):
+                continue
+            if before is not None and _sort_key(entry) >= tuple(before):
+                continue
+            result.append(entry)
+    
+    result.sort(key=_sort_key, reverse=True)
+    return result
+
+
+def _linked_assets(segment_id):
+    """IDs of the assets whose entries in a segment are still indexed"""
+    return {
+        asset_id for asset_id, in db.session.query(HistoryArchiveIndex.asset_id).filter(
+            HistoryArchiveIndex.segment_id == segment_id
+        )
+    }
+
+
+def recent_archived(limit, actions=None, performed_by=None, since=None, before=None):
+    """
+    The newest `limit` archived entries across all assets, as to_dict()
+    dicts with a private _created_at, optionally limited to `actions`, entries by the user
+    `performed_by`, created_at at or after `since` and keys older than the
+    (created_at, id) `before`
+    """
+    segments = db.session.query(HistoryArchiveSegment.id, HistoryArchiveSegment.checksum).order_by(
+        HistoryArchiveSegment.last_created_at.desc()
+    )
+    if since is not None:
+        segments = segments.filter(HistoryArchiveSegment.last_created_at >= since)
+    if before is not None:
+        segments = segments.filter(HistoryArchiveSegment.first_created_at <= before[0])
+    
+    result = []
+    for segment_id, checksum in segments.yield_per(8):
+        linked = _linked_assets(segment_id)
+        for entry in _segment_entries(segment_id, checksum)[0]:
+            if entry['asset_id'] not in linked:
+                continue
+            if actions and entry['action'] not in actions:
+                continue
+            if performed_by is not None and entry['performed_by_user_id'] != performed_by:
+                continue
+            if since is not None and (entry['_created_at'] is None or entry['_created_at'] < since):
+                continue
+            if before is not None and _sort_key(entry) >= tuple(before):
+                continue
+            result.append(entry)
+        if len(result) >= limit:
+            break
+    result.sort(key=_sort_key, reverse=True)
+    return [_public(entry) | {'_created_at': entry['_created_at']} for entry in result[:limit]]
+
+
+def recent_history(limit, actions=None, performed_by=None, before=None):
+    """
+    One page of the newest history entries across all assets from both
+    tiers, as to_dict() dicts with asset, performed_by and to_user names,
+    optionally limited to `actions` and entries by the user `performed_by`,
+    older than the (created_at, id) key `before`. Names are loaded with one
+    query per table, however long the page.
+    Returns (entries, more) where `more` tells whether another page exists.
+    """
+    query = AssetHistory.query
+    if actions:
+        query = query.filter(AssetHistory.action.in_(actions))
+    if performed_by is not None:
+        query = query.filter(AssetHistory.performed_by_user_id == performed_by)
+    if before is not None:
+        query = query.filter(keyset_filter((AssetHistory.created_at, AssetHistory.id), before, descending=True))
+    query = query.order_by(AssetHistory.created_at.desc(), AssetHistory.id.desc()).limit(limit + 1)
+    entries = [entry.to_dict() | {'_created_at': entry.created_at} for entry in query.all()]
+    
+    # A full hot page only needs archived entries that sort inside it
+    since = entries[-1]['_created_at'] if len(entries) > limit else None
+    cold = recent_archived(limit + 1, actions, performed_by, since, before)
+    if cold:
+        entries = sorted(entries + cold, key=_sort_key, reverse=True)
+    
+    more = len(entries) > limit
+    entries = entries[:limit]
+    
+    asset_ids = {entry['asset_id'] for entry in entries}
+    assets = dict(db.session.query(Asset.id, Asset.name).filter(Asset.id.in_(asset_ids)).all()) if asset_ids else {}
+    user_ids = {entry[key] for entry in entries for key in ('performed_by_user_id', 'to_user_id')} - {None}
+    users = dict(db.session.query(User.id, User.username).filter(User.id.in_(user_ids)).all()) if user_ids else {}
+    for entry in entries:
+        del entry['_created_at']
+        if entry['asset_id'] in assets:
+            entry['asset'] = {'id': entry['asset_id'], 'name': assets[entry['asset_id']]}
+        if entry['performed_by_user_id'] in users:
+            entry['performed_by'] = {'id': entry['performed_by_user_id'], 'username': users[entry['performed_by_user_id']]}
+        if entry['to_user_id'] in users:
+            entry['to_user'] = {'id': entry['to_user_id'], 'username': users[entry['to_user_id']]}
+    return entries, more
+
+
+def asset_history(asset_id, actions=None, since=None, until=None, limit=None, after=None):
+    """
+    An asset's history from both tiers, newest first, as to_dict() dicts
+    with performed_by / from_user / to_user user names. With `limit`,
+    returns one page after the (created_at, id) key `after`.
+    Returns (entries, more) where `more` tells whether another page exists.
+    """
+    query = AssetHistory.query.filter(AssetHistory.asset_id == asset_id).options(
+        joinedload(AssetHistory.performed_by),
+        joinedload(AssetHistory.from_user),
+        joinedload(AssetHistory.to_user)
+    )
+    if actions:
+        query = query.filter(AssetHistory.action.in_(actions))
+    if since is not None:
+        query = query.filter(AssetHistory.created_at >= since)
+    if until is not None:
+        query = query.filter(AssetHistory.created_at < until)
+    if after is not None:
+        query = query.filter(keyset_filter((AssetHistory.created_at, AssetHistory.id), after, descending=True))
+    query = query.order_by(AssetHistory.created_at.desc(), AssetHistory.id.desc())
+    if limit is not None:
+        query = query.limit(limit + 1)
+    
+    entries = []
+    for entry in query.all():
+        entry_dict = entry.to_dict()
+        entry_dict['_created_at'] = entry.created_at
+        if entry.performed_by:
+            entry_dict['performed_by'] = entry.performed_by.username
+        if entry.from_user:
+            entry_dict['from_user'] = entry.from_user.username
+        if entry.to_user:
+            entry_dict['to_user'] = entry.to_user.username
+        entries.append(entry_dict)
+    
+    # A full hot page only needs archived entries that sort inside it
+    cold_since = since
+    if limit is not None and len(entries) > limit and entries[-1]['_created_at'] is not None:
+        cold_since = max(since, entries[-1]['_created_at']) if since is not None else entries[-1]['_created_at']
+    cold = [_public(entry) | {'_created_at': entry['_created_at']}
+            for entry in archived_entries(asset_id, actions, cold_since, until, after)]
+    
+    if cold:
+        user_ids = {entry[key] for entry in cold for key in ('performed_by_user_id', 'from_user_id', 'to_user_id')}
+        names = dict(db.session.query(User.id, User.username).filter(User.id.in_(user_ids - {None})).all())
+        for entry in cold:
+            for key, name in (('performed_by_user_id', 'performed_by'), ('from_user_id', 'from_user'), ('to_user_id', 'to_user')):
+                if entry[key] in names:
+                    entry[name] = names[entry[key]]
+        entries = sorted(entries + cold, key=_sort_key, reverse=True)
+    
+    more = limit is not None and len(entries) > limit
+    if limit is not None:
+        entries = entries[:limit]
+    for entry in entries:
+        del entry['_created_at']
+    return entries, more
+
+
+def forget_archived_history(asset_id):
+    """
+    Unlink a deleted asset's archived entries, hiding them from every archive
+    read; runs in the caller's transaction
+    """
+    HistoryArchiveIndex.query.filter(HistoryArchiveIndex.asset_id == asset_id).delete(synchronize_session=False)
+
+
+def archive_stats():
+    """Sizes of the hot and archived tiers"""
+    segments, entries, size = db.session.query(
+        func.count(HistoryArchiveSegment.id),
+        func.coalesce(func.sum(HistoryArchiveSegment.entry_count), 0),
+        func.coalesce(func.sum(func.length(HistoryArchiveSegment.data)), 0)
+    ).one()
+    oldest = db.session.query(func.min(AssetHistory.created_at)).scalar()
+    return {
+        'hot_entries': db.session.query(func.count(AssetHistory.id)).scalar(),
+        'oldest_hot_entry': oldest.isoformat() if oldest else None,
+        'archived_entries': int(entries),
+        'segments': segments,
+        'compressed_bytes': int(size)
+    }
@@ -0,0 +1,364 @@
+"""
+Write-behind journal for asset history
+
+With HISTORY_WRITE_MODE = 'journal', AssetHistory.log_action() leaves the row
+out of the request transaction. The entry waits on the session and, once that
+transaction commits, is appended to this process's journal file and fsynced.
+A background thread inserts journaled entries into asset_history in batches
+when HISTORY_FLUSH_BATCH_SIZE entries are pending or the oldest has waited
+HISTORY_FLUSH_INTERVAL seconds.
+
+Each flush seals the current journal file and starts a new one. A sealed file
+is inserted in batches, and every batch advances the file's
+HistoryJournalCheckpoint in the same transaction, so an interrupted flush
+never inserts an entry twice. Journal files are locked by the process that
+writes them; at startup, files left behind by dead processes are replayed
+from their checkpoints.
+
+When the database rejects a batch's data (an integrity or data error, such
+as an entry for an asset deleted before the flush), its entries are inserted
+one at a time and the rejected ones are appended to dead-letter.jsonl in the
+journal directory, so one bad entry never stalls the journal. Other errors,
+e.g. a lost connection, are retried.
+
+An entry whose transaction committed just before a crash, but which was not
+yet appended, is lost. Deployments that cannot accept that window keep the
+default 'sync' mode, which inserts history in the request transaction.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.orm import Session
+from app import db
+from app.models.history import AssetHistory, HistoryJournalCheckpoint
+
+try:
+    import fcntl
+except ImportError:  # No cross-process file locks; run a single worker
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEAD_LETTER_FILE = 'dead-letter.jsonl'
+
+_FIELDS = (
+    'asset_id', 'action', 'details', 'performed_by_user_id', 'from_user_id',
+    'to_user_id', 'extra_data', 'created_at'
+)
+
+
+def _lock(handle):
+    """Take the journal file's exclusive lock; False if another process holds it"""
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+def _commit_batch(name, rows, offset):
+    """Insert entries and advance the journal's checkpoint in one transaction"""
+    try:
+        if rows:
+            db.session.execute(AssetHistory.__table__.insert(), rows)
+        db.session.merge(HistoryJournalCheckpoint(journal=name, offset=offset))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def _dead_letter(path, entry, error):
+    """Durably set aside an entry the database rejects, next to its journal"""
+    record = {
+        'journal': os.path.basename(path),
+        'entry': {**entry, 'created_at': entry['created_at'].isoformat()},
+        'error': str(getattr(error, 'orig', error))[:500]
+    }
+    with open(os.path.join(os.path.dirname(path), DEAD_LETTER_FILE), 'ab') as handle:
+        handle.write(json.dumps(record).encode('utf-8') + b'\n')
+        handle.flush()
+        os.fsync(handle.fileno())
+    logger.error('History entry rejected by the database, moved to %s: %s', DEAD_LETTER_FILE, record)
+
+
+def _flush_file(path, batch_size):
+    """
+    Insert a journal file's entries past its checkpoint; returns the counts
+    of inserted and dead-lettered entries
+    """
+    name = os.path.basename(path)
+    checkpoint = db.session.get(HistoryJournalCheckpoint, name)
+    offset = checkpoint.offset if checkpoint else 0
+    with open(path, 'rb') as handle:
+        handle.seek(offset)
+        # The text after the last newline, if any, is a write torn by a crash
+        lines = handle.read().split(b'\n')[:-1]
+    
+    inserted = dead = 0
+    for start in range(0, len(lines), batch_size):
+        rows = []  # (entry, journal offset after its line)
+        for line in lines[start:start + batch_size]:
+            offset += len(line) + 1
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                logger.error('Skipping unreadable history journal line in %s: %r', name, line[:200])
+                continue
+            entry['created_at'] = datetime.fromisoformat(entry['created_at'])
+            rows.append((entry, offset))
+        
+        try:
+            _commit_batch(name, [entry for entry, _ in rows], offset)
+            inserted += len(rows)
+            continue
+        except (IntegrityError, DataError):
+            logger.warning('History journal batch in %s rejected; inserting its entries one by one', name)
+        
+        # Bad data (e.g. an asset deleted before the flush) must not hold back the entries behind it
+        for entry, end in rows:
+            try:
+                _commit_batch(name, [entry], end)
+                inserted += 1
+            except (IntegrityError, DataError) as e:
+                _dead_letter(path, entry, e)
+                _commit_batch(name, [], end)
+                dead += 1
+        _commit_batch(name, [], offset)
+    return inserted, dead
+
+
+def _forget_checkpoint(path):
+    """Drop the checkpoint of a journal file that has been removed"""
+    HistoryJournalCheckpoint.query.filter(
+        HistoryJournalCheckpoint.journal == os.path.basename(path)
+    ).delete(synchronize_session=False)
+    db.session.commit()
+
+
+class HistoryJournal:
+    """This process's journal file, sealed files awaiting insert, and the flusher thread"""
+    
+    def __init__(self, app, directory, batch_size, interval):
+        self.app = app
+        self.directory = directory
+        self.batch_size = batch_size
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._current = None  # (path, handle) being appended to
+        self._sealed = []  # (path, handle) awaiting insert, oldest first
+        self._pending = 0
+        self._oldest = None
+        self.appended = self.flushed = self.dead_lettered = self.failures = 0
+        self.last_error = None
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name='history-journal', daemon=True)
+    
+    def start(self):
+        self._thread.start()
+        atexit.register(self.stop)
+    
+    def append(self, lines):
+        """Durably append encoded entries of a committed transaction"""
+        data = b''.join(lines)
+        with self._lock:
+            if self._current is None:
+                path = os.path.join(self.directory, f'history-{os.getpid()}-{uuid.uuid4().hex[:12]}.journal')
+                handle = open(path, 'ab')
+                _lock(handle)
+                self._current = (path, handle)
+            handle = self._current[1]
+            handle.write(data)
+            handle.flush()
+            os.fsync(handle.fileno())
+            self._pending += len(lines)
+            self.appended += len(lines)
+            # Wake the flusher to start the interval clock, or flush a full batch
+            wake = self._oldest is None or self._pending >= self.batch_size
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+        if wake:
+            self._wake.set()
+    
+    def _seal(self):
+        """Close the current file to new entries; the next append starts another"""
+        with self._lock:
+            if self._current is not None:
+                self._sealed.append(self._current)
+                self._current = None
+                self._pending = 0
+                self._oldest = None
+            return list(self._sealed)
+    
+    def flush(self):
+        """Insert everything journaled so far; needs an app context"""
+        with self._flush_lock:
+            inserted = 0
+            for path, handle in self._seal():
+                count, dead = _flush_file(path, self.batch_size)
+                inserted += count
+                self.dead_lettered += dead
+                # Remove before unlocking so no other process replays it
+                os.remove(path)
+                handle.close()
+                with self._lock:
+                    self._sealed.remove((path, handle))
+                _forget_checkpoint(path)
+            self.flushed += inserted
+            return inserted
+    
+    def recover(self):
+        """Replay journal files left behind by processes that have exited"""
+        own = {path for path, _ in self._sealed} | ({self._current[0]} if self._current else set())
+        for name in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, name)
+            if not name.endswith('.journal') or path in own:
+                continue
+            try:
+                handle = open(path, 'rb')
+            except FileNotFoundError:
+                continue
+            # Skip files a live process holds, or that its owner removed meanwhile
+            if not _lock(handle) or os.fstat(handle.fileno()).st_nlink == 0:
+                handle.close()
+                continue
+            with self._lock:
+                self._sealed.append((path, handle))
+        
+        recovered = self.flush()
+        if recovered:
+            logger.warning('Replayed %d history entries from unflushed journals', recovered)
+        
+        # Checkpoints whose file is gone were left by a crash right after a flush
+        for checkpoint in HistoryJournalCheckpoint.query.all():
+            if not os.path.exists(os.path.join(self.directory, checkpoint.journal)):
+                db.session.delete(checkpoint)
+        db.session.commit()
+        return recovered
+    
+    def _due(self):
+        with self._lock:
+            return bool(self._sealed) or self._pending >= self.batch_size or (
+                self._oldest is not None and time.monotonic() - self._oldest >= self.interval
+            )
+    
+    def _run(self):
+        while not self._stopping:
+            with self._lock:
+                wait = self.interval if self._oldest is None else self._oldest + self.interval - time.monotonic()
+            self._wake.wait(max(wait, 0.01))
+            self._wake.clear()
+            if self._stopping or not self._due():
+                continue
+            with self.app.app_context():
+                try:
+                    self.flush()
+                except Exception as e:
+                    self.failures += 1
+                    self.last_error = str(e)
+                    logger.exception('History journal flush failed; retrying')
+                    self._wake.wait(self.interval)
+                finally:
+                    db.session.remove()
+    
+    def stop(self):
+        """Stop the flusher and insert whatever is still journaled"""
+        self._stopping = True
+        self._wake.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=10)
+        with self.app.app_context():
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Final history journal flush failed; entries will be replayed on restart')
+            finally:
+                db.session.remove()
+    
+    def stats(self):
+        """Counters for the archive stats endpoint"""
+        with self._lock:
+            return {
+                'mode': 'journal',
+                'pending': self._pending,
+                'sealed_files': len(self._sealed),
+                'appended': self.appended,
+                'flushed': self.flushed,
+                'dead_lettered': self.dead_lettered,
+                'failures': self.failures,
+                'last_error': self.last_error
+            }
+
+
+def init_history_journal(app):
+    """Start the write-behind journal when HISTORY_WRITE_MODE is 'journal'; needs an app context"""
+    mode = app.config.get('HISTORY_WRITE_MODE', 'sync')
+    if mode == 'sync':
+        return
+    if mode != 'journal':
+        raise ValueError(f"HISTORY_WRITE_MODE must be 'sync' or 'journal', not {mode!r}")
+    
+    journal = HistoryJournal(
+        app,
+        app.config.get('HISTORY_JOURNAL_DIR') or os.path.join(app.instance_path, 'history-journal'),
+        app.config.get('HISTORY_FLUSH_BATCH_SIZE', 500),
+        app.config.get('HISTORY_FLUSH_INTERVAL', 2.0)
+    )
+    journal.recover()
+    journal.start()
+    app.extensions['history_journal'] = journal
+
+
+def defer_history(history):
+    """
+    Hold a new AssetHistory for the journal until the session commits.
+    Returns False in synchronous mode, where the caller adds it to the session.
+    """
+    journal = current_app.extensions.get('history_journal')
+    if journal is None:
+        return False
+    
+    if history.created_at is None:
+        history.created_at = datetime.utcnow()
+    entry = {field: getattr(history, field) for field in _FIELDS}
+    entry['created_at'] = history.created_at.isoformat()
+    # Encode now so a bad payload fails inside the request's transaction
+    line = json.dumps(entry, separators=(',', ':')).encode('utf-8') + b'\n'
+    db.session.info.setdefault('history_journal', (journal, []))[1].append(line)
+    return True
+
+
+def journal_stats():
+    """Journal counters, or the synchronous mode marker"""
+    journal = current_app.extensions.get('history_journal')
+    return journal.stats() if journal is not None else {'mode': 'sync'}
+
+
+@event.listens_for(Session, 'after_commit')
+def _append_committed(session):
+    pending = session.info.pop('history_journal', None)
+    if pending:
+        journal, lines = pending
+        try:
+            journal.append(lines)
+        except Exception:
+            logger.exception('Could not journal committed history entries: %r', lines)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_rolled_back(session, previous_transaction):
+    if not previous_transaction.nested:
+        session.info.pop('history_journal', None)
@@ -0,0 +1,268 @@
+"""
+Dashboard KPI counters
+
+The dashboard figures are kept in KpiCounter rows: assets by status, category
+and department (with the purchase value by status and category), tickets by
+status and priority, and licenses by status. Like the depreciation schedules,
+write paths report the counter keys of rows before and after a change and
+update_counters() adjusts only the affected rows (and the timeline rollups
+of app.services.timeline), in the caller's transaction. Reading a figure is
+then a lookup of a few dozen rows, however large the inventory grows.
+
+reconcile_counters() recomputes the rows from the tables, reports where the
+stored ones drifted and rewrites them.
+"""
+from collections import Counter, defaultdict, namedtuple
+from decimal import Decimal, ROUND_HALF_UP
+from sqlalchemy import func
+from app import db
+from app.models.asset import Asset
+from app.models.kpi import KpiCounter
+from app.models.license import License
+from app.models.maintenance import MaintenanceTicket
+from app.models.user import User
+from app.utils.upsert import upsert_add
+
+MAINTENANCE_STATUSES = ('Under Maintenance', 'In Repair')
+OPEN_TICKET_STATUSES = ('New', 'Under Review', 'In Progress')
+
+# department is None for unassigned assets and '' for assignees without one.
+# The timestamps place the row on the dashboard timeline (app.services.timeline).
+AssetCounterKey = namedtuple('AssetCounterKey', 'status category purchase_price department created_at', defaults=(None,))
+TicketCounterKey = namedtuple('TicketCounterKey', 'status priority created_at resolved_at', defaults=(None, None))
+LicenseCounterKey = namedtuple('LicenseCounterKey', 'status')
+
+
+def to_cents(price):
+    """A purchase price (Decimal, float, int or numeric string) in cents"""
+    if price is None or price == '':
+        return 0
+    return int((Decimal(str(price)) * 100).to_integral_value(ROUND_HALF_UP))
+
+
+def departments_of(user_ids):
+    """{user_id: department} for building the counter keys of their assets"""
+    user_ids = set(user_ids) - {None}
+    if not user_ids:
+        return {}
+    return dict(db.session.query(User.id, User.department).filter(User.id.in_(user_ids)).all())
+
+
+def asset_counter_key(asset, departments=None):
+    """
+    The counter key of an asset, or of a row with the same attributes. The
+    assignee's department is taken from `departments` ({user_id: department})
+    when given, else loaded.
+    """
+    user_id = asset.assigned_to_user_id
+    if user_id is None:
+        department = None
+    elif departments is not None:
+        department = departments.get(user_id) or ''
+    else:
+        user = db.session.get(User, user_id)
+        department = (user.department if user else None) or ''
+    return AssetCounterKey(asset.status, asset.category, asset.purchase_price, department, asset.created_at)
+
+
+def ticket_counter_key(ticket):
+    """The counter key of a ticket, or of a row with its status, priority and timestamps"""
+    return TicketCounterKey(ticket.status, ticket.priority, ticket.created_at, ticket.resolved_at)
+
+
+def license_counter_key(license):
+    """The counter key of a license, or of a row with its status"""
+    return LicenseCounterKey(license.status)
+
+
+def _entries(key):
+    """(metric, bucket, value in cents) of every counter a key contributes to"""
+    if isinstance(key, AssetCounterKey):
+        cents = to_cents(key.purchase_price)
+        yield 'asset_status', key.status, cents
+        yield 'asset_category', key.category, cents
+        if key.department is None:
+            yield 'asset_unassigned', '', 0
+        else:
+            yield 'asset_department', key.department, 0
+    elif isinstance(key, TicketCounterKey):
+        yield 'ticket_status', key.status, 0
+        yield 'ticket_priority', key.priority, 0
+    else:
+        yield 'license_status', key.status, 0
+
+
+def _accumulate(deltas, keys, sign):
+    """Add (count, value) of (key, count) pairs, times `sign`, into the (metric, bucket) deltas"""
+    for key, count in keys:
+        for metric, bucket, cents in _entries(key):
+            delta = deltas[(metric, bucket)]
+            delta[0] += sign * count
+            delta[1] += sign * cents * count
+
+
+def apply_deltas(model, deltas):
+    """
+    Add (count, value cents) deltas to the rows of a counter table (columns
+    count and value_cents), keyed by primary key tuples; missing rows are inserted
+    """
+    table = model.__table__
+    columns = list(table.primary_key.columns)
+    upsert_add(table, [
+        {**{column.name: value for column, value in zip(columns, key)}, 'count': count, 'value_cents': cents}
+        for key, (count, cents) in deltas.items() if count or cents
+    ], ('count', 'value_cents'))
+
+
+def update_counters(removed=(), added=()):
+    """
+    Adjust the counters and the timeline rollups for changed rows. `removed`
+    and `added` hold counter keys from before and after the change (an insert
+    only adds, a delete only removes). Runs in the caller's transaction.
+    """
+    # Imported here: the timeline is built on this module's counter keys
+    from app.services.timeline import update_timeline
+    
+    removed, added = Counter(removed), Counter(added)
+    deltas = defaultdict(lambda: [0, 0])
+    for keys, sign in ((removed, -1), (added, 1)):
+        _accumulate(deltas, keys.items(), sign)
+    apply_deltas(KpiCounter, deltas)
+    update_timeline(removed, added)
+
+
+def counted_assets(user):
+    """A user's assigned assets with the columns of their counter keys"""
+    return Asset.query.with_entities(
+        Asset.id, Asset.status, Asset.category, Asset.purchase_price, Asset.assigned_to_user_id, Asset.created_at
+    ).filter(Asset.assigned_to_user_id == user.id).all()
+
+
+def move_department(user, department_before):
+    """
+    Move the counters of a user's assets from `department_before` to the
+    user's current department. Runs in the caller's transaction.
+    """
+    if user.department == department_before:
+        return
+    assets = counted_assets(user)
+    update_counters(
+        removed=[asset_counter_key(asset, {user.id: department_before}) for asset in assets],
+        added=[asset_counter_key(asset, {user.id: user.department}) for asset in assets]
+    )
+
+
+def _actual_counters(batch_size=10000):
+    """The counters recomputed from the assets, tickets and licenses tables"""
+    deltas = defaultdict(lambda: [0, 0])
+    # Grouping by price keeps the value totals exact to the cent
+    assets = db.session.query(
+        Asset.status, Asset.category, Asset.purchase_price, Asset.assigned_to_user_id.is_(None),
+        User.department, func.count()
+    ).outerjoin(User, User.id == Asset.assigned_to_user_id).group_by(
+        Asset.status, Asset.category, Asset.purchase_price, Asset.assigned_to_user_id.is_(None), User.department
+    )
+    _accumulate(deltas, (
+        (AssetCounterKey(status, category, price, None if unassigned else department or ''), count)
+        for status, category, price, unassigned, department, count in assets.yield_per(batch_size)
+    ), 1)
+    
+    tickets = db.session.query(MaintenanceTicket.status, MaintenanceTicket.priority, func.count()).group_by(
+        MaintenanceTicket.status, MaintenanceTicket.priority
+    )
+    _accumulate(deltas, ((TicketCounterKey(status, priority), count) for status, priority, count in tickets), 1)
+    
+    licenses = db.session.query(License.status, func.count()).group_by(License.status)
+    _accumulate(deltas, ((LicenseCounterKey(status), count) for status, count in licenses), 1)
+    
+    return {key: tuple(delta) for key, delta in deltas.items() if delta[0] or delta[1]}
+
+
+def reconcile_counters(repair=True):
+    """
+    Recompute the counters from scratch and report the (metric, bucket) rows
+    whose stored count or value differs. With `repair`, the stored rows are
+    replaced by the recomputed ones. Runs in the caller's transaction.
+    """
+    actual = _actual_counters()
+    stored = {
+        (row.metric, row.bucket): (row.count, row.value_cents)
+        for row in KpiCounter.query.filter(db.or_(KpiCounter.count != 0, KpiCounter.value_cents != 0))
+    }
+    
+    drift = []
+    for metric, bucket in sorted(set(actual) | set(stored)):
+        expected = actual.get((metric, bucket), (0, 0))
+        found = stored.get((metric, bucket), (0, 0))
+        if expected != found:
+            drift.append({
+                'metric': metric,
+                'bucket': bucket,
+                'stored': {'count': found[0], 'value': found[1] / 100},
+                'actual': {'count': expected[0], 'value': expected[1] / 100}
+            })
+    
+    if repair:
+        db.session.execute(KpiCounter.__table__.delete())
+        if actual:
+            db.session.execute(KpiCounter.__table__.insert(), [
+                {'metric': metric, 'bucket': bucket, 'count': count, 'value_cents': cents}
+                for (metric, bucket), (count, cents) in actual.items()
+            ])
+    return drift
+
+
+def backfill_counters():
+    """Build the counters for a database that predates them; a no-op once they exist"""
+    if KpiCounter.query.first() is None and (
+        Asset.query.first() or MaintenanceTicket.query.first() or License.query.first()
+    ):
+        reconcile_counters()
+        db.session.commit()
+
+
+def counters(*metrics):
+    """{metric: [(bucket, count, value cents)]} of non-empty counters, by bucket"""
+    rows = KpiCounter.query.filter(KpiCounter.metric.in_(metrics), KpiCounter.count != 0).order_by(
+        KpiCounter.metric, KpiCounter.bucket
+    )
+    result = {metric: [] for metric in metrics}
+    for row in rows:
+        result[row.metric].append((row.bucket, row.count, row.value_cents))
+    return result
+
+
+def _total(groups, statuses=None):
+    """Count of the given buckets (default all) in one metric of a counters() result"""
+    return sum(count for bucket, count, _ in groups if statuses is None or bucket in statuses)
+
+
+def dashboard_stats():
+    """The KPI payload of /api/dashboard/stats, from the counter rows and the active user count"""
+    groups = counters('asset_status', 'ticket_status', 'license_status')
+    assets, tickets, licenses = groups['asset_status'], groups['ticket_status'], groups['license_status']
+    users = User.query.filter_by(is_active=True).count()
+    
+    return {
+        'assets': {
+            'total': _total(assets),
+            'available': _total(assets, ('Available',)),
+            'assigned': _total(assets, ('Assigned',)),
+            'under_maintenance': _total(assets, MAINTENANCE_STATUSES),
+            'retired': _total(assets, ('Retired',)),
+            'total_value': sum(cents for _, _, cents in assets) / 100
+        },
+        'maintenance': {
+            'total': _total(tickets),
+            'open': _total(tickets, OPEN_TICKET_STATUSES),
+            'resolved': _total(tickets, ('Resolved',))
+        },
+        'users': {
+            'total': users
+        },
+        'licenses': {
+            'total': _total(licenses),
+            'active': _total(licenses, ('Active',)),
+            'expired': _total(licenses, ('Expired',))
+        }
+    }
@@ -0,0 +1,156 @@
+"""
+Ticket resolution-time analytics
+
+The mean time to resolve is one AVG over the resolved tickets in SQL.
+Percentiles come from t-digests persisted per (priority, asset category) in
+ResolutionDigest: resolving a ticket adds its time to its group's digest in
+the same transaction, and a percentile query merges the stored digests, a
+few small rows, instead of reading the ticket history.
+
+A ticket adds one sample, at its first resolution; reopening and resolving
+it again does not add another. Digests never lose samples, so deleted
+tickets stay in them until reconcile_digests() (run by POST
+/api/dashboard/counters/reconcile) rebuilds them from the tickets.
+"""
+from flask import current_app
+from sqlalchemy import func, literal_column
+from app import db
+from app.models.asset import Asset
+from app.models.kpi import ResolutionDigest
+from app.models.maintenance import MaintenanceTicket
+from app.utils.tdigest import TDigest
+from app.utils.upsert import upsert_add
+
+PERCENTILES = (50, 90, 99)
+
+
+def _resolution_hours():
+    """Dialect-specific hours from created_at to resolved_at, or None"""
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        return (func.julianday(MaintenanceTicket.resolved_at) - func.julianday(MaintenanceTicket.created_at)) * 24
+    if dialect in ('mysql', 'mariadb'):
+        return func.timestampdiff(
+            literal_column('SECOND'), MaintenanceTicket.created_at, MaintenanceTicket.resolved_at
+        ) / 3600.0
+    if dialect == 'postgresql':
+        return func.extract('epoch', MaintenanceTicket.resolved_at - MaintenanceTicket.created_at) / 3600.0
+    return None
+
+
+def _hours(ticket):
+    return (ticket.resolved_at - ticket.created_at).total_seconds() / 3600
+
+
+def mean_resolution_hours():
+    """Mean hours from creation to resolution over resolved tickets, 0 without any"""
+    resolved = MaintenanceTicket.resolved_at.isnot(None)
+    hours = _resolution_hours()
+    if hours is not None:
+        return float(db.session.query(func.avg(hours)).filter(resolved).scalar() or 0)
+    
+    total = count = 0
+    for ticket in db.session.query(MaintenanceTicket.created_at, MaintenanceTicket.resolved_at).filter(resolved).yield_per(10000):
+        total += _hours(ticket)
+        count += 1
+    return total / count if count else 0
+
+
+def _new_digest():
+    return TDigest(current_app.config.get('RESOLUTION_DIGEST_COMPRESSION', 100))
+
+
+def record_resolution(ticket):
+    """Add a ticket resolved for the first time to its group's digest. Runs in the caller's transaction."""
+    priority, category = ticket.priority, ticket.asset.category
+    # Create the group's row first, so there is always a row to lock, even
+    # when concurrent resolutions open the same new group
+    upsert_add(ResolutionDigest.__table__, [
+        {'priority': priority, 'category': category, 'digest': _new_digest().to_dict()}
+    ])
+    row = ResolutionDigest.query.filter_by(priority=priority, category=category).with_for_update().one()
+    digest = TDigest.from_dict(row.digest)
+    digest.add(_hours(ticket))
+    row.digest = digest.to_dict()
+
+
+def rebuild_digests(batch_size=10000):
+    """Recompute every digest from the resolved tickets. Runs in the caller's transaction."""
+    digests = {}
+    tickets = db.session.query(
+        MaintenanceTicket.priority, Asset.category, MaintenanceTicket.created_at, MaintenanceTicket.resolved_at
+    ).join(Asset, Asset.id == MaintenanceTicket.asset_id).filter(MaintenanceTicket.resolved_at.isnot(None))
+    for ticket in tickets.yield_per(batch_size):
+        key = (ticket.priority, ticket.category)
+        if key not in digests:
+            digests[key] = _new_digest()
+        digests[key].add(_hours(ticket))
+    
+    db.session.execute(ResolutionDigest.__table__.delete())
+    for (priority, category), digest in digests.items():
+        db.session.add(ResolutionDigest(priority=priority, category=category, digest=digest.to_dict()))
+
+
+def reconcile_digests(repair=True):
+    """
+    Report the (priority, category) groups whose digest sample count differs
+    from their resolved tickets. With `repair`, every digest is rebuilt,
+    which also replaces the first-resolution samples of reopened tickets.
+    Runs in the caller's transaction.
+    """
+    actual = {
+        (priority, category): count
+        for priority, category, count in db.session.query(
+            MaintenanceTicket.priority, Asset.category, func.count()
+        ).join(Asset, Asset.id == MaintenanceTicket.asset_id).filter(
+            MaintenanceTicket.resolved_at.isnot(None)
+        ).group_by(MaintenanceTicket.priority, Asset.category)
+    }
+    stored = {(row.priority, row.category): TDigest.from_dict(row.digest).count for row in ResolutionDigest.query}
+    
+    drift = [
+        {
+            'priority': priority,
+            'category': category,
+            'stored': stored.get((priority, category), 0),
+            'actual': actual.get((priority, category), 0)
+        }
+        for priority, category in sorted(set(actual) | set(stored))
+        if stored.get((priority, category), 0) != actual.get((priority, category), 0)
+    ]
+    if repair:
+        rebuild_digests()
+    return drift
+
+
+def backfill_digests():
+    """Build the digests for a database that predates them; a no-op once they exist"""
+    if ResolutionDigest.query.first() is None and MaintenanceTicket.query.filter(
+        MaintenanceTicket.resolved_at.isnot(None)
+    ).first():
+        rebuild_digests()
+        db.session.commit()
+
+
+def _summary(digest):
+    summary = {'count': digest.count}
+    for percentile in PERCENTILES:
+        value = digest.quantile(percentile / 100)
+        summary[f'p{percentile}'] = round(value, 2) if value is not None else None
+    return summary
+
+
+def resolution_percentiles():
+    """p50/p90/p99 resolution hours overall, by priority and by asset category"""
+    overall, by_priority, by_category = _new_digest(), {}, {}
+    for row in ResolutionDigest.query.all():
+        digest = TDigest.from_dict(row.digest)
+        overall.merge(digest)
+        by_priority.setdefault(row.priority, _new_digest()).merge(digest)
+        by_category.setdefault(row.category, _new_digest()).merge(digest)
+    
+    return {
+        'overall': _summary(overall),
+        'by_priority': {priority: _summary(digest) for priority, digest in sorted(by_priority.items())},
+        'by_category': {category: _summary(digest) for category, digest in sorted(by_category.items())}
+    }
@@ -0,0 +1,256 @@
+"""
+Dashboard response cache
+
+Caches the JSON bodies of read endpoints keyed by route, query arguments and
+the caller's role. Each entry records the version of every table it was
+computed from; a session that writes a table bumps its version once the
+transaction commits, so only entries reading that table go stale. Versions
+live in the cache_versions table, so a write in one worker process
+invalidates the entries of all of them; a request reads them once. The
+short DASHBOARD_CACHE_TTL only bounds staleness when a bump fails.
+
+Concurrent misses on the same key are single-flight: one request computes the
+body while the others wait for it instead of running the same aggregates.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import Response, current_app, g, has_app_context, make_response, request
+from flask_jwt_extended import get_jwt
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app import db
+from app.models.kpi import CacheVersion
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """Thread-safe LRU of response bodies validated by table versions and a TTL"""
+    
+    def __init__(self, max_size, ttl, wait_timeout):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        self._entries = OrderedDict()
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.coalesced = self.evictions = self.expired = self.invalidated = 0
+    
+    def _lookup(self, key, versions):
+        """The live entry for a key; call with the lock held"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        # Stale only if a table was written since; newer versions than the caller read are fine
+        if any(stored < read for stored, read in zip(entry[1], versions)):
+            self.invalidated += 1
+        elif entry[2] < time.monotonic():
+            self.expired += 1
+        else:
+            self._entries.move_to_end(key)
+            return entry[0]
+        del self._entries[key]
+        return None
+    
+    def get_or_compute(self, key, versions, compute):
+        """
+        The cached value for a key, or compute() stored with `versions`, the
+        versions of its tables read before it ran. compute() returns (value,
+        cacheable).
+        """
+        waited = False
+        while True:
+            with self._lock:
+                value = self._lookup(key, versions)
+                if value is not None:
+                    if waited:
+                        self.coalesced += 1
+                    else:
+                        self.hits += 1
+                    return value
+                flight = self._flights.get(key)
+                if flight is None:
+                    flight = self._flights[key] = threading.Event()
+                    self.misses += 1
+                    break
+            # Another request is computing this key; after it fails we retry
+            waited = True
+            if not flight.wait(self.wait_timeout):
+                # Too slow to wait for; answer this request without caching
+                return compute()[0]
+        
+        try:
+            value, cacheable = compute()
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.set()
+        
+        if cacheable:
+            with self._lock:
+                # A write during compute() has already bumped a version, so the entry starts stale
+                self._entries[key] = (value, versions, time.monotonic() + self.ttl)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return value
+    
+    def stats(self):
+        """Size and counters"""
+        with self._lock:
+            lookups = self.hits + self.coalesced + self.misses
+            return {
+                'enabled': True,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'hit_rate': round((self.hits + self.coalesced) / lookups, 4) if lookups else None,
+                'invalidated': self.invalidated,
+                'expired': self.expired,
+                'evictions': self.evictions,
+                'in_flight': len(self._flights)
+            }
+
+
+def init_response_cache(app):
+    """Create the cache when DASHBOARD_CACHE_ENABLED is set"""
+    if app.config.get('DASHBOARD_CACHE_ENABLED'):
+        app.extensions['response_cache'] = ResponseCache(
+            app.config.get('DASHBOARD_CACHE_SIZE', 256),
+            app.config.get('DASHBOARD_CACHE_TTL', 30),
+            app.config.get('DASHBOARD_CACHE_WAIT', 10)
+        )
+
+
+def table_versions():
+    """Every table's shared version, read once per app context"""
+    if 'cache_versions' not in g:
+        g.cache_versions = dict(db.session.query(CacheVersion.table_name, CacheVersion.version).all())
+    return g.cache_versions
+
+
+def bump_versions(tables):
+    """Advance the shared versions of the tables, in a transaction of their own"""
+    names = sorted(tables)
+    table = CacheVersion.__table__
+    for attempt in range(2):
+        try:
+            with db.engine.begin() as connection:
+                bumped = connection.execute(
+                    update(table).where(table.c.table_name.in_(names)).values(version=table.c.version + 1)
+                ).rowcount
+                if bumped < len(names):
+                    # First write to a table; another process may be adding the row too
+                    existing = set(connection.scalars(select(table.c.table_name).where(table.c.table_name.in_(names))))
+                    connection.execute(insert(table), [
+                        {'table_name': name, 'version': 1} for name in names if name not in existing
+                    ])
+            return
+        except IntegrityError:
+            if attempt:
+                raise
+
+
+def _versions(models):
+    versions = table_versions()
+    return tuple(versions.get(name, 0) for name in sorted(model.__tablename__ for model in models))
+
+
+def cached_response(*models):
+    """
+    Cache a view's successful responses until one of the models' tables is
+    written or the TTL passes. Apply below jwt_required(); the role claim of
+    the token scopes the entries.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            cache = current_app.extensions.get('response_cache')
+            if cache is None:
+                return fn(*args, **kwargs)
+            
+            key = (request.path, tuple(sorted(request.args.items(multi=True))), get_jwt().get('role'))
+            
+            def compute():
+                response = make_response(fn(*args, **kwargs))
+                return (response.get_data(), response.status_code, response.mimetype), response.status_code == 200
+            
+            body, status, mimetype = cache.get_or_compute(key, _versions(models), compute)
+            return Response(body, status=status, mimetype=mimetype)
+        return wrapper
+    return decorator
+
+
+def cached_value(key, models, compute):
+    """
+    (value, whether it came from the cache) for a value other than a response,
+    cached under `key` until one of the models' tables is written
+    """
+    cache = current_app.extensions.get('response_cache')
+    if cache is None:
+        return compute(), False
+    
+    computed = []
+    
+    def run():
+        computed.append(True)
+        return compute(), True
+    
+    value = cache.get_or_compute(key, _versions(models), run)
+    return value, not computed
+
+
+def cache_stats():
+    """Cache counters and the shared table versions, or the disabled marker"""
+    cache = current_app.extensions.get('response_cache')
+    if cache is None:
+        return {'enabled': False}
+    return {**cache.stats(), 'versions': dict(db.session.query(CacheVersion.table_name, CacheVersion.version).all())}
+
+
+def _written(session):
+    return session.info.setdefault('response_cache_tables', set())
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_flushed(session, flush_context):
+    tables = _written(session)
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        table = getattr(instance, '__table__', None)
+        if table is not None:
+            tables.add(table.name)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_executed(orm_execute_state):
+    # Set-based INSERT/UPDATE/DELETE statements bypass the flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is not None and getattr(table, 'name', None):
+            _written(orm_execute_state.session).add(table.name)
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_committed(session):
+    tables = session.info.pop('response_cache_tables', None)
+    if tables and has_app_context() and current_app.extensions.get('response_cache') is not None:
+        g.pop('cache_versions', None)
+        try:
+            bump_versions(tables)
+        except Exception:
+            # The write is committed; entries reading these tables expire with the TTL
+            logger.exception('Could not bump dashboard cache versions of %s', sorted(tables))
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_rolled_back(session, previous_transaction):
+    if not previous_transaction.nested:
+        session.info.pop('response_cache_tables', None)
@@ -0,0 +1,157 @@
+"""
+Asset full-text search
+
+SQLite uses an FTS5 external-content table with the trigram tokenizer, kept
+in sync with `assets` by triggers, MySQL a FULLTEXT index with the ngram
+parser. Both match substrings, as the ILIKE search did, so `54321` finds
+serial number SN-00054321. Any other dialect (or SEARCH_BACKEND = 'like')
+falls back to ILIKE over the same columns.
+"""
+import re
+from flask import current_app
+from sqlalchemy import text
+from app import db
+from app.models.asset import Asset
+
+FTS_TABLE = 'assets_fts'
+MYSQL_INDEX = 'ix_assets_fulltext'
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+TRIGRAM = 3  # Shortest word the trigram index can look up
+
+_SQLITE_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, serial_number, description,
+        content='assets', content_rowid='id', tokenize='trigram'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON assets BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, serial_number, description)
+        VALUES (new.id, new.name, new.serial_number, new.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON assets BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, serial_number, description)
+        VALUES ('delete', old.id, old.name, old.serial_number, old.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF name, serial_number, description ON assets BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, serial_number, description)
+        VALUES ('delete', old.id, old.name, old.serial_number, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, name, serial_number, description)
+        VALUES (new.id, new.name, new.serial_number, new.description);
+    END""",
+]
+
+
+def init_search(app):
+    """Create the search index for the configured database and pick a backend"""
+    backend = 'like'
+    if app.config.get('SEARCH_BACKEND', 'auto') == 'auto':
+        dialect = db.engine.dialect.name
+        try:
+            if dialect == 'sqlite':
+                _init_sqlite()
+                backend = 'fts5'
+            elif dialect == 'mysql':
+                _init_mysql()
+                backend = 'mysql'
+        except Exception as e:
+            db.session.rollback()
+            app.logger.warning(f'Full-text search unavailable, falling back to ILIKE: {e}')
+    
+    app.extensions['asset_search'] = backend
+
+
+def _init_sqlite():
+    """Create the FTS5 table and sync triggers, backfilling on first creation"""
+    ddl = db.session.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {'name': FTS_TABLE}
+    ).scalar()
+    exists = ddl is not None
+    if exists and 'trigram' not in ddl:
+        # Word-tokenized index from an earlier version; the triggers keep working
+        db.session.execute(text(f'DROP TABLE {FTS_TABLE}'))
+        exists = False
+    for statement in _SQLITE_DDL:
+        db.session.execute(text(statement))
+    if not exists:
+        rebuild_index()
+    db.session.commit()
+
+
+def _init_mysql():
+    """Create the FULLTEXT ngram index if it is missing"""
+    exists = db.session.execute(
+        text(
+            "SELECT 1 FROM information_schema.statistics "
+            "WHERE table_schema = DATABASE() AND table_name = 'assets' AND index_name = :name LIMIT 1"
+        ),
+        {'name': MYSQL_INDEX}
+    ).scalar()
+    if not exists:
+        db.session.execute(text(
+            f'CREATE FULLTEXT INDEX {MYSQL_INDEX} ON assets (name, serial_number, description) WITH PARSER ngram'
+        ))
+    db.session.commit()
+
+
+def search_backend():
+    """Name of the active search backend: fts5, mysql or like"""
+    return current_app.extensions.get('asset_search', 'like')
+
+
+def rebuild_index():
+    """Rebuild the FTS5 index from the assets table (SQLite only)"""
+    db.session.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+
+def tokenize(term):
+    """Split a search term into lowercase word tokens"""
+    return _TOKEN_RE.findall(term.lower())
+
+
+def build_fts_query(words):
+    """
+    Translate search words into an FTS5 MATCH expression for the trigram
+    index: each word is a quoted substring, and the words are ANDed
+    """
+    return ' '.join('"' + word.replace('"', '""') + '"' for word in words)
+
+
+def _ilike(term):
+    pattern = f'%{term}%'
+    return db.or_(Asset.name.ilike(pattern), Asset.serial_number.ilike(pattern), Asset.description.ilike(pattern))
+
+
+def apply_search(query, term, backend=None):
+    """
+    Filter an Asset query by a search term
+    Returns (query, rank) where rank is an ORDER BY clause putting the best
+    matches first, or None for the ILIKE fallback.
+    """
+    backend = backend or search_backend()
+    tokens = tokenize(term)
+    
+    if backend == 'fts5':
+        words = term.split()
+        indexed = [word for word in words if len(word) >= TRIGRAM]
+        if indexed:
+            # Name and serial number matches weigh more than description ones
+            hits = text(
+                f'SELECT rowid AS asset_id, bm25({FTS_TABLE}, 10.0, 5.0, 1.0) AS score '
+                f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match'
+            ).bindparams(match=build_fts_query(indexed)).columns(asset_id=db.Integer, score=db.Float).subquery('asset_search')
+            query = query.join(hits, hits.c.asset_id == Asset.id)
+            # Words too short for trigrams narrow the indexed hits
+            for word in words:
+                if len(word) < TRIGRAM:
+                    query = query.filter(_ilike(word))
+            return query, hits.c.score.asc()
+    
+    if backend == 'mysql' and tokens:
+        score = text(
+            'MATCH (assets.name, assets.serial_number, assets.description) '
+            'AGAINST (:match IN BOOLEAN MODE)'
+        ).bindparams(match=' '.join(f'+{token}' for token in tokens))
+        query = query.filter(score)
+        return query, db.desc(score)
+    
+    return query.filter(_ilike(term)), None
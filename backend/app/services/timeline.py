@@ -0,0 +1,213 @@
+"""
+Dashboard timeline rollups
+
+TimelineRollup rows count asset acquisitions (with their purchase value),
+retirements, ticket openings and ticket closings per day, week, month and
+quarter. update_counters() hands the counter keys of every change to
+update_timeline(), so the rollups follow the write paths of the KPI counters:
+an acquisition is dated by the asset's created_at, a ticket's opening and
+closing by its created_at and resolved_at. Periods are computed in Python
+(app.utils.periods) and mean the same on every database; a chart reads one
+row per period and metric.
+
+Retirements are events, dated when an asset's status becomes Retired. The
+tables keep no retirement date, so they are never undone and
+reconcile_timeline() leaves them as they are.
+"""
+from collections import Counter, defaultdict
+from datetime import datetime
+from sqlalchemy import Date, cast, func
+from app import db
+from app.models.asset import Asset
+from app.models.kpi import TimelineRollup
+from app.models.maintenance import MaintenanceTicket
+from app.services.kpis import AssetCounterKey, TicketCounterKey, apply_deltas, to_cents
+from app.utils.periods import GRANULARITIES, as_date, period_label, period_start
+
+# Metrics recomputed from the assets and tickets tables
+DERIVED_METRICS = ('acquired', 'tickets_opened', 'tickets_closed')
+
+
+def _events(key, count):
+    """(metric, moment, count, value cents) of the timeline events of `count` rows with a counter key"""
+    if isinstance(key, AssetCounterKey):
+        if key.created_at is not None:
+            yield 'acquired', key.created_at, count, to_cents(key.purchase_price) * count
+    elif isinstance(key, TicketCounterKey):
+        if key.created_at is not None:
+            yield 'tickets_opened', key.created_at, count, 0
+        if key.resolved_at is not None:
+            yield 'tickets_closed', key.resolved_at, count, 0
+
+
+def _accumulate(deltas, events, sign):
+    """Add events, times `sign`, into the (granularity, period start, metric) deltas"""
+    for metric, moment, count, cents in events:
+        for granularity in GRANULARITIES:
+            delta = deltas[(granularity, period_start(moment, granularity), metric)]
+            delta[0] += sign * count
+            delta[1] += sign * cents
+
+
+def _retired(keys):
+    """(count, value cents) of the retired assets in a Counter of counter keys"""
+    count = cents = 0
+    for key, n in keys.items():
+        if isinstance(key, AssetCounterKey) and key.status == 'Retired':
+            count += n
+            cents += to_cents(key.purchase_price) * n
+    return count, cents
+
+
+def update_timeline(removed, added):
+    """
+    Adjust the rollups for changed rows, given Counters of their counter keys
+    before and after the change. A change that leaves more retired assets
+    than it found records the difference as retired now. Runs in the
+    caller's transaction.
+    """
+    deltas = defaultdict(lambda: [0, 0])
+    for keys, sign in ((removed, -1), (added, 1)):
+        _accumulate(deltas, (event for key, count in keys.items() for event in _events(key, count)), sign)
+    
+    (count_before, cents_before), (count_after, cents_after) = _retired(removed), _retired(added)
+    if count_after > count_before:
+        _accumulate(deltas, [('retired', datetime.utcnow(), count_after - count_before, cents_after - cents_before)], 1)
+    
+    apply_deltas(TimelineRollup, deltas)
+
+
+def _day(column):
+    """Dialect-specific calendar date of a datetime column, or None"""
+    dialect = db.engine.dialect.name
+    if dialect in ('sqlite', 'mysql', 'mariadb'):
+        return func.date(column)
+    if dialect == 'postgresql':
+        return cast(column, Date)
+    return None
+
+
+def _counted_by_day(moment, columns=(), criteria=(), batch_size=10000):
+    """
+    (day, *column values, count) of the rows matching `criteria` with a
+    `moment`, grouped in SQL where the dialect has a date function
+    """
+    criteria = (moment.isnot(None), *criteria)
+    day = _day(moment)
+    if day is not None:
+        rows = db.session.query(day, *columns, func.count()).filter(*criteria).group_by(day, *columns)
+        for row in rows.yield_per(batch_size):
+            yield (as_date(row[0]), *row[1:])
+        return
+    
+    counts = Counter()
+    for row in db.session.query(moment, *columns).filter(*criteria).yield_per(batch_size):
+        counts[(as_date(row[0]), *row[1:])] += 1
+    for key, count in counts.items():
+        yield (*key, count)
+
+
+def _actual_timeline():
+    """The derived rollups recomputed from the assets and tickets tables"""
+    deltas = defaultdict(lambda: [0, 0])
+    # Grouping by price keeps the value totals exact to the cent
+    _accumulate(deltas, (
+        ('acquired', day, count, to_cents(price) * count)
+        for day, price, count in _counted_by_day(Asset.created_at, (Asset.purchase_price,))
+    ), 1)
+    _accumulate(deltas, (
+        ('tickets_opened', day, count, 0) for day, count in _counted_by_day(MaintenanceTicket.created_at)
+    ), 1)
+    _accumulate(deltas, (
+        ('tickets_closed', day, count, 0) for day, count in _counted_by_day(MaintenanceTicket.resolved_at)
+    ), 1)
+    return {key: tuple(delta) for key, delta in deltas.items() if delta[0] or delta[1]}
+
+
+def reconcile_timeline(repair=True):
+    """
+    Recompute the acquisition and ticket rollups from scratch and report the
+    rows whose stored count or value differs. With `repair`, the stored rows
+    are replaced by the recomputed ones. Runs in the caller's transaction.
+    """
+    actual = _actual_timeline()
+    stored = {
+        (row.granularity, row.period_start, row.metric): (row.count, row.value_cents)
+        for row in TimelineRollup.query.filter(
+            TimelineRollup.metric.in_(DERIVED_METRICS),
+            db.or_(TimelineRollup.count != 0, TimelineRollup.value_cents != 0)
+        )
+    }
+    
+    drift = []
+    for granularity, start, metric in sorted(set(actual) | set(stored)):
+        expected = actual.get((granularity, start, metric), (0, 0))
+        found = stored.get((granularity, start, metric), (0, 0))
+        if expected != found:
+            drift.append({
+                'granularity': granularity,
+                'period': period_label(start, granularity),
+                'metric': metric,
+                'stored': {'count': found[0], 'value': found[1] / 100},
+                'actual': {'count': expected[0], 'value': expected[1] / 100}
+            })
+    
+    if repair:
+        db.session.execute(TimelineRollup.__table__.delete().where(TimelineRollup.metric.in_(DERIVED_METRICS)))
+        if actual:
+            db.session.execute(TimelineRollup.__table__.insert(), [
+                {'granularity': granularity, 'period_start': start, 'metric': metric, 'count': count, 'value_cents': cents}
+                for (granularity, start, metric), (count, cents) in actual.items()
+            ])
+    return drift
+
+
+def backfill_timeline():
+    """
+    Build the rollups for a database that predates them; a no-op once they
+    exist. Assets already retired are dated by their last update, the
+    closest record there is.
+    """
+    if TimelineRollup.query.first() is None and (Asset.query.first() or MaintenanceTicket.query.first()):
+        reconcile_timeline()
+        deltas = defaultdict(lambda: [0, 0])
+        _accumulate(deltas, (
+            ('retired', day, count, to_cents(price) * count)
+            for day, price, count in _counted_by_day(Asset.updated_at, (Asset.purchase_price,), (Asset.status == 'Retired',))
+        ), 1)
+        apply_deltas(TimelineRollup, deltas)
+        db.session.commit()
+
+
+def timeline(granularity='month', since=None, until=None):
+    """
+    Periods of `granularity` with any events, oldest first, optionally only
+    those overlapping since..until (dates). Each has its label under the
+    granularity's name, its first day, the count of every metric and the
+    acquired and retired purchase values. Raises ValueError for an unknown
+    granularity.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f'Invalid granularity. Must be one of: {", ".join(GRANULARITIES)}')
+    
+    rows = TimelineRollup.query.filter(TimelineRollup.granularity == granularity, TimelineRollup.count != 0)
+    if since is not None:
+        rows = rows.filter(TimelineRollup.period_start >= period_start(since, granularity))
+    if until is not None:
+        rows = rows.filter(TimelineRollup.period_start <= until)
+    
+    periods = {}
+    for row in rows.order_by(TimelineRollup.period_start):
+        period = periods.get(row.period_start)
+        if period is None:
+            period = periods[row.period_start] = {
+                granularity: period_label(row.period_start, granularity),
+                'start': row.period_start.isoformat(),
+                **{metric: 0 for metric in TimelineRollup.METRICS},
+                'acquired_value': 0.0,
+                'retired_value': 0.0
+            }
+        period[row.metric] = row.count
+        if row.metric in ('acquired', 'retired'):
+            period[f'{row.metric}_value'] = row.value_cents / 100
+    return list(periods.values())
@@ -0,0 +1,67 @@
+"""
+Conditional GET helpers (ETag / Last-Modified)
+
+Validators are derived from `updated_at` timestamps: a resource's own, or for
+collections the MAX(updated_at) and COUNT(*) of the filtered set, so a 304
+can be answered without loading or serializing the payload.
+
+Collections only get an ETag. Deleting a row leaves MAX(updated_at) as it
+was, so a Last-Modified date would let If-Modified-Since answer 304 with the
+deleted row still in the client's copy; the ETag covers the count as well.
+"""
+import hashlib
+from datetime import timezone
+from flask import request
+from sqlalchemy import func
+
+
+def build_etag(*parts):
+    """Hash validator parts into an opaque entity tag"""
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+
+def collection_version(query, column):
+    """Return (MAX(column), COUNT(*)) for a filtered query"""
+    latest, count = query.order_by(None).with_entities(func.max(column), func.count()).one()
+    return latest, count
+
+
+def latest_update(model):
+    """MAX(updated_at) over a whole table, for payloads that embed related rows"""
+    return model.query.with_entities(func.max(model.updated_at)).scalar()
+
+
+def _as_utc(value):
+    """Treat naive database timestamps as UTC"""
+    if value is None or value.tzinfo is not None:
+        return value
+    return value.replace(tzinfo=timezone.utc)
+
+
+def not_modified(etag, last_modified=None):
+    """
+    Return a 304 response when the request's validators still match, else None
+    If-None-Match takes precedence over If-Modified-Since (RFC 9110).
+    """
+    from flask import make_response
+    
+    last_modified = _as_utc(last_modified)
+    if request.if_none_match:
+        matched = request.if_none_match.contains_weak(etag)
+    elif last_modified and request.if_modified_since:
+        matched = last_modified.replace(microsecond=0) <= request.if_modified_since
+    else:
+        matched = False
+    
+    if not matched:
+        return None
+    return with_validators(make_response('', 304), etag, last_modified)
+
+
+def with_validators(response, etag, last_modified=None):
+    """Attach ETag / Last-Modified and make clients revalidate before reuse"""
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = _as_utc(last_modified)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
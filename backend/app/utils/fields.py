@@ -0,0 +1,54 @@
+"""
+Sparse fieldset helpers
+
+`?fields=id,name,status` selects only those columns and serializes straight
+from result rows, skipping ORM hydration and unused (possibly large) columns.
+"""
+from datetime import date, datetime
+from decimal import Decimal
+
+
+class InvalidFields(ValueError):
+    """Raised when a fields parameter names unknown fields"""
+
+
+def parse_fields(args, model):
+    """
+    Read the `fields` query param for a model
+    Returns the requested field names (always including id) or None
+    """
+    raw = args.get('fields')
+    if not raw:
+        return None
+    
+    names = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in names if name not in model.serializable_fields]
+    if unknown:
+        raise InvalidFields(
+            f'Unknown fields: {", ".join(unknown)}. '
+            f'Allowed: {", ".join(model.serializable_fields)}'
+        )
+    
+    if 'id' not in names:
+        names.insert(0, 'id')
+    return list(dict.fromkeys(names))
+
+
+def field_columns(model, names, extra=()):
+    """Columns to select for the given field names plus any extra columns"""
+    columns = [getattr(model, name) for name in names]
+    return columns + [column for column in extra if column.key not in names]
+
+
+def serialize_value(value):
+    """Serialize a column value the same way the models' to_dict does"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value) if value else None
+    return value
+
+
+def serialize_row(row, names):
+    """Build a dict of the given fields from a result row"""
+    return {name: serialize_value(getattr(row, name)) for name in names}
@@ -0,0 +1,143 @@
+"""
+Keyset (cursor) pagination helpers
+"""
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from flask import current_app
+from sqlalchemy import and_, or_, false, func, inspect, select
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+
+def _dump_value(value):
+    """Make a sort key value JSON serializable"""
+    if isinstance(value, datetime):
+        return {'$dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'$d': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'$dec': str(value)}
+    return value
+
+
+def _load_value(value):
+    """Restore a sort key value dumped by _dump_value"""
+    if isinstance(value, dict):
+        if '$dt' in value:
+            return datetime.fromisoformat(value['$dt'])
+        if '$d' in value:
+            return date.fromisoformat(value['$d'])
+        if '$dec' in value:
+            return Decimal(value['$dec'])
+    return value
+
+
+def encode_cursor(sort, values):
+    """Encode the sort key of the last row of a page as an opaque cursor"""
+    payload = json.dumps({'s': sort, 'k': [_dump_value(v) for v in values]}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, sort):
+    """Decode a cursor produced by encode_cursor for the given sort"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if payload['s'] != sort:
+            raise InvalidCursor('Cursor does not match the requested sort order')
+        return [_load_value(v) for v in payload['k']]
+    except InvalidCursor:
+        raise
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor('Invalid cursor') from e
+
+
+def get_page_limit(args, default=None, maximum=None):
+    """Read the `limit` query param, clamped to the configured maximum"""
+    default = default or current_app.config.get('PAGINATION_DEFAULT_LIMIT', 50)
+    maximum = maximum or current_app.config.get('PAGINATION_MAX_LIMIT', 500)
+    limit = args.get('limit', default, type=int)
+    return max(1, min(limit, maximum))
+
+
+def _nullable(column):
+    return getattr(getattr(column, 'expression', column), 'nullable', False)
+
+
+def _equal(column, value):
+    return column.is_(None) if value is None else column == value
+
+
+def _after(column, value, descending):
+    """Rows strictly after `value` in one column's order, where NULL sorts lowest"""
+    if value is None:
+        return false() if descending else column.isnot(None)
+    step = column < value if descending else column > value
+    return or_(step, column.is_(None)) if descending and _nullable(column) else step
+
+
+def keyset_filter(columns, values, descending=False):
+    """
+    Build the WHERE clause selecting rows strictly after `values`
+    in (columns) order, e.g. (a > x) OR (a = x AND b > y)
+    NULLs sort lowest (first ascending, last descending), as on SQLite and
+    MySQL, so rows with a NULL key are neither skipped nor repeated.
+    """
+    clauses = []
+    for i, column in enumerate(columns):
+        equal = [_equal(columns[j], values[j]) for j in range(i)]
+        clauses.append(and_(*equal, _after(column, values[i], descending)))
+    return or_(*clauses)
+
+
+def _order(column, descending, dialect):
+    order = column.desc() if descending else column.asc()
+    # PostgreSQL sorts NULL highest; match the lowest-NULL order keyset_filter assumes
+    if dialect == 'postgresql' and _nullable(column):
+        order = order.nulls_last() if descending else order.nulls_first()
+    return order
+
+
+def paginate(query, sort, columns, limit, cursor=None, descending=False):
+    """
+    Apply keyset pagination to a query
+    Returns (items, next_cursor); next_cursor is None on the last page
+    """
+    if cursor:
+        query = query.filter(keyset_filter(columns, decode_cursor(cursor, sort), descending))
+    
+    dialect = query.session.get_bind().dialect.name
+    order = [_order(c, descending, dialect) for c in columns]
+    items = query.order_by(None).order_by(*order).limit(limit + 1).all()
+    
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        next_cursor = encode_cursor(sort, [getattr(last, c.key) for c in columns])
+    
+    return items, next_cursor
+
+
+def count_total(query, mode, cap=None):
+    """
+    Count rows matching a query
+    mode='exact' runs a full COUNT(*); mode='estimate' stops counting at `cap`
+    rows so large result sets cost a bounded scan.
+    Returns (total, is_capped)
+    """
+    if mode == 'exact':
+        return query.order_by(None).count(), False
+    
+    cap = cap or current_app.config.get('COUNT_ESTIMATE_CAP', 10000)
+    # A column of the entity, not a literal: without a filter nothing else puts its table in FROM
+    key = inspect(query.column_descriptions[0]['entity']).primary_key[0]
+    limited = query.order_by(None).with_entities(key).limit(cap + 1).subquery()
+    total = query.session.execute(select(func.count()).select_from(limited)).scalar() or 0
+    if total > cap:
+        return cap, True
+    return total, False
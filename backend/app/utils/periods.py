@@ -0,0 +1,45 @@
+"""
+Calendar periods for time-bucketed reports
+
+Buckets are computed in Python from dates, so they mean the same on every
+database: a day, an ISO week starting on Monday, a calendar month or a
+quarter, each identified by its first day.
+"""
+from datetime import date, datetime, timedelta
+
+GRANULARITIES = ('day', 'week', 'month', 'quarter')
+
+
+def as_date(value):
+    """A date from a date, datetime or ISO date string (as SQLite returns DATE())"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def period_start(value, granularity):
+    """First day of the period of `granularity` containing a date or datetime"""
+    day = as_date(value)
+    if granularity == 'day':
+        return day
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    if granularity == 'quarter':
+        return day.replace(month=(day.month - 1) // 3 * 3 + 1, day=1)
+    raise ValueError(f'Invalid granularity. Must be one of: {", ".join(GRANULARITIES)}')
+
+
+def period_label(start, granularity):
+    """Display label of the period starting on `start`: 2024-03-05, 2024-W10, 2024-03 or 2024-Q1"""
+    if granularity == 'week':
+        year, week, _ = start.isocalendar()
+        return f'{year}-W{week:02d}'
+    if granularity == 'month':
+        return start.strftime('%Y-%m')
+    if granularity == 'quarter':
+        return f'{start.year}-Q{(start.month - 1) // 3 + 1}'
+    return start.isoformat()
@@ -0,0 +1,118 @@
+"""
+Merging t-digest
+
+A compact, mergeable sketch of a distribution for quantile estimates
+(Dunning & Ertl). Values are held as (mean, weight) centroids sized by the
+k1 scale function, so the tails stay precise while the middle is summarised;
+at most about `compression` centroids are kept whatever the number of values.
+Digests built separately can be merged into one for a coarser breakdown.
+"""
+import math
+
+
+class TDigest:
+    """Quantile sketch that serializes to a JSON-friendly dict"""
+    
+    def __init__(self, compression=100):
+        self.compression = compression
+        self.centroids = []  # [mean, weight], sorted by mean once compressed
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+    
+    def _k(self, q):
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+    
+    def _q(self, k):
+        return (math.sin(min(k * 2 * math.pi / self.compression, math.pi / 2)) + 1) / 2
+    
+    def add(self, value, weight=1):
+        """Add a value (with a weight for pre-aggregated input)"""
+        self.centroids.append([float(value), weight])
+        self.count += weight
+        self.total += float(value) * weight
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        if len(self.centroids) > 2 * self.compression:
+            self.compress()
+    
+    def merge(self, other):
+        """Fold another digest into this one"""
+        if not other.count:
+            return self
+        self.centroids.extend([mean, weight] for mean, weight in other.centroids)
+        self.count += other.count
+        self.total += other.total
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self.compress()
+        return self
+    
+    def compress(self):
+        """Merge neighbouring centroids while they fit the scale function's size limit"""
+        if not self.centroids:
+            return
+        points = sorted(self.centroids)
+        merged = [points[0]]
+        before = 0  # Weight of the finished centroids
+        limit = self.count * self._q(self._k(0) + 1)
+        for mean, weight in points[1:]:
+            current = merged[-1]
+            if before + current[1] + weight <= limit:
+                current[0] += (mean - current[0]) * weight / (current[1] + weight)
+                current[1] += weight
+            else:
+                before += current[1]
+                limit = self.count * self._q(self._k(before / self.count) + 1)
+                merged.append([mean, weight])
+        self.centroids = merged
+    
+    def quantile(self, q):
+        """Estimated value at quantile q (0..1), or None when empty"""
+        if not self.count:
+            return None
+        self.compress()
+        centroids = self.centroids
+        if len(centroids) == 1:
+            return centroids[0][0]
+        
+        target = q * self.count
+        # Each centroid's weight is spread around its mean; interpolate between centres
+        previous_mean, previous_center = self.min, 0
+        seen = 0
+        for mean, weight in centroids:
+            center = seen + weight / 2
+            if target < center:
+                if center == previous_center:
+                    return mean
+                return previous_mean + (target - previous_center) / (center - previous_center) * (mean - previous_mean)
+            previous_mean, previous_center = mean, center
+            seen += weight
+        if seen == previous_center:
+            return self.max
+        return previous_mean + (target - previous_center) / (seen - previous_center) * (self.max - previous_mean)
+    
+    def mean(self):
+        return self.total / self.count if self.count else None
+    
+    def to_dict(self):
+        self.compress()
+        return {
+            'compression': self.compression,
+            'centroids': [[round(mean, 6), weight] for mean, weight in self.centroids],
+            'count': self.count,
+            'total': self.total,
+            'min': self.min,
+            'max': self.max
+        }
+    
+    @classmethod
+    def from_dict(cls, data):
+        digest = cls(data.get('compression', 100))
+        digest.centroids = [list(centroid) for centroid in data.get('centroids', [])]
+        digest.count = data.get('count', 0)
+        digest.total = data.get('total', 0.0)
+        digest.min = data.get('min')
+        digest.max = data.get('max')
+        return digest
@@ -0,0 +1,58 @@
+"""
+Race-free inserts of counter-style rows
+
+Read-then-insert lets two transactions that both miss a row insert it twice,
+and one of them fails on the primary key. The dialect's upsert resolves the
+conflict in the database instead: INSERT ... ON CONFLICT on SQLite and
+PostgreSQL, INSERT ... ON DUPLICATE KEY UPDATE on MySQL.
+"""
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from app import db
+
+
+def upsert_add(table, rows, increments=()):
+    """
+    Insert rows (dicts of column values) into `table`. Where a row's primary
+    key already exists, its `increments` columns are added to the stored
+    ones instead, or the row is skipped when there are none. Rows are written
+    in key order so concurrent writers lock them in the same order. Runs in
+    the caller's transaction.
+    """
+    if not rows:
+        return
+    keys = [column.name for column in table.primary_key.columns]
+    rows = sorted(rows, key=lambda row: tuple(row[key] for key in keys))
+    
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        statement = (sqlite if dialect == 'sqlite' else postgresql).insert(table)
+        if increments:
+            statement = statement.on_conflict_do_update(
+                index_elements=keys,
+                set_={column: table.c[column] + statement.excluded[column] for column in increments}
+            )
+        else:
+            statement = statement.on_conflict_do_nothing(index_elements=keys)
+    elif dialect in ('mysql', 'mariadb'):
+        statement = mysql.insert(table)
+        # Without increments, setting a key column to itself leaves the row as it is
+        statement = statement.on_duplicate_key_update(
+            {column: table.c[column] + statement.inserted[column] for column in increments}
+            or {keys[0]: table.c[keys[0]]}
+        )
+    else:
+        # No upsert: insert each row in a savepoint and fall back to an update
+        for row in rows:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(table.insert(), [row])
+            except IntegrityError:
+                if increments:
+                    db.session.execute(
+                        table.update()
+                        .where(*(table.c[key] == row[key] for key in keys))
+                        .values({column: table.c[column] + row[column] for column in increments})
+                    )
+        return
+    db.session.execute(statement, rows)
@@ -0,0 +1,3 @@
+"""
+Performance benchmarks (run as scripts, not part of the application)
+"""
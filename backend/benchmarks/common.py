@@ -0,0 +1,110 @@
+"""
+Shared setup for benchmark scripts
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Seeding bypasses the write paths; scripts rebuild the expiry calendar themselves
+os.environ.setdefault('EXPIRY_SCHEDULER_ENABLED', 'false')
+
+from app import create_app, db
+
+CATEGORIES = ['Laptop', 'Desktop', 'Monitor', 'Phone', 'Tablet', 'Printer', 'Server', 'Network']
+STATUSES = ['Available', 'Assigned', 'Under Maintenance', 'In Repair', 'Retired']
+WORDS = ['dell', 'lenovo', 'apple', 'thinkpad', 'latitude', 'macbook', 'ultrasharp', 'laserjet',
+         'poweredge', 'catalyst', 'surface', 'galaxy', 'pixel', 'optiplex', 'elitebook', 'probook']
+
+
+def create_benchmark_app():
+    """Create an app bound to a throwaway SQLite file database"""
+    handle, path = tempfile.mkstemp(suffix='.db', prefix='assetflow_bench_')
+    os.close(handle)
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    app = create_app('development')
+    with app.app_context():
+        db.engine.echo = False
+    return app, path
+
+
+def seed_assets(count, batch_size=10000, users=50):
+    """Bulk insert `count` synthetic assets (and a few users) with executemany"""
+    rng = random.Random(42)
+    today = date.today()
+    
+    db.session.execute(db.text(
+        "INSERT INTO users (username, email, password_hash, role, department, is_active) "
+        "VALUES (:u, :e, 'x', 'Employee', :d, 1)"
+    ), [{'u': f'user{i}', 'e': f'user{i}@example.com', 'd': f'Dept{i % 8}'} for i in range(users)])
+    
+    statement = db.text(
+        "INSERT INTO assets (name, description, category, serial_number, purchase_date, purchase_price, "
+        "warranty_expiration, status, condition, assigned_to_user_id, location, created_at, updated_at) "
+        "VALUES (:name, :description, :category, :serial, :purchase_date, :price, :warranty, :status, "
+        "'Good', :user_id, 'HQ', :created_at, :created_at)"
+    )
+    for start in range(0, count, batch_size):
+        rows = []
+        for i in range(start, min(start + batch_size, count)):
+            purchased = today - timedelta(days=rng.randint(0, 3650))
+            status = rng.choice(STATUSES)
+            rows.append({
+                'name': f'{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {i}',
+                'description': ' '.join(rng.choice(WORDS) for _ in range(12)),
+                'category': rng.choice(CATEGORIES),
+                'serial': f'SN-{i:08d}',
+                'purchase_date': purchased,
+                'price': round(rng.uniform(100, 5000), 2),
+                'warranty': purchased + timedelta(days=rng.choice([365, 730, 1095])),
+                'status': status,
+                'user_id': rng.randint(1, users) if status == 'Assigned' else None,
+                'created_at': purchased,
+            })
+        db.session.execute(statement, rows)
+        db.session.commit()
+
+
+def seed_related(count):
+    """Tickets, history and licenses referencing the seeded assets"""
+    now = datetime.utcnow()
+    statuses = ['New', 'Under Review', 'In Progress', 'Resolved', 'Closed']
+    db.session.execute(db.text(
+        "INSERT INTO maintenance_tickets (asset_id, reported_by_user_id, assigned_to_user_id, title, description, "
+        "status, priority, created_at, updated_at, resolved_at) "
+        "VALUES (:asset, :reporter, :assignee, 't', 'd', :status, 'Medium', :created, :created, :resolved)"
+    ), [
+        {
+            'asset': i % count + 1, 'reporter': i % 50 + 1, 'assignee': i % 7 + 1 if i % 3 else None,
+            'status': statuses[i % 5], 'created': now - timedelta(hours=i),
+            'resolved': now - timedelta(hours=i - 5) if i % 5 == 3 else None
+        }
+        for i in range(count // 5)
+    ])
+    db.session.execute(db.text(
+        "INSERT INTO asset_history (asset_id, action, performed_by_user_id, created_at) "
+        "VALUES (:asset, 'updated', :user, :created)"
+    ), [{'asset': i % count + 1, 'user': i % 50 + 1, 'created': now - timedelta(minutes=i)} for i in range(count)])
+    db.session.execute(db.text(
+        "INSERT INTO licenses (asset_id, software_name, status, expiration_date, seats) "
+        "VALUES (:asset, 'Office', :status, :expires, 1)"
+    ), [
+        {'asset': i % count + 1, 'status': 'Active' if i % 4 else 'Expired', 'expires': date.today() + timedelta(days=i % 900 - 300)}
+        for i in range(count // 10)
+    ])
+    db.session.commit()
+
+
+def timed(fn, repeat=5):
+    """Run fn `repeat` times and return (best seconds, last result)"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
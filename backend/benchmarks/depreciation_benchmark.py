@@ -0,0 +1,62 @@
+"""
+Benchmark the asset value summary: per-object Python loop vs. the
+set-based depreciation engine, checking that both produce the same totals
+
+Usage: python benchmarks/depreciation_benchmark.py [row counts...]
+Defaults to 100000 and 1000000 rows.
+"""
+import os
+import sys
+
+from common import create_benchmark_app, seed_assets, timed
+from app import db
+from app.models.asset import Asset
+from app.services.depreciation import value_summary
+
+
+def legacy_summary():
+    """The original get_asset_value_summary loop"""
+    assets = Asset.query.filter(
+        Asset.purchase_price.isnot(None),
+        Asset.purchase_date.isnot(None)
+    ).all()
+    
+    total_purchase_value = 0
+    total_current_value = 0
+    total_depreciation = 0
+    for asset in assets:
+        depreciation = Asset.compute_depreciation(asset.purchase_price, asset.purchase_date)
+        if depreciation:
+            total_purchase_value += depreciation['purchase_price']
+            total_current_value += depreciation['current_value']
+            total_depreciation += depreciation['total_depreciation']
+    
+    db.session.expunge_all()
+    return {
+        'total_purchase_value': round(total_purchase_value, 2),
+        'total_current_value': round(total_current_value, 2),
+        'total_depreciation': round(total_depreciation, 2),
+        'depreciation_rate': round((total_depreciation / total_purchase_value * 100) if total_purchase_value > 0 else 0, 2)
+    }
+
+
+def run(count):
+    app, path = create_benchmark_app()
+    try:
+        with app.app_context():
+            seed_assets(count)
+            legacy_time, legacy = timed(legacy_summary, repeat=1)
+            engine_time, engine = timed(value_summary, repeat=3)
+            print(f'\n{count:,} assets')
+            print(f'  python loop: {legacy_time * 1000:10.1f} ms  {legacy}')
+            print(f'  sql engine:  {engine_time * 1000:10.1f} ms  {engine}')
+            print(f'  totals match: {legacy == engine}')
+            db.session.remove()
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    counts = [int(arg) for arg in sys.argv[1:]] or [100000, 1000000]
+    for count in counts:
+        run(count)
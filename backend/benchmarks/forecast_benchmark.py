@@ -0,0 +1,71 @@
+"""
+Benchmark the 36-month book value forecast: recomputing every asset's
+schedule per request vs. reading the precomputed depreciation schedules,
+checking that both produce the same figures
+
+Usage: python benchmarks/forecast_benchmark.py [row counts...]
+Defaults to 100000 rows.
+"""
+import os
+import sys
+from collections import defaultdict
+from datetime import date
+
+from common import create_benchmark_app, seed_assets, timed
+from app import db
+from app.models.asset import Asset
+from app.models.depreciation import DepreciationPolicy
+from app.services.depreciation_schedule import add_months, forecast, month_start, rebuild_schedules
+
+MONTHS = 36
+
+
+def recompute_forecast(start):
+    """Per-request recomputation: every asset's book value at every month end"""
+    periods = [add_months(start, offset) for offset in range(MONTHS)]
+    month_ends = [add_months(period, 1).toordinal() - 1 for period in periods]
+    policies = DepreciationPolicy.by_category()
+    default = DepreciationPolicy.default()
+    
+    categories = defaultdict(lambda: [0] * MONTHS)
+    rows = db.session.query(Asset.category, Asset.purchase_price, Asset.purchase_date).filter(
+        Asset.purchase_price.isnot(None),
+        Asset.purchase_date.isnot(None)
+    )
+    for category, purchase_price, purchase_date in rows.yield_per(10000):
+        owned = [offset for offset, end in enumerate(month_ends) if end >= purchase_date.toordinal()]
+        values = policies.get(category, default).book_values(
+            purchase_price, purchase_date, [date.fromordinal(month_ends[offset]) for offset in owned]
+        )
+        for offset, value in zip(owned, values):
+            categories[category][offset] += round(value * 100)
+    
+    return {name: [cents / 100 for cents in values] for name, values in sorted(categories.items())}
+
+
+def run(count):
+    app, path = create_benchmark_app()
+    try:
+        with app.app_context():
+            seed_assets(count)
+            start = month_start(date.today())
+            
+            rebuild_time, _ = timed(rebuild_schedules, repeat=1)
+            db.session.commit()
+            recompute_time, recomputed = timed(lambda: recompute_forecast(start), repeat=1)
+            store_time, stored = timed(lambda: forecast(start, MONTHS), repeat=5)
+            
+            print(f'\n{count:,} assets, {MONTHS} months')
+            print(f'  full rebuild:      {rebuild_time * 1000:10.1f} ms')
+            print(f'  recompute:         {recompute_time * 1000:10.1f} ms')
+            print(f'  schedule store:    {store_time * 1000:10.1f} ms')
+            print(f'  figures match: {recomputed == stored["categories"]}')
+            db.session.remove()
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    counts = [int(arg) for arg in sys.argv[1:]] or [100000]
+    for count in counts:
+        run(count)
@@ -0,0 +1,74 @@
+"""
+Benchmark the dashboard page load: the nine widget endpoints requested one
+after another vs. one /api/dashboard/overview request computing them on the
+widget pool. The response cache is disabled so every widget is computed.
+
+Usage: python benchmarks/overview_benchmark.py [asset counts...]
+Defaults to 100000 assets (plus tickets and licenses).
+"""
+import os
+import sys
+import time
+
+from common import create_benchmark_app, seed_assets, seed_related
+from app import db
+from app.models.user import User
+from app.routes.dashboard import WIDGETS
+from app.services.kpis import reconcile_counters
+
+
+def best_of(fn, repeat=3):
+    """Best wall time of fn in seconds"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run(count):
+    app, path = create_benchmark_app()
+    app.extensions.pop('response_cache', None)
+    try:
+        with app.app_context():
+            seed_assets(count)
+            seed_related(count)
+            reconcile_counters()
+            admin = User(username='bench_admin', email='bench_admin@example.com', role='Admin', department='IT')
+            admin.set_password('bench-password')
+            db.session.add(admin)
+            db.session.commit()
+            db.session.remove()
+        
+        client = app.test_client()
+        token = client.post('/api/auth/login', json={'username': 'bench_admin', 'password': 'bench-password'}).get_json()['access_token']
+        headers = {'Authorization': f'Bearer {token}'}
+        
+        def separate():
+            for name in WIDGETS:
+                assert client.get(f'/api/dashboard/{name}', headers=headers).status_code == 200
+        
+        timings = {}
+        
+        def overview():
+            response = client.get('/api/dashboard/overview', headers=headers).get_json()
+            assert not response['errors'], response['errors']
+            timings.update(response['timings'])
+        
+        separate_time = best_of(separate)
+        overview_time = best_of(overview)
+        print(f'\n{count:,} assets')
+        print(f'  {len(WIDGETS)} requests:       {separate_time * 1000:9.1f} ms')
+        print(f'  overview request: {overview_time * 1000:9.1f} ms')
+        for name, timing in sorted(timings.items(), key=lambda item: -item[1]['ms']):
+            print(f'    {name:22} {timing["ms"]:9.1f} ms')
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    counts = [int(arg) for arg in sys.argv[1:]] or [100000]
+    for count in counts:
+        run(count)
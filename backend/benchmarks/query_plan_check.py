@@ -0,0 +1,156 @@
+"""
+Query plan regression check
+
+Seeds a throwaway SQLite database, calls each endpoint through the test
+client, and runs EXPLAIN QUERY PLAN on every statement it issued. A statement
+that reads a table with a plain "SCAN <table>" (no index) fails the check
+unless that case explicitly allows it. Exits with status 1 on any failure.
+
+Usage: python benchmarks/query_plan_check.py [-v] [asset count]
+"""
+import os
+import re
+import sys
+from datetime import datetime
+
+from sqlalchemy import event
+
+from common import create_benchmark_app, seed_assets, seed_related
+from app import db
+from app.models.user import User
+from app.services.expiry_calendar import rebuild_calendar
+from app.services.kpis import reconcile_counters
+from app.services.resolution_times import rebuild_digests
+from app.services.timeline import reconcile_timeline
+from app.utils.pagination import encode_cursor
+
+FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+
+# Configuration, counter, digest and cache version tables with a handful of rows, read whole on purpose
+SMALL_TABLES = {'cache_versions', 'depreciation_policies', 'kpi_counters', 'resolution_digests'}
+
+# (description, role, path, tables a full scan is legitimate for)
+CASES = [
+    ('asset list, status + category', 'admin', '/api/assets/?status=Available&category=Laptop', ()),
+    ('asset list, assignee + status', 'admin', '/api/assets/?assigned_to=3&status=Assigned', ()),
+    ('asset list, department', 'admin', '/api/assets/?department=Dept1', ()),
+    ('asset list, expiring warranty', 'admin', '/api/assets/?warranty_expiring_days=30', ()),
+    ('asset list, purchase date range', 'admin', '/api/assets/?purchase_date_from=2024-01-01&purchase_date_to=2024-01-31', ()),
+    ('asset list, first page by name', 'admin', '/api/assets/?limit=50', ()),
+    ('asset list, first page by updated_at', 'admin', '/api/assets/?limit=50&sort=updated_at', ()),
+    ('asset list, category page by name', 'admin', '/api/assets/?limit=50&category=Laptop', ()),
+    ('asset list, next page by updated_at', 'admin',
+     f'/api/assets/?limit=50&sort=updated_at&cursor={encode_cursor("updated_at", [datetime(2030, 1, 1), 0])}', ()),
+    ('asset search', 'admin', '/api/assets/?search=dell%20latitude&limit=20', ()),
+    ('asset detail', 'admin', '/api/assets/1', ()),
+    ('asset history', 'admin', '/api/assets/1/history', ()),
+    ('asset history page, action filter', 'admin', '/api/assets/1/history?limit=20&action=updated,assigned', ()),
+    ('tickets, own as employee', 'employee', '/api/maintenance/', ()),
+    ('tickets, by status', 'admin', '/api/maintenance/?status=New', ()),
+    ('tickets, by assignee', 'admin', '/api/maintenance/?assigned_to=2', ()),
+    ('users, own department', 'employee', '/api/users/', ()),
+    ('user assets', 'admin', '/api/users/3/assets', ()),
+    ('licenses, active', 'admin', '/api/licenses/?status=Active', ()),
+    ('licenses, expiring', 'admin', '/api/licenses/expiring', ()),
+    ('licenses, expiring within the horizon', 'admin', '/api/licenses/expiring?days=365', ()),
+    ('dashboard, expiring warranties', 'admin', '/api/dashboard/warranty-expiring', ()),
+    ('dashboard, expiry buckets', 'admin', '/api/dashboard/expiry-buckets', ()),
+    ('dashboard, assets by status', 'admin', '/api/dashboard/assets-by-status', ()),
+    ('dashboard, assets by category', 'admin', '/api/dashboard/assets-by-category', ()),
+    ('dashboard, recent activities', 'admin', '/api/dashboard/recent-activities', ()),
+    ('dashboard, activity page by action', 'admin', '/api/dashboard/recent-activities?before=&action=assigned&limit=100', ()),
+    ('dashboard, activity page by actor', 'admin', '/api/dashboard/recent-activities?before=&performed_by=3&limit=100', ()),
+    ('dashboard, next activity page', 'admin',
+     f'/api/dashboard/recent-activities?limit=100&before={encode_cursor("activity", [datetime(2030, 1, 1), 0])}', ()),
+    ('depreciation forecast', 'admin', '/api/depreciation/forecast?months=36', ()),
+    ('change feed, employee', 'employee', f'/api/changes/?since={encode_cursor("changes", [0])}&limit=100', ()),
+    # Aggregates over every row of a table read it all by definition
+    ('dashboard, stats', 'admin', '/api/dashboard/stats', ('users',)),
+    ('dashboard, assets by department', 'admin', '/api/dashboard/assets-by-department', ()),
+    ('dashboard, maintenance stats', 'admin', '/api/dashboard/maintenance-stats', ()),
+    ('dashboard, asset value summary', 'admin', '/api/dashboard/asset-value-summary', ('assets',)),
+    ('dashboard, assets timeline', 'admin', '/api/dashboard/assets-timeline', ()),
+    ('dashboard, weekly timeline range', 'admin', '/api/dashboard/assets-timeline?granularity=week&since=2024-01-01&until=2024-06-30', ()),
+]
+
+
+def login(client, username, role, department):
+    """Create a user with a known password and return auth headers"""
+    user = User(username=username, email=f'{username}@example.com', role=role, department=department)
+    user.set_password('check-password')
+    db.session.add(user)
+    db.session.commit()
+    response = client.post('/api/auth/login', json={'username': username, 'password': 'check-password'})
+    return {'Authorization': f'Bearer {response.get_json()["access_token"]}'}
+
+
+def full_scans(cursor, statement, parameters):
+    """Tables a statement reads without an index, with the plan lines"""
+    cursor.execute(f'EXPLAIN QUERY PLAN {statement}', parameters)
+    plan = [row[3] for row in cursor.fetchall()]
+    tables = {match.group(1) for match in map(FULL_SCAN.match, plan) if match}
+    return tables, plan
+
+
+def run(count, verbose=False):
+    app, path = create_benchmark_app()
+    failures = 0
+    with app.app_context():
+        seed_assets(count)
+        seed_related(count)
+        reconcile_counters()
+        rebuild_digests()
+        reconcile_timeline()
+        rebuild_calendar()
+        db.session.execute(db.text('ANALYZE'))
+        db.session.commit()
+        
+        client = app.test_client()
+        headers = {
+            'admin': login(client, 'plan_admin', 'Admin', 'IT'),
+            'employee': login(client, 'plan_employee', 'Employee', 'Dept1')
+        }
+        tables = set(db.metadata.tables)
+        
+        statements = []
+        listener = lambda conn, cursor, statement, parameters, context, executemany: statements.append((statement, parameters))
+        raw = db.engine.raw_connection()
+        cursor = raw.cursor()
+        
+        for description, role, url, allowed in CASES:
+            statements.clear()
+            event.listen(db.engine, 'before_cursor_execute', listener)
+            response = client.get(url, headers=headers[role])
+            event.remove(db.engine, 'before_cursor_execute', listener)
+            
+            problems = []
+            if response.status_code >= 400:
+                problems.append(f'HTTP {response.status_code}')
+            for statement, parameters in statements:
+                if not statement.lstrip().upper().startswith(('SELECT', 'WITH', 'UPDATE', 'DELETE')):
+                    continue
+                scanned, plan = full_scans(cursor, statement, parameters)
+                unexpected = (scanned & tables) - SMALL_TABLES - set(allowed)
+                if unexpected:
+                    problems.append(f'full scan of {", ".join(sorted(unexpected))}:\n      '
+                                    + ' '.join(statement.split())[:300] + '\n      ' + '\n      '.join(plan))
+                elif verbose:
+                    print(f'      {" ".join(statement.split())[:120]}\n        ' + '\n        '.join(plan))
+            
+            print(f'{"FAIL" if problems else "ok  "}  {description}  ({len(statements)} statements)')
+            for problem in problems:
+                print(f'    {problem}')
+            failures += bool(problems)
+        
+        raw.close()
+        db.session.remove()
+    
+    os.remove(path)
+    return failures
+
+
+if __name__ == '__main__':
+    args = [arg for arg in sys.argv[1:] if arg != '-v']
+    failed = run(int(args[0]) if args else 20000, verbose='-v' in sys.argv)
+    print(f'\n{len(CASES) - failed}/{len(CASES)} cases without unexpected full table scans')
+    sys.exit(1 if failed else 0)
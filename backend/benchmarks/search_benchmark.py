@@ -0,0 +1,42 @@
+"""
+Benchmark asset search: ILIKE scan vs. the FTS5 index
+
+Usage: python benchmarks/search_benchmark.py [row counts...]
+Defaults to 100000 and 1000000 rows.
+"""
+import os
+import sys
+
+from common import create_benchmark_app, seed_assets, timed
+from app import db
+from app.models.asset import Asset
+from app.services.search import apply_search
+
+TERMS = ['SN-00054321', '54321', 'SN-0004', 'mac', 'dell latitude']
+
+
+def run(count):
+    app, path = create_benchmark_app()
+    try:
+        with app.app_context():
+            seed_assets(count)
+            print(f'\n{count:,} assets')
+            print(f'{"term":<16}{"ilike ms":>12}{"fts5 ms":>12}{"ilike rows":>12}{"fts5 rows":>12}')
+            for term in TERMS:
+                like_time, like_rows = timed(lambda: apply_search(Asset.query, term, backend='like')[0].limit(50).all())
+                
+                def fts():
+                    query, rank = apply_search(Asset.query, term, backend='fts5')
+                    return query.order_by(rank).limit(50).all()
+                
+                fts_time, fts_rows = timed(fts)
+                print(f'{term:<16}{like_time * 1000:>12.2f}{fts_time * 1000:>12.2f}{len(like_rows):>12}{len(fts_rows):>12}')
+            db.session.remove()
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    counts = [int(arg) for arg in sys.argv[1:]] or [100000, 1000000]
+    for count in counts:
+        run(count)
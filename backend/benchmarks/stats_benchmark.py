@@ -0,0 +1,109 @@
+"""
+Benchmark /api/dashboard/stats: one COUNT per figure vs. reading the
+maintained counter rows, checking that both return the same figures (the
+value total to the cent) and counting the statements each issues. Also times
+a full counter reconciliation.
+
+Usage: python benchmarks/stats_benchmark.py [asset counts...]
+Defaults to 100000 and 1000000 assets (plus tickets and licenses).
+"""
+import os
+import sys
+
+from sqlalchemy import event, func
+
+from common import create_benchmark_app, seed_assets, seed_related, timed
+from app import db
+from app.models.asset import Asset
+from app.models.license import License
+from app.models.maintenance import MaintenanceTicket
+from app.models.user import User
+from app.services.kpis import dashboard_stats, reconcile_counters
+
+
+def legacy_stats():
+    """The original get_stats body"""
+    total_assets = Asset.query.count()
+    available_assets = Asset.query.filter_by(status='Available').count()
+    assigned_assets = Asset.query.filter_by(status='Assigned').count()
+    maintenance_assets = Asset.query.filter(
+        Asset.status.in_(['Under Maintenance', 'In Repair'])
+    ).count()
+    retired_assets = Asset.query.filter_by(status='Retired').count()
+    
+    total_tickets = MaintenanceTicket.query.count()
+    open_tickets = MaintenanceTicket.query.filter(
+        MaintenanceTicket.status.in_(['New', 'Under Review', 'In Progress'])
+    ).count()
+    resolved_tickets = MaintenanceTicket.query.filter_by(status='Resolved').count()
+    
+    total_users = User.query.filter_by(is_active=True).count()
+    
+    total_licenses = License.query.count()
+    active_licenses = License.query.filter_by(status='Active').count()
+    expired_licenses = License.query.filter_by(status='Expired').count()
+    
+    total_value = db.session.query(func.sum(Asset.purchase_price)).scalar() or 0
+    
+    return {
+        'assets': {
+            'total': total_assets,
+            'available': available_assets,
+            'assigned': assigned_assets,
+            'under_maintenance': maintenance_assets,
+            'retired': retired_assets,
+            'total_value': float(total_value)
+        },
+        'maintenance': {
+            'total': total_tickets,
+            'open': open_tickets,
+            'resolved': resolved_tickets
+        },
+        'users': {
+            'total': total_users
+        },
+        'licenses': {
+            'total': total_licenses,
+            'active': active_licenses,
+            'expired': expired_licenses
+        }
+    }
+
+
+def count_statements(fn):
+    """Number of statements fn sends to the database"""
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        fn()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    return len(statements)
+
+
+def run(count):
+    app, path = create_benchmark_app()
+    try:
+        with app.app_context():
+            seed_assets(count)
+            seed_related(count)
+            reconcile_time, _ = timed(reconcile_counters, repeat=1)
+            db.session.commit()
+            legacy_time, legacy = timed(legacy_stats, repeat=3)
+            new_time, new = timed(dashboard_stats, repeat=3)
+            print(f'\n{count:,} assets')
+            print(f'  count per figure:  {legacy_time * 1000:9.1f} ms  {count_statements(legacy_stats)} queries')
+            print(f'  counter rows:      {new_time * 1000:9.1f} ms  {count_statements(dashboard_stats)} queries')
+            print(f'  reconciliation:    {reconcile_time * 1000:9.1f} ms')
+            legacy['assets']['total_value'] = round(legacy['assets']['total_value'], 2)
+            print(f'  payloads match: {legacy == new}')
+            db.session.remove()
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    counts = [int(arg) for arg in sys.argv[1:]] or [100000, 1000000]
+    for count in counts:
+        run(count)
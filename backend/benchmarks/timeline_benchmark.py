@@ -0,0 +1,59 @@
+"""
+Benchmark /api/dashboard/assets-timeline: grouping every asset by
+strftime('%Y-%m', created_at) vs. reading the maintained monthly rollup rows,
+checking that both return the same acquisition counts. Also times a full
+rebuild of the rollups and reads the other granularities.
+
+Usage: python benchmarks/timeline_benchmark.py [asset counts...]
+Defaults to 100000 and 1000000 assets (plus tickets and licenses).
+"""
+import os
+import sys
+
+from sqlalchemy import func
+
+from common import create_benchmark_app, seed_assets, seed_related, timed
+from app import db
+from app.models.asset import Asset
+from app.services.timeline import reconcile_timeline, timeline
+from app.utils.periods import GRANULARITIES
+
+
+def legacy_timeline():
+    """The original get_assets_timeline body"""
+    results = db.session.query(
+        func.strftime('%Y-%m', Asset.created_at).label('month'),
+        func.count(Asset.id).label('count')
+    ).group_by('month').order_by('month').all()
+    
+    return [{'month': month, 'count': count} for month, count in results if month]
+
+
+def run(count):
+    app, path = create_benchmark_app()
+    try:
+        with app.app_context():
+            seed_assets(count)
+            seed_related(count)
+            rebuild_time, _ = timed(reconcile_timeline, repeat=1)
+            db.session.commit()
+            legacy_time, legacy = timed(legacy_timeline, repeat=3)
+            new_time, new = timed(timeline, repeat=3)
+            print(f'\n{count:,} assets')
+            print(f'  strftime group by: {legacy_time * 1000:9.1f} ms')
+            print(f'  rollup rows:       {new_time * 1000:9.1f} ms  ({len(new)} months)')
+            for granularity in GRANULARITIES:
+                if granularity != 'month':
+                    elapsed, periods = timed(lambda: timeline(granularity), repeat=3)
+                    print(f'  {granularity + ":":<19}{elapsed * 1000:9.1f} ms  ({len(periods)} periods)')
+            print(f'  rebuild:           {rebuild_time * 1000:9.1f} ms')
+            print(f'  counts match: {legacy == [{"month": p["month"], "count": p["acquired"]} for p in new if p["acquired"]]}')
+            db.session.remove()
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    counts = [int(arg) for arg in sys.argv[1:]] or [100000, 1000000]
+    for count in counts:
+        run(count)